@@ -1,6 +1,7 @@
 # app.py (top)
 # --- Gevent Monkey Patching (ensure this is VERY FIRST) ---
 import gevent
+import gevent.event
 from gevent import monkey
 monkey.patch_all() # Patches standard library for gevent compatibility
 from gevent.pywsgi import WSGIServer # Import the gevent WSGI server
@@ -28,62 +29,129 @@ else:
     flask_app_kwargs = {} # Standard Flask initialization uses relative paths
 
 # Original Flask and related imports
-from flask import Flask, render_template, session, request, jsonify, g, url_for
-from flask_socketio import SocketIO # Keep SocketIO import here
+from flask import Flask, render_template, session, request, jsonify, g, url_for, has_request_context, send_file, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from flask_socketio import SocketIO, join_room # Keep SocketIO import here
 
 # Other standard library/third-party imports from your original file
-import random
 # import os # Already imported above
 import uuid
 import requests
-import json
-import threading # Keep for the processing_thread logic, gevent will make it cooperative
+import threading # Keep for the processing thread logic, gevent will make it cooperative
 
 # Your custom logic module
+import wfm_assets
+import wfm_engine
+import wfm_icons
+import wfm_json
+import wfm_logbook
 import wfm_logic
+import wfm_metrics
+import wfm_tracing
+import time
 
 # --- Flask App Initialization ---
+class WFMJSONProvider(DefaultJSONProvider):
+    # jsonify(), request.get_json() and the |tojson filter go through wfm_json (orjson when installed).
+    # Flask's default() hook is kept, so dates/dataclasses/etc. serialize as before with either backend
+    # (wfm_json passes them through orjson to it). NaN/Infinity are written as null.
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        return wfm_json.dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys), default=kwargs.get("default", self.default))
+
+    def loads(self, s, **kwargs):
+        return wfm_json.loads(s)
+
 app = Flask(__name__, **flask_app_kwargs) # Initialize Flask app using the kwargs
+app.json = WFMJSONProvider(app)
 app.secret_key = os.urandom(24) # Now you can set the secret key
 
-# Initialize SocketIO after app is created, now with gevent
-socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*")
+# Initialize SocketIO after app is created, now with gevent. Packets are encoded with the same codec as the HTTP API.
+# Long-polling responses above the threshold are gzip/deflate compressed; the websocket transport (simple-websocket)
+# negotiates permessage-deflate with the browser on its own, so both transports are compressed.
+SOCKETIO_COMPRESSION_THRESHOLD_BYTES = 512
+socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*", json=wfm_json,
+                    http_compression=True, compression_threshold=SOCKETIO_COMPRESSION_THRESHOLD_BYTES)
 
 # Constants from your original file
 MARKET_BASE_URL = "https://warframe.market"
+STOP_CONFIRM_TIMEOUT_SECONDS = 1.0 # How long /stop_processing waits for the analysis thread to confirm it exited
 BANNER_IMAGES_SUBFOLDER = os.path.join('images', 'banners')
 DEFAULT_BANNER_PATH = os.path.join('images', 'banner_default.jpg')
 
-processing_thread = None # This will now be a gevent-cooperative thread
-
-def get_banner_image_path():
-    banners_full_path = os.path.join(app.static_folder, 'images', 'banners')
-    selected_banner_rel_path = DEFAULT_BANNER_PATH
-    if os.path.exists(banners_full_path) and os.path.isdir(banners_full_path):
-        available_banners = [f for f in os.listdir(banners_full_path) if os.path.isfile(os.path.join(banners_full_path, f))]
-        if available_banners:
-            chosen_banner_name = random.choice(available_banners)
-            selected_banner_rel_path = os.path.join(BANNER_IMAGES_SUBFOLDER, chosen_banner_name).replace('\\', '/')
-    # Check if the selected (or default) banner actually exists
-    if not os.path.exists(os.path.join(app.static_folder, selected_banner_rel_path)):
-        # If chosen/default doesn't exist, try to fall back to the explicit default again, just in case
-        if os.path.exists(os.path.join(app.static_folder, DEFAULT_BANNER_PATH)):
-            return DEFAULT_BANNER_PATH.replace('\\','/')
-        return None # No banner found
-    return selected_banner_rel_path
+processing_threads = {} # platform -> analysis thread (gevent-cooperative); one per entry in wfm_logic.PROCESSING_PLATFORMS
+
+def processing_is_active():
+    return any(thread.is_alive() for thread in processing_threads.values())
+
+# Console lines kept on the server for reconnecting browser tabs (served by /logs)
+LOG_BACKLOG_CAPACITY = 2000
+LOG_BACKLOG_MAX_PAGE = 500
+LOG_BOOK = wfm_logbook.LogBook(LOG_BACKLOG_CAPACITY)
+
+# Item icons and the avatar are proxied through a local disk cache (see wfm_icons.py and /icon/<item_id>)
+ICON_CACHE = wfm_icons.IconCache(os.path.join(wfm_logic.CONFIG_DIRECTORY, "icon_cache") if wfm_logic.CONFIG_DIRECTORY else None)
+ITEM_ICON_SIZE_PX = 96 # 2x the 48px .item-thumbnail cell
+AVATAR_ICON_SIZE_PX = 150 # 2x the 75px .avatar-large
+ICON_CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600 # Browsers keep cached icons this long (and revalidate by ETag after)
+ICON_PREFETCH_INTERVAL_SECONDS = 30 # How often the prefetcher looks for listed items whose icon isn't cached yet
+
+def account_room(user_id):
+    # Every browser tab logged in to an account joins its room on connect (see handle_connect)
+    return f"account:{user_id}"
+
+def emit_to_clients(event_name, payload, user_id=None, broadcast=False):
+    # All server-to-browser events go through here so emit volume shows up on /metrics.
+    # Events go to the account's room: the user_id given, or the logged-in user of the current request.
+    # Only events that concern no account (or are sent before anyone is logged in) reach every client.
+    wfm_metrics.SOCKETIO_EMITS.inc(event=event_name)
+    if user_id is None and not broadcast and has_request_context(): user_id = session.get('wfm_user_id')
+    if event_name == 'new_log_message': payload = LOG_BOOK.append(payload, None if broadcast else user_id) # Adds seq/ts
+    if user_id is None or broadcast:
+        socketio.emit(event_name, payload)
+    else:
+        socketio.emit(event_name, payload, to=account_room(user_id))
+
+def emit_orders_snapshot(orders, user_id=None):
+    # Snapshots are the biggest payload by far (every order, every cycle): keys are sent once, orders as rows
+    emit_to_clients('sell_orders_snapshot', wfm_json.pack_rows(orders), user_id=user_id)
+
+# Static files get content-fingerprinted URLs (see wfm_assets.py and add_static_fingerprint); banners are
+# listed once here and get WebP copies (in the config directory) from a background job started below
+STATIC_ASSETS = wfm_assets.StaticAssets(app.static_folder)
+BANNERS = wfm_assets.BannerSet(STATIC_ASSETS, BANNER_IMAGES_SUBFOLDER, DEFAULT_BANNER_PATH,
+                               os.path.join(wfm_logic.CONFIG_DIRECTORY, "banner_cache") if wfm_logic.CONFIG_DIRECTORY else None)
+BANNER_MAX_WIDTH_PX = 1920 # .banner-div is full-width and background-size: cover, so wider only costs bytes
+IMMUTABLE_MAX_AGE_SECONDS = 365 * 24 * 3600 # For URLs that change whenever their content does
+
+def get_banner_image_url():
+    chosen_banner = BANNERS.choose()
+    if chosen_banner is None: return None # No banner found
+    static_path, optimized_name = chosen_banner
+    if optimized_name: return url_for('banner_route', filename=optimized_name)
+    return url_for('static', filename=static_path)
+
+def _optimize_banners_in_background():
+    # Decoding and re-encoding multi-MB images is CPU work, so it goes to gevent's OS threadpool; the copies are
+    # kept on disk, so only the first launch (or a changed banner) pays for it
+    optimized_count = gevent.get_hub().threadpool.apply(BANNERS.build_optimized, (BANNER_MAX_WIDTH_PX,))
+    if optimized_count: print(f"LOG: {optimized_count} of {len(BANNERS.entries)} banners have an optimized WebP copy.")
 
 # Initialization logic from your original file (wfm_logic parts)
-print("Flask App: Initializing WFM Logic...")
-wfm_logic.load_config() # Load config early
-if not wfm_logic.DEVICE_ID:
-    wfm_logic.DEVICE_ID = str(uuid.uuid4())
-    print(f"Flask App: Generated new Device-Id for wfm_logic: {wfm_logic.DEVICE_ID}")
-    # Ensure config is saved if a new device_id was generated.
-    # load_config might return user_id if it exists, useful for save_config.
-    loaded_config_data = wfm_logic.load_config() # Re-call may not be ideal, but ensure data is there
-    user_id_from_config = loaded_config_data.get("user_id")
-    # if user_id_from_config: # Only save if user_id known, or save can handle None
-    wfm_logic.save_config(user_id_from_config) # save_config should handle None user_id if needed, or this logic needs adjustment
+# Nothing slow runs at import time: the server binds its port straight away and the config, the item
+# catalog and the browser cookie probe are filled in by background greenlets once the gevent hub runs.
+# /ready reports progress and the UI shows a "warming up" banner until the catalog is available.
+print("Flask App: Initializing WFM Logic (background warm-up)...")
+STARTUP_STATE = {
+    "started_at": time.time(), "config_loaded": False, "catalog_ready": False, "catalog_attempts": 0,
+    "catalog_error": None, "catalog_source": None, "browser_jwt_probe": "pending", "ready_at": None,
+    "checkpoint_restored": False
+}
+CONFIG_READY = gevent.event.Event()
+BROWSER_JWT_PROBE_DONE = gevent.event.Event()
+BROWSER_JWT_WATCH_INTERVAL_SECONDS = 5 # How often the watcher stats the browser cookie DB for a new login
+CATALOG_RETRY_DELAYS_SECONDS = (2, 5, 10, 30, 60) # Backoff between catalog attempts; the last value repeats
 
 if not hasattr(wfm_logic, 'main_session') or wfm_logic.main_session is None:
     print("Flask App: Initializing wfm_logic.main_session...")
@@ -93,14 +161,166 @@ if not hasattr(wfm_logic, 'main_session') or wfm_logic.main_session is None:
         "Platform": wfm_logic.PLATFORM, "Language": wfm_logic.LANGUAGE
     })
 
-print("Flask App: Fetching all items map via wfm_logic...")
-if wfm_logic.fetch_all_items_and_build_map_v2(wfm_logic.main_session):
-    print(f"Flask App: Item map built: {len(wfm_logic.ITEM_ID_TO_DETAILS_MAP)} items.")
-else:
-    print("Flask App: Warning - Item map could not be built on startup.")
+def _load_config_in_background():
+    try:
+        loaded_config_data = wfm_logic.load_config() # Single load; base URL overrides must be applied before the catalog fetch
+        if not wfm_logic.DEVICE_ID:
+            wfm_logic.DEVICE_ID = str(uuid.uuid4())
+            print(f"Flask App: Generated new Device-Id for wfm_logic: {wfm_logic.DEVICE_ID}")
+            wfm_logic.save_config(loaded_config_data.get("user_id")) # Persist the new device_id right away
+        # Warm restart: last-seen books and a still-fresh own-orders snapshot (bump state is restored when processing starts)
+        STARTUP_STATE["checkpoint_restored"] = wfm_logic.restore_engine_checkpoint(loaded_config_data.get("user_id"), include_engine_state=False)
+    except Exception as e:
+        print(f"Flask App: Error during background config load: {e}")
+    finally:
+        STARTUP_STATE["config_loaded"] = True
+        CONFIG_READY.set()
+
+def _mark_catalog_ready(source):
+    if STARTUP_STATE["catalog_ready"]: return
+    STARTUP_STATE["catalog_ready"] = True; STARTUP_STATE["catalog_source"] = source
+    STARTUP_STATE["ready_at"] = time.time()
+
+def _load_catalog_in_background():
+    CONFIG_READY.wait()
+    # The copy saved by the last successful fetch makes the UI usable right away; the API fetch below refreshes it
+    if wfm_logic.load_catalog_cache():
+        _mark_catalog_ready("disk")
+    attempt = 0
+    while not wfm_logic.ITEMS_MAP_FETCHED:
+        attempt += 1
+        STARTUP_STATE["catalog_attempts"] = attempt
+        print(f"Flask App: Fetching all items map via wfm_logic (attempt {attempt})...")
+        if wfm_logic.fetch_all_items_and_build_map_v2(wfm_logic.main_session):
+            break
+        retry_delay = CATALOG_RETRY_DELAYS_SECONDS[min(attempt - 1, len(CATALOG_RETRY_DELAYS_SECONDS) - 1)]
+        STARTUP_STATE["catalog_error"] = f"Item catalog fetch failed (attempt {attempt}); retrying in {retry_delay}s."
+        print(f"Flask App: Warning - {STARTUP_STATE['catalog_error']}")
+        gevent.sleep(retry_delay)
+    STARTUP_STATE["catalog_error"] = None
+    _mark_catalog_ready("network")
+    print(f"Flask App: Item map built: {len(wfm_logic.ITEM_ID_TO_DETAILS_MAP)} items "
+          f"({STARTUP_STATE['ready_at'] - STARTUP_STATE['started_at']:.1f}s after start).")
+
+def _probe_browser_jwt_in_background():
+    try:
+        # Reading the Firefox cookie DB is blocking sqlite/crypto work, so it goes to gevent's OS threadpool.
+        # This warms wfm_logic's browser JWT cache for the first page load.
+        browser_jwt = gevent.get_hub().threadpool.apply(wfm_logic.get_browser_jwt)
+        STARTUP_STATE["browser_jwt_probe"] = "found" if browser_jwt else "not_found"
+    except Exception as e:
+        print(f"Flask App: Error during background browser JWT probe: {e}")
+        STARTUP_STATE["browser_jwt_probe"] = "error"
+    finally:
+        BROWSER_JWT_PROBE_DONE.set()
+
+def _watch_browser_cookie_store():
+    # Picks up a login on the website without waiting for a page load: each tick is a couple of os.stat
+    # calls, and the browser is only read again when the cookie DB changed (see wfm_logic.get_browser_jwt)
+    BROWSER_JWT_PROBE_DONE.wait()
+    if not wfm_logic.browser_cookie_support_available(): return
+    last_seen_jwt = wfm_logic.get_browser_jwt()
+    while True:
+        gevent.sleep(BROWSER_JWT_WATCH_INTERVAL_SECONDS)
+        try:
+            browser_jwt = gevent.get_hub().threadpool.apply(wfm_logic.get_browser_jwt)
+        except Exception as e:
+            print(f"Flask App: Error in browser cookie watcher: {e}"); continue
+        if browser_jwt and browser_jwt != last_seen_jwt:
+            print("Flask App: New browser login detected.")
+            emit_to_clients('browser_login_detected', {'message': 'New warframe.market login detected in the browser.'}, broadcast=True)
+        last_seen_jwt = browser_jwt
+
+def fetch_browser_jwt():
+    # Cache hits are just a few os.stat calls; a real browser read runs in the threadpool so the hub stays responsive
+    BROWSER_JWT_PROBE_DONE.wait(timeout=15) # Don't race the startup probe into a second cookie DB read
+    return gevent.get_hub().threadpool.apply(wfm_logic.get_browser_jwt)
+
+def _prefetch_listed_item_icons():
+    # Keeps the icons of our listed items on disk, so the order table rarely shows a placeholder.
+    # fetch() returns straight away for icons that are already cached.
+    while True:
+        if STARTUP_STATE["catalog_ready"]:
+            listed_item_ids = sorted(filter(None, {order.get("item_id") for order in wfm_logic.OWN_ORDERS_LEDGER.snapshot()}))
+            for item_id in listed_item_ids:
+                catalog_item = wfm_logic.ITEM_ID_TO_DETAILS_MAP.get(item_id)
+                if catalog_item and catalog_item.icon_url: ICON_CACHE.fetch(catalog_item.icon_url, ITEM_ICON_SIZE_PX)
+        gevent.sleep(ICON_PREFETCH_INTERVAL_SECONDS)
+
+def get_autocomplete_items_json():
+    # Sorted item list for the "Place Order" autocomplete; cached inside the catalog per catalog version
+    return wfm_logic.ITEM_CATALOG.autocomplete_json()
+
+gevent.spawn(_load_config_in_background)
+gevent.spawn(_load_catalog_in_background)
+gevent.spawn(_probe_browser_jwt_in_background)
+gevent.spawn(_watch_browser_cookie_store)
+gevent.spawn(_prefetch_listed_item_icons)
+gevent.spawn(_optimize_banners_in_background)
 print("-" * 30)
 
 
+@app.before_request
+def start_route_timer():
+    g.route_timer_start = time.perf_counter()
+
+@app.after_request
+def record_route_latency(response):
+    timer_start = getattr(g, 'route_timer_start', None)
+    if timer_start is not None:
+        route_label = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        wfm_metrics.HTTP_LATENCY.observe(time.perf_counter() - timer_start, route=route_label, method=request.method, status=response.status_code)
+    return response
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    # url_for('static', filename=...) -> /static/...?v=<content fingerprint>; a changed file gets a new URL
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = STATIC_ASSETS.fingerprint(values['filename'])
+        if fingerprint: values['v'] = fingerprint
+
+@app.after_request
+def set_static_cache_headers(response):
+    # A fingerprinted static URL never changes content, so the browser can keep it without revalidating
+    if request.endpoint == 'static' and response.status_code in (200, 304) and request.args.get('v'):
+        if request.args['v'] == STATIC_ASSETS.fingerprint((request.view_args or {}).get('filename', '')):
+            response.cache_control.public = True; response.cache_control.max_age = IMMUTABLE_MAX_AGE_SECONDS
+            response.cache_control.immutable = True; response.cache_control.no_cache = None
+    return response
+
+@app.after_request
+def compress_response(response):
+    # gzip (or brotli when installed) for text responses: the index page with its inline script, CSS, JSON.
+    # Static files are compressed once and the result kept (STATIC_ASSETS.compressed); everything else per response.
+    # Socket.IO traffic never gets here; it compresses on its own (see the SocketIO setup above).
+    if response.status_code != 200 or 'Content-Encoding' in response.headers or response.mimetype not in wfm_assets.COMPRESSIBLE_MIMETYPES:
+        return response
+    if response.is_streamed and not response.direct_passthrough: return response # Generators stay streamed
+    response.vary.add('Accept-Encoding') # Caches must key on it even when this client gets the plain body
+    encoding = request.accept_encodings.best_match(wfm_assets.available_encodings())
+    if not encoding: return response
+    if request.endpoint == 'static':
+        if (response.content_length or 0) < wfm_assets.COMPRESSION_MIN_BYTES: return response
+        compressed_body = STATIC_ASSETS.compressed((request.view_args or {}).get('filename', ''), encoding)
+        if compressed_body is None: return response
+        response.close() # The open file behind send_from_directory
+    else:
+        response.direct_passthrough = False
+        uncompressed_body = response.get_data()
+        if len(uncompressed_body) < wfm_assets.COMPRESSION_MIN_BYTES: return response
+        compressed_body = wfm_assets.compress_bytes(uncompressed_body, encoding)
+    response.set_data(compressed_body)
+    response.headers['Content-Encoding'] = encoding
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak: response.set_etag(etag, weak=True) # Same resource, different bytes
+    return response
+
+@app.before_request
+def wait_for_config():
+    # Config loading is a local file read, so this only ever waits a moment right after launch
+    if request.endpoint not in ('ready', 'static', 'metrics_route') and not CONFIG_READY.is_set():
+        CONFIG_READY.wait(timeout=10)
+
 @app.before_request
 def ensure_session_keys_and_wfm_globals():
     keys_to_init = {
@@ -123,7 +343,7 @@ def index():
 
     # Attempt to get JWT from browser cookies if not already in session
     if not session.get('wfm_jwt'):
-        browser_jwt = wfm_logic.try_fetch_jwt_from_browsers()
+        browser_jwt = fetch_browser_jwt()
         if browser_jwt:
             # If JWT found, validate it by fetching /v2/me
             if not wfm_logic.DEVICE_ID: # Ensure device_id exists before API call
@@ -203,7 +423,7 @@ def index():
     if session.get('wfm_ingame_name'):
         user_profile_for_template["username"] = session['wfm_ingame_name']
         user_profile_for_template["status"] = session.get('wfm_user_status', 'Invisible')
-        user_profile_for_template["avatar_url"] = session.get('wfm_avatar_url')
+        user_profile_for_template["avatar_url"] = url_for('avatar_route') if (session.get('wfm_avatar_url') or '').startswith('http') else session.get('wfm_avatar_url')
         user_profile_for_template["profile_url"] = f"{MARKET_BASE_URL}/profile/{session['wfm_ingame_name']}"
         user_profile_for_template["reputation"] = session.get('wfm_user_reputation', 0)
     elif not session.get('wfm_jwt'): # If still no JWT after all attempts
@@ -219,8 +439,8 @@ def index():
         wfm_logic.CURRENT_JWT_STRING = session.get('wfm_jwt')
         wfm_logic.CSRF_TOKEN = session.get('wfm_csrf')
 
-        # Fetch orders from profile page scrape
-        fetched_orders_list, status_from_profile_scrape = wfm_logic.fetch_orders_from_profile_page(
+        # Fetch orders (own-orders ledger; scrapes the profile page only if the cached view is stale)
+        fetched_orders_list, status_from_profile_scrape = wfm_logic.get_own_orders(
             wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt']
         )
         all_visible_slugs_from_profile = [] # For status lookup fallback
@@ -238,7 +458,8 @@ def index():
             for order_data in sell_orders_for_template_raw:
                 # Set initial UI display text for status and min price
                 order_data["initial_status_text"] = "HIDDEN" if not order_data.get("visible") else "Idle" #
-                order_data["competitor_price"] = "N/A" # Default, will be updated by JS if processing
+                last_seen_book = wfm_logic.LAST_SEEN_BOOKS.get(order_data.get("item_id")) or {}
+                order_data["competitor_price"] = f"{last_seen_book['lowest']}p" if last_seen_book.get("lowest") else "N/A" # Last known (possibly from the checkpoint); updated by JS while processing
 
                 # min_price_display should reflect numeric_min_price or "skip"
                 if order_data.get("is_skipped"):
@@ -287,37 +508,69 @@ def index():
              user_profile_for_template["status"] = session.get('wfm_user_status', 'Invisible')
 
 
-    selected_banner_path = get_banner_image_path()
+    selected_banner_url = get_banner_image_url()
     auth_error_message = session.get('wfm_auth_error') # Get error if set by submit_jwt
     
-    global processing_thread
-    is_processing_active = (processing_thread is not None and processing_thread.is_alive())
-
-    # Prepare item list for "Place Order" autocomplete
-    items_for_autocomplete = []
-    if wfm_logic.ITEM_ID_TO_DETAILS_MAP: # Ensure map is loaded
-        for item_id, details in wfm_logic.ITEM_ID_TO_DETAILS_MAP.items():
-            if details and details.get("name"): # Basic validation
-                items_for_autocomplete.append({
-                    "id": item_id,
-                    "name": details.get("name"),
-                    "max_rank": details.get("mod_max_rank") # Already being fetched
-                })
-        items_for_autocomplete.sort(key=lambda x: x["name"].lower())
-
+    is_processing_active = processing_is_active()
 
     return render_template('index.html',
                            profile=user_profile_for_template,
-                           banner_image_file_path=selected_banner_path,
+                           banner_image_url=selected_banner_url,
                            sell_orders=sell_orders_for_template,
                            market_base_url=MARKET_BASE_URL,
                            auctions_url=f"{MARKET_BASE_URL}/auctions", # Example for nav link
                            auth_error=auth_error_message,
                            current_jwt_exists=bool(session.get('wfm_jwt')),
                            is_processing=is_processing_active,
-                           items_for_autocomplete=json.dumps(items_for_autocomplete) # Pass as JSON string
+                           items_for_autocomplete=get_autocomplete_items_json(), # Already a JSON string; "[]" while warming up
+                           catalog_ready=bool(wfm_logic.ITEM_CATALOG),
+                           other_platforms=[platform for platform in wfm_logic.PROCESSING_PLATFORMS if platform != wfm_logic.PLATFORM] # Their settings are edited below the table
                            )
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    # 200 once the config and item catalog are loaded, 503 while still warming up
+    is_ready = STARTUP_STATE["config_loaded"] and STARTUP_STATE["catalog_ready"]
+    status_payload = dict(STARTUP_STATE, ready=is_ready, catalog_items=len(wfm_logic.ITEM_ID_TO_DETAILS_MAP),
+                          uptime_seconds=round(time.time() - STARTUP_STATE["started_at"], 1))
+    return jsonify(status_payload), (200 if is_ready else 503)
+
+def serve_cached_icon(source_url, size_px, placeholder_filename):
+    # Cached: the thumbnail with long-lived cache headers (ETag is its content digest).
+    # Not cached yet: the placeholder, marked no-cache so the browser asks again on the next load, and a background fetch.
+    cached_icon = ICON_CACHE.lookup(source_url, size_px) if source_url else None
+    if cached_icon is not None:
+        icon_path, icon_digest, content_type = cached_icon
+        return send_file(icon_path, mimetype=content_type, etag=icon_digest, max_age=ICON_CACHE_MAX_AGE_SECONDS, conditional=True)
+    if source_url and not ICON_CACHE.is_pending(source_url, size_px):
+        gevent.spawn(ICON_CACHE.fetch, source_url, size_px)
+    response = send_from_directory(app.static_folder, placeholder_filename, max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/icon/<item_id>', methods=['GET'])
+def icon_route(item_id):
+    catalog_item = wfm_logic.ITEM_ID_TO_DETAILS_MAP.get(item_id)
+    return serve_cached_icon(catalog_item.icon_url if catalog_item else None, ITEM_ICON_SIZE_PX, 'images/item_placeholder.png')
+
+@app.route('/avatar', methods=['GET'])
+def avatar_route():
+    avatar_url = session.get('wfm_avatar_url') or ''
+    return serve_cached_icon(avatar_url if avatar_url.startswith('http') else None, AVATAR_ICON_SIZE_PX, 'images/default_avatar.png')
+
+@app.route('/banner/<path:filename>', methods=['GET'])
+def banner_route(filename):
+    # Optimized banner copies; the name carries the original's fingerprint, so they never change
+    if not BANNERS.optimized_directory: return "", 404
+    response = send_from_directory(BANNERS.optimized_directory, filename, max_age=IMMUTABLE_MAX_AGE_SECONDS)
+    response.cache_control.public = True; response.cache_control.immutable = True
+    return response
+
+@app.route('/autocomplete_items', methods=['GET'])
+def autocomplete_items_route():
+    # Lets a page rendered during warm-up fill its "Place Order" autocomplete once the catalog arrives
+    return get_autocomplete_items_json(), 200, {'Content-Type': 'application/json'}
+
 @app.route('/submit_jwt', methods=['POST'])
 def submit_jwt_route():
     manual_jwt = request.form.get('manual_jwt_token')
@@ -364,11 +617,10 @@ def submit_jwt_route():
 
 @app.route('/start_processing', methods=['POST'])
 def start_processing_route():
-    global processing_thread
     if not session.get('wfm_jwt') or not session.get('wfm_csrf') or not session.get('wfm_user_id') or not session.get('wfm_ingame_name'):
         return jsonify({"success": False, "message": "Not authenticated. Cannot start processing."}), 401
 
-    if processing_thread is not None and processing_thread.is_alive():
+    if processing_is_active():
         return jsonify({"success": False, "message": "Processing is already running."})
 
     print("Flask App: Validating min prices before starting processing...")
@@ -376,8 +628,8 @@ def start_processing_route():
     wfm_logic.CURRENT_JWT_STRING = session.get('wfm_jwt')
     wfm_logic.CSRF_TOKEN = session.get('wfm_csrf')
 
-    # Fetch current orders for validation (from profile page scrape)
-    validation_orders_data, _ = wfm_logic.fetch_orders_from_profile_page(
+    # Fetch current orders for validation (ledger view; the first analysis cycle then reuses it without another scrape)
+    validation_orders_data, _ = wfm_logic.get_own_orders(
         wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt']
     )
     if validation_orders_data is None: # Error fetching orders
@@ -400,13 +652,37 @@ def start_processing_route():
     if missing_min_price_items:
         message = "Cannot start. Visible items need a valid min price (number > 0) or 'skip': " + ", ".join(missing_min_price_items)
         print(f"Flask App: Validation FAILED. {message}")
-        socketio.emit('new_log_message', {'message': f"Validation FAILED: {message}", 'type': 'error', 'item_id': None, 'data': {}})
+        emit_to_clients('new_log_message', {'message': f"Validation FAILED: {message}", 'type': 'error', 'item_id': None, 'data': {}})
         return jsonify({"success": False, "message": message}), 400
 
     print("Flask App: Min price validation passed. Received request to start processing.")
-    socketio.emit('new_log_message', {'message': "Min price validation passed. Starting processing...", 'type': 'info', 'item_id': None, 'data': {}})
+    emit_to_clients('new_log_message', {'message': "Min price validation passed. Starting processing...", 'type': 'info', 'item_id': None, 'data': {}})
+
+    processing_user_id = session['wfm_user_id']
+    processing_cancel_token = wfm_logic.new_processing_cancel_token() # Fresh token, shared by every platform; /stop_processing cancels it
+    processing_threads.clear()
+    for platform in wfm_logic.PROCESSING_PLATFORMS:
+        # For gevent, using threading.Thread is okay if gevent's monkey patching is active.
+        # It will make the thread cooperative.
+        processing_threads[platform] = threading.Thread(
+            target=wfm_logic.analysis_thread_target,
+            args=(
+                wfm_logic.main_session, session['wfm_user_id'], session['wfm_ingame_name'],
+                session['wfm_jwt'], session['wfm_csrf'], wfm_logic.DEVICE_ID,
+                wfm_logic.ITEM_USER_SETTINGS.copy(), # Pass a copy of current settings
+                make_processing_update_callback(processing_user_id, platform) # Pass the callback
+            ),
+            kwargs={'cancel_token': processing_cancel_token, 'platform': platform},
+            daemon=True # Daemonize thread so it exits when main app does
+        )
+        processing_threads[platform].start()
+    return jsonify({"success": True, "message": f"Processing started ({', '.join(wfm_logic.PROCESSING_PLATFORMS)})."})
 
-    # Callback for the thread to emit SocketIO events
+
+def make_processing_update_callback(processing_user_id, platform):
+    # Callback for an analysis thread to emit SocketIO events (to this account's room; the thread has no request context).
+    # The order table shows the default platform: other platforms' threads only add log lines, tagged with the platform.
+    is_table_platform = platform == wfm_logic.PLATFORM
     def emit_update_to_client(item_id, message, data_dict=None): #
         update_type = "info" # Default type
         actual_data_payload = {} #
@@ -416,58 +692,55 @@ def start_processing_route():
             # Remove 'type' from data_dict before sending as payload if it exists
             actual_data_payload = {k: v for k, v in data_dict.items() if k != 'type'} #
 
+        if not is_table_platform:
+            if update_type in ("orders_data_snapshot", "user_status_update"): return
+            item_id = None; message = f"[{platform.upper()}] {message}" # Row ids are item ids of the default platform's listings
         if update_type == "orders_data_snapshot": #
             # Data for snapshot should be under 'orders' key in actual_data_payload
-            socketio.emit('sell_orders_snapshot', {'orders': actual_data_payload.get('orders', [])}) #
+            emit_orders_snapshot(actual_data_payload.get('orders', []), user_id=processing_user_id) #
         elif update_type == "user_status_update": # Handle user status updates #
             status_payload = {'new_status': actual_data_payload.get('new_status')} #
-            socketio.emit('user_status_update', status_payload) #
+            emit_to_clients('user_status_update', status_payload, user_id=processing_user_id) #
         else: # Default to new_log_message #
-            socketio.emit('new_log_message', { #
+            if update_type == "book_delta": # Structured events for listeners that react to market moves; the console gets the summary line below
+                emit_to_clients('book_delta', dict(actual_data_payload, platform=platform), user_id=processing_user_id)
+            emit_to_clients('new_log_message', { #
                 "item_id": item_id,
                 "message": message,
                 "type": update_type, # Use the determined type
                 "data": actual_data_payload # Send the rest of data_dict
-            })
+            }, user_id=processing_user_id)
         
         socketio.sleep(0.01) # Small sleep to allow emit to process (gevent friendly sleep)
-
-    wfm_logic.stop_processing_flag = False # Reset flag
-    # For gevent, using threading.Thread is okay if gevent's monkey patching is active.
-    # It will make the thread cooperative.
-    processing_thread = threading.Thread(
-        target=wfm_logic.analysis_thread_target,
-        args=(
-            wfm_logic.main_session, session['wfm_user_id'], session['wfm_ingame_name'],
-            session['wfm_jwt'], session['wfm_csrf'], wfm_logic.DEVICE_ID,
-            wfm_logic.ITEM_USER_SETTINGS.copy(), # Pass a copy of current settings
-            emit_update_to_client # Pass the callback
-        ),
-        daemon=True # Daemonize thread so it exits when main app does
-    )
-    processing_thread.start()
-    return jsonify({"success": True, "message": "Processing started."})
+    return emit_update_to_client
 
 
 @app.route('/stop_processing', methods=['POST'])
 def stop_processing_route():
-    global processing_thread
-    if processing_thread is None or not processing_thread.is_alive():
+    if not processing_is_active():
         message = "Processing is not currently running."
-        socketio.emit('new_log_message', {'message': message, 'type': 'warn', 'item_id': None, 'data': {}})
+        emit_to_clients('new_log_message', {'message': message, 'type': 'warn', 'item_id': None, 'data': {}})
         return jsonify({"success": False, "message": message})
 
     print("Flask App: Received request to stop processing.")
-    wfm_logic.stop_processing_flag = True
-    message = "Stop signal sent. Processing will halt after the current cycle or delay."
-    socketio.emit('new_log_message', {'message': message, 'type': 'warn', 'item_id': None, 'data': {}})
-    return jsonify({"success": True, "message": message})
+    stop_requested_at = time.perf_counter()
+    wfm_logic.request_stop_processing()
+    # The token wakes each thread's sleep or aborts its in-flight request, so they normally exit within milliseconds
+    confirm_deadline = time.monotonic() + STOP_CONFIRM_TIMEOUT_SECONDS
+    for thread in processing_threads.values(): thread.join(timeout=max(0.0, confirm_deadline - time.monotonic()))
+    stopped = not processing_is_active()
+    if stopped:
+        message = f"Processing stopped ({(time.perf_counter() - stop_requested_at) * 1000:.0f} ms)."
+    else:
+        message = "Stop signal sent. Processing is finishing its current step and will halt shortly."
+    emit_to_clients('new_log_message', {'message': message, 'type': 'warn', 'item_id': None, 'data': {}})
+    return jsonify({"success": True, "stopped": stopped, "message": message})
 
 @app.route('/processing_status', methods=['GET']) # For polling if needed, or initial state check
 def processing_status_route():
-    global processing_thread
-    is_running = processing_thread is not None and processing_thread.is_alive()
-    return jsonify({"is_processing": is_running})
+    platforms = {platform: {"is_processing": thread.is_alive(), "bump_queue": wfm_logic.get_platform_engine(platform).bump_scheduler.status()}
+                 for platform, thread in processing_threads.items()}
+    return jsonify({"is_processing": processing_is_active(), "bump_queue": wfm_logic.BUMP_SCHEDULER.status(), "platforms": platforms})
 
 
 @app.route('/update_min_price', methods=['POST'])
@@ -481,13 +754,21 @@ def update_min_price_route():
     if not item_id_str:
         return jsonify({"success": False, "message": "Item ID is missing."}), 400
 
+    # Settings are per platform (default: the order table's); see wfm_logic.item_settings_key
+    platform = data.get('platform') or wfm_logic.PLATFORM
+    if platform not in wfm_engine.SUPPORTED_PLATFORMS:
+        return jsonify({"success": False, "message": f"Unknown platform '{platform}'."}), 400
+    settings_key = wfm_logic.item_settings_key(item_id_str, platform)
+
     item_name = wfm_logic.ITEM_ID_TO_DETAILS_MAP.get(item_id_str, {}).get("name", f"Item ID {item_id_str}")
+    if platform != wfm_logic.PLATFORM: item_name = f"{item_name} [{platform.upper()}]"
 
-    # Initialize settings for the item if it's not already in ITEM_USER_SETTINGS
-    if item_id_str not in wfm_logic.ITEM_USER_SETTINGS:
-        wfm_logic.ITEM_USER_SETTINGS[item_id_str] = {"numeric_min": None, "skipped": False}
+    # Initialize settings for the item if it's not already in ITEM_USER_SETTINGS. Another platform's first entry
+    # starts from the shared one it was falling back to, so changing one field keeps the others.
+    if settings_key not in wfm_logic.ITEM_USER_SETTINGS:
+        wfm_logic.ITEM_USER_SETTINGS[settings_key] = dict(wfm_logic.get_item_settings(item_id_str, platform) or {"numeric_min": None, "skipped": False})
     
-    original_settings = wfm_logic.ITEM_USER_SETTINGS[item_id_str].copy() # For comparison
+    original_settings = wfm_logic.ITEM_USER_SETTINGS[settings_key].copy() # For comparison
 
     message_parts = []
     log_type = "info" # Default log type
@@ -513,25 +794,57 @@ def update_min_price_route():
                 log_type = "error"
                 message_parts.append(f"Error for '{item_name}': invalid numeric min value '{val_raw}'.")
     
+    # Maximum bid for a buy order of this item (repriced alongside the sell order; same rules as numeric_min)
+    new_numeric_max_target = original_settings.get("numeric_max")
+    if 'numeric_max' in data: # Only process if key exists in payload
+        val_raw = data['numeric_max']
+        if val_raw is None or (isinstance(val_raw, str) and val_raw.strip() == ""): # Empty string or null means clear
+            new_numeric_max_target = None
+        else:
+            try:
+                price_val = int(val_raw)
+                if price_val <= 0: # Must be positive
+                    log_type = "error"
+                    message_parts.append(f"Error for '{item_name}': numeric max must be positive.")
+                else:
+                    new_numeric_max_target = price_val
+            except (ValueError, TypeError):
+                log_type = "error"
+                message_parts.append(f"Error for '{item_name}': invalid numeric max value '{val_raw}'.")
+
     new_skipped_status_target = original_settings.get("skipped", False) # Default to false if not present #
     if 'skipped' in data and isinstance(data['skipped'], bool): # Only process if key exists and is boolean
         new_skipped_status_target = data['skipped']
 
+    # The buy order has its own skip, so the sell side can be skipped while the bid is still repriced (and vice versa)
+    new_buy_skipped_status_target = original_settings.get("buy_skipped", False)
+    if 'buy_skipped' in data and isinstance(data['buy_skipped'], bool):
+        new_buy_skipped_status_target = data['buy_skipped']
 
     if log_type != "error": # Only proceed if no validation errors so far
         if new_numeric_min_target != original_settings.get("numeric_min"):
-            wfm_logic.ITEM_USER_SETTINGS[item_id_str]["numeric_min"] = new_numeric_min_target
+            wfm_logic.ITEM_USER_SETTINGS[settings_key]["numeric_min"] = new_numeric_min_target
             settings_were_actually_changed = True
             message_parts.append(f"Numeric min for '{item_name}' {'cleared' if new_numeric_min_target is None else f'set to {new_numeric_min_target}p'}.")
 
+        if new_numeric_max_target != original_settings.get("numeric_max"):
+            wfm_logic.ITEM_USER_SETTINGS[settings_key]["numeric_max"] = new_numeric_max_target
+            settings_were_actually_changed = True
+            message_parts.append(f"Buy order max for '{item_name}' {'cleared' if new_numeric_max_target is None else f'set to {new_numeric_max_target}p'}.")
+
         if new_skipped_status_target != original_settings.get("skipped", False): # Also check original 'skipped'
-            wfm_logic.ITEM_USER_SETTINGS[item_id_str]["skipped"] = new_skipped_status_target
+            wfm_logic.ITEM_USER_SETTINGS[settings_key]["skipped"] = new_skipped_status_target
             settings_were_actually_changed = True
             message_parts.append(f"'{item_name}' skip status changed to {'skipped' if new_skipped_status_target else 'not skipped'}.")
+
+        if new_buy_skipped_status_target != original_settings.get("buy_skipped", False):
+            wfm_logic.ITEM_USER_SETTINGS[settings_key]["buy_skipped"] = new_buy_skipped_status_target
+            settings_were_actually_changed = True
+            message_parts.append(f"'{item_name}' buy order skip status changed to {'skipped' if new_buy_skipped_status_target else 'not skipped'}.")
         
         if not settings_were_actually_changed:
             # If payload had keys but values matched originals
-            if 'numeric_min' in data or 'skipped' in data:
+            if 'numeric_min' in data or 'numeric_max' in data or 'skipped' in data or 'buy_skipped' in data:
                  message_parts.append(f"Settings for '{item_name}' are already as requested.")
             else: # No relevant keys in payload
                  message_parts.append(f"No update data provided for '{item_name}'.")
@@ -550,9 +863,9 @@ def update_min_price_route():
             log_type = "warn" # Downgrade if save failed
     
     # Emit log to client
-    socketio.emit('new_log_message', {
-        'message': final_message, 'type': log_type, 'item_id': item_id_str,
-        'data': {'new_settings': wfm_logic.ITEM_USER_SETTINGS[item_id_str].copy()} if success_status else {} # Send new state on success
+    emit_to_clients('new_log_message', {
+        'message': final_message, 'type': log_type, 'item_id': item_id_str if platform == wfm_logic.PLATFORM else None, # Table rows are the default platform's
+        'data': {'new_settings': wfm_logic.ITEM_USER_SETTINGS[settings_key].copy()} if success_status else {} # Send new state on success
     })
 
     return jsonify({
@@ -560,11 +873,45 @@ def update_min_price_route():
         "message": final_message,
         "itemId": item_id_str, # For JS to confirm which item was updated
         "itemName": item_name,
-        "new_numeric_min": wfm_logic.ITEM_USER_SETTINGS[item_id_str].get("numeric_min"),
-        "new_skipped_status": wfm_logic.ITEM_USER_SETTINGS[item_id_str].get("skipped", False),
+        "platform": platform,
+        "new_numeric_min": wfm_logic.ITEM_USER_SETTINGS[settings_key].get("numeric_min"),
+        "new_numeric_max": wfm_logic.ITEM_USER_SETTINGS[settings_key].get("numeric_max"),
+        "new_skipped_status": wfm_logic.ITEM_USER_SETTINGS[settings_key].get("skipped", False),
+        "new_buy_skipped_status": wfm_logic.ITEM_USER_SETTINGS[settings_key].get("buy_skipped", False),
         "save_warning": log_type == "warn" and settings_were_actually_changed # Flag if save failed but change was made
     }), 200 if success_status else 400
 
+@app.route('/platform_orders', methods=['GET'])
+def platform_orders_route():
+    # Our listings on another processing platform with the settings the analysis engine applies to them, so their
+    # min/max/skip can be seen and edited (the order table only shows the default platform). settings_source is
+    # "platform" for the platform's own entry, "shared" when it falls back to the item-only one, None if unset.
+    if not session.get('wfm_jwt') or not session.get('wfm_user_id') or not session.get('wfm_ingame_name'):
+        return jsonify({"success": False, "message": "Not authenticated."}), 401
+    platform = request.args.get('platform') or wfm_logic.PLATFORM
+    if platform not in wfm_engine.SUPPORTED_PLATFORMS:
+        return jsonify({"success": False, "message": f"Unknown platform '{platform}'."}), 400
+    previous_engine = wfm_engine.bound_engine()
+    wfm_engine.bind(wfm_logic.get_platform_engine(platform)) # Own orders (ledger or live fetch) of that platform
+    try:
+        orders, _ = wfm_logic.get_own_orders(wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt'])
+    finally:
+        wfm_engine.bind(previous_engine)
+    if orders is None:
+        return jsonify({"success": False, "message": f"Failed to fetch your {platform.upper()} orders."}), 502
+    listings = []
+    for order in orders:
+        if order.get("type") not in ("sell", "buy"): continue
+        item_id_str = order.get("item_id")
+        if wfm_logic.item_settings_key(item_id_str, platform) in wfm_logic.ITEM_USER_SETTINGS: settings_source = "platform"
+        else: settings_source = "shared" if wfm_logic.get_item_settings(item_id_str, platform) is not None else None
+        listings.append({"item_id": item_id_str, "item_name": order.get("item_name"), "type": order.get("type"), "visible": order.get("visible"),
+                         "platinum": order.get("platinum"), "quantity": order.get("quantity"), "settings_source": settings_source,
+                         "numeric_min_price": order.get("numeric_min_price"), "is_skipped": order.get("is_skipped"),
+                         "numeric_max_price": order.get("numeric_max_price"), "is_buy_skipped": order.get("is_buy_skipped")})
+    listings.sort(key=lambda listing: (listing["type"] != "sell", (listing["item_name"] or "").lower()))
+    return jsonify({"success": True, "platform": platform, "orders": listings})
+
 @app.route('/request_order_update', methods=['POST'])
 def request_order_update_route():
     if not session.get('wfm_jwt') or not session.get('wfm_csrf') or not session.get('wfm_user_id'):
@@ -585,11 +932,11 @@ def request_order_update_route():
        not isinstance(new_price, int) or not isinstance(new_quantity, int) or not isinstance(new_visible, bool): #
         
         error_msg_detail = f"Order update validation failed for '{item_name}' (Order ID: {order_id}, Item ID: {item_id}). Received: price={new_price}, qty={new_quantity}, visible={new_visible}."
-        socketio.emit('new_log_message', {'message': error_msg_detail, 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': error_msg_detail, 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Missing or invalid parameters for order update."}), 400
     
     if new_quantity < 0: # WFM API might reject, good to catch early
-        socketio.emit('new_log_message', {'message': f"Order update failed for '{item_name}': Quantity cannot be negative.", 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': f"Order update failed for '{item_name}': Quantity cannot be negative.", 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Quantity cannot be negative."}), 400
 
     # Call the wfm_logic function to update the order
@@ -614,13 +961,13 @@ def request_order_update_route():
         # Construct a more user-friendly log message
         log_message = f"Update request for '{item_name}' (Order ID: {order_id}) sent with Qty: {new_quantity}, Visible: {new_visible}. WFM API success."
         
-        # After successful update, re-fetch all orders and send snapshot
-        all_orders_snapshot_data, _ = wfm_logic.fetch_orders_from_profile_page(
+        # After successful update, send the orders snapshot (ledger already patched by the PUT; no re-scrape while fresh)
+        all_orders_snapshot_data, _ = wfm_logic.get_own_orders(
             wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt']
         )
         if all_orders_snapshot_data is not None:
             current_sell_orders_for_ui = [o for o in all_orders_snapshot_data if o.get("type") == "sell"]
-            socketio.emit('sell_orders_snapshot', {'orders': current_sell_orders_for_ui})
+            emit_orders_snapshot(current_sell_orders_for_ui)
         else:
             snapshot_refresh_failed = True # Flag this
             print(f"Flask App: Warning - Failed to fetch orders for snapshot after update of order {order_id}.")
@@ -630,13 +977,77 @@ def request_order_update_route():
     else: # API call failed
         log_message = f"Failed to update '{item_name}' (Order ID: {order_id}). Reason: {api_message}"
 
-    socketio.emit('new_log_message', {'message': log_message.strip(), 'type': log_type, 'item_id': item_id})
+    emit_to_clients('new_log_message', {'message': log_message.strip(), 'type': log_type, 'item_id': item_id})
     return jsonify({"success": success, "message": log_message.strip(), "api_response_detail": api_message if not success else "Update successful." })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    # Prometheus scrape endpoint (text exposition format)
+    return wfm_metrics.render_latest(), 200, {'Content-Type': wfm_metrics.CONTENT_TYPE_LATEST}
+
+
+@app.route('/logs', methods=['GET'])
+def logs_route():
+    # Console backlog for this account: /logs?since=<seq> pages forward from the last line a tab has seen,
+    # /logs without since returns the newest lines (page load). See wfm_logbook.LogBook.page.
+    since = request.args.get('since', type=int)
+    limit = min(max(1, request.args.get('limit', default=200, type=int)), LOG_BACKLOG_MAX_PAGE)
+    return jsonify(LOG_BOOK.page(session.get('wfm_user_id'), since=since, limit=limit))
+
+
+@app.route('/trace_summaries', methods=['GET'])
+def trace_summaries_route():
+    # Most recent per-cycle phase summaries (newest last)
+    return jsonify({"summaries": list(wfm_tracing.RECENT_SUMMARIES)})
+
+@app.route('/profiler/start', methods=['POST'])
+def profiler_start_route():
+    # Arms cProfile or the stack sampler for the next N analysis cycles of each running platform.
+    # Note: under gevent cProfile sees every greenlet on the main thread while a cycle runs, not only the analysis one.
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'sampling')
+    try:
+        cycles = int(data.get('cycles', 1))
+        sample_interval_ms = float(data.get('sample_interval_ms', 5))
+        wfm_tracing.PROFILER.arm(mode, cycles, sample_interval_ms)
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "message": f"Invalid profiler request: {e}"}), 400
+    message = f"Profiler armed: {mode} for the next {cycles} cycle(s) of each platform."
+    emit_to_clients('new_log_message', {'message': message, 'type': 'info', 'item_id': None, 'data': {}})
+    return jsonify({"success": True, "message": message, "status": wfm_tracing.PROFILER.status()})
+
+@app.route('/profiler/status', methods=['GET'])
+def profiler_status_route():
+    return jsonify(wfm_tracing.PROFILER.status())
+
+@app.route('/profiler/download', methods=['GET'])
+def profiler_download_route():
+    # format=collapsed (sampling; feed to flamegraph.pl or speedscope), pstats (cProfile .prof file) or text (cProfile report)
+    profiler_status = wfm_tracing.PROFILER.status()
+    if profiler_status["active"]:
+        return jsonify({"success": False, "message": "Profiler is still collecting. Try again once the armed cycles finish."}), 409
+    output_format = request.args.get('format', 'collapsed')
+    if output_format == 'collapsed':
+        body = wfm_tracing.PROFILER.collapsed_stacks()
+        if not body: return jsonify({"success": False, "message": "No sampling profile available."}), 404
+        return body, 200, {'Content-Type': 'text/plain; charset=utf-8', 'Content-Disposition': 'attachment; filename=wfm_profile.collapsed'}
+    if output_format == 'pstats':
+        body = wfm_tracing.PROFILER.pstats_bytes()
+        if body is None: return jsonify({"success": False, "message": "No cProfile data available."}), 404
+        return body, 200, {'Content-Type': 'application/octet-stream', 'Content-Disposition': 'attachment; filename=wfm_profile.prof'}
+    if output_format == 'text':
+        body = wfm_tracing.PROFILER.pstats_text()
+        if body is None: return jsonify({"success": False, "message": "No cProfile data available."}), 404
+        return body, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return jsonify({"success": False, "message": f"Unknown format '{output_format}'. Use collapsed, pstats or text."}), 400
+
+
 @socketio.on('connect')
 def handle_connect():
     print(f'Client connected: {request.sid}')
+    user_id = session.get('wfm_user_id') # Socket.IO gets a copy of the Flask session from the handshake cookie
+    if user_id: join_room(account_room(user_id))
     # Consider emitting initial status or requesting data if needed upon new connection
     # For example, current processing status, or a fresh order snapshot if appropriate
 
@@ -659,7 +1070,7 @@ def delete_order_route():
 
     if not order_id or not isinstance(item_id, str) or not item_id.strip():
         error_msg_detail = f"Order deletion validation failed for '{item_name}': Missing order_id or item_id."
-        socketio.emit('new_log_message', {'message': error_msg_detail, 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': error_msg_detail, 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Missing or invalid parameters for order deletion."}), 400
 
     # Call the wfm_logic function to delete the order using V2 API
@@ -680,14 +1091,14 @@ def delete_order_route():
         log_message = f"Order for '{item_name}' (Order ID: {order_id}) successfully deleted from WFM."
         action_message_for_ui = f"'{item_name}' listing deleted."
         
-        # After successful deletion, re-fetch all orders and send snapshot
-        print(f"Flask App: Order {order_id} deleted. Re-fetching orders for snapshot.")
-        all_orders_snapshot_data, _ = wfm_logic.fetch_orders_from_profile_page(
+        # After successful deletion, send the orders snapshot (ledger already patched by the DELETE)
+        print(f"Flask App: Order {order_id} deleted. Sending orders snapshot.")
+        all_orders_snapshot_data, _ = wfm_logic.get_own_orders(
             wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt']
         )
         if all_orders_snapshot_data is not None:
             current_sell_orders_for_ui = [o for o in all_orders_snapshot_data if o.get("type") == "sell"]
-            socketio.emit('sell_orders_snapshot', {'orders': current_sell_orders_for_ui})
+            emit_orders_snapshot(current_sell_orders_for_ui)
             print(f"Flask App: Emitted updated sell_orders_snapshot after order deletion.")
         else:
             print(f"Flask App: Warning - Failed to fetch orders for snapshot after deletion of order {order_id}.")
@@ -700,7 +1111,7 @@ def delete_order_route():
         # action_message_for_ui is already api_message or a derivative
 
     # Emit detailed log to script log area
-    socketio.emit('new_log_message', {'message': log_message, 'type': log_type, 'item_id': item_id, 'data': {'order_id_deleted': order_id} if success else {}})
+    emit_to_clients('new_log_message', {'message': log_message, 'type': log_type, 'item_id': item_id, 'data': {'order_id_deleted': order_id} if success else {}})
     # Return a simpler message for the action message area
     return jsonify({"success": success, "message": action_message_for_ui })
 
@@ -726,25 +1137,25 @@ def place_order_route():
 
     # --- Validation ---
     if not item_id: # Item ID is crucial
-        socketio.emit('new_log_message', {'message': f"Place Order Error: Item ID is missing.", 'type': 'error'})
+        emit_to_clients('new_log_message', {'message': f"Place Order Error: Item ID is missing.", 'type': 'error'})
         return jsonify({"success": False, "message": "Item ID is missing. Please select an item."}), 400
     try:
         price = int(price_str) #
         if price <= 0: raise ValueError("Price must be positive.")
     except (ValueError, TypeError):
-        socketio.emit('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid price '{price_str}'.", 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid price '{price_str}'.", 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Price must be a positive whole number."}), 400
     try:
         quantity = int(quantity_str) #
         if quantity <= 0: raise ValueError("Quantity must be positive.")
     except (ValueError, TypeError):
-        socketio.emit('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid quantity '{quantity_str}'.", 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid quantity '{quantity_str}'.", 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Quantity must be a positive whole number."}), 400
     try:
         rank = int(rank_str) # Rank can be 0
         if rank < 0: raise ValueError("Rank cannot be negative.")
     except (ValueError, TypeError):
-        socketio.emit('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid rank '{rank_str}'.", 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': f"Place Order Error for '{item_name_for_log}': Invalid rank '{rank_str}'.", 'type': 'error', 'item_id': item_id})
         return jsonify({"success": False, "message": "Rank must be a non-negative whole number (0 if not applicable)."}), 400
     
     app_numeric_min = None #
@@ -752,10 +1163,10 @@ def place_order_route():
         try:
             app_numeric_min = int(app_min_price_str) #
             if app_numeric_min <= 0: #
-                socketio.emit('new_log_message', {'message': f"Place Order Info for '{item_name_for_log}': Optional app min price '{app_min_price_str}' invalid, will not be saved.", 'type': 'warn', 'item_id': item_id})
+                emit_to_clients('new_log_message', {'message': f"Place Order Info for '{item_name_for_log}': Optional app min price '{app_min_price_str}' invalid, will not be saved.", 'type': 'warn', 'item_id': item_id})
                 app_numeric_min = None # Don't save invalid app min price
         except (ValueError, TypeError):
-            socketio.emit('new_log_message', {'message': f"Place Order Info for '{item_name_for_log}': Optional app min price '{app_min_price_str}' invalid, will not be saved.", 'type': 'warn', 'item_id': item_id})
+            emit_to_clients('new_log_message', {'message': f"Place Order Info for '{item_name_for_log}': Optional app min price '{app_min_price_str}' invalid, will not be saved.", 'type': 'warn', 'item_id': item_id})
             app_numeric_min = None #
 
 
@@ -777,7 +1188,7 @@ def place_order_route():
     if success:
         log_type = "success"
         final_user_message = f"Successfully placed order for '{item_name_for_log}' (Price: {price}p, Qty: {quantity}, Rank: {rank})."
-        socketio.emit('new_log_message', {'message': final_user_message, 'type': log_type, 'item_id': listed_item_id}) # Use listed_item_id from response
+        emit_to_clients('new_log_message', {'message': final_user_message, 'type': log_type, 'item_id': listed_item_id}) # Use listed_item_id from response
 
         # Save app-specific settings if provided and order placement was successful
         settings_changed_for_new_item = False #
@@ -788,35 +1199,35 @@ def place_order_route():
             if app_numeric_min is not None: #
                 wfm_logic.ITEM_USER_SETTINGS[listed_item_id]["numeric_min"] = app_numeric_min
                 settings_changed_for_new_item = True
-                socketio.emit('new_log_message', {'message': f"App setting: Min price for new listing '{item_name_for_log}' set to {app_numeric_min}p.", 'type': 'info', 'item_id': listed_item_id})
+                emit_to_clients('new_log_message', {'message': f"App setting: Min price for new listing '{item_name_for_log}' set to {app_numeric_min}p.", 'type': 'info', 'item_id': listed_item_id})
 
             if app_skip_reprice: # app_skip_reprice is a boolean #
                 wfm_logic.ITEM_USER_SETTINGS[listed_item_id]["skipped"] = True
                 settings_changed_for_new_item = True
-                socketio.emit('new_log_message', {'message': f"App setting: New listing '{item_name_for_log}' set to be skipped for auto-repricing.", 'type': 'info', 'item_id': listed_item_id})
+                emit_to_clients('new_log_message', {'message': f"App setting: New listing '{item_name_for_log}' set to be skipped for auto-repricing.", 'type': 'info', 'item_id': listed_item_id})
             
             if settings_changed_for_new_item:
                 if not wfm_logic.save_config(session['wfm_user_id']): # Save to config.json
-                    socketio.emit('new_log_message', {'message': f"Warning: Failed to save app settings for new item '{item_name_for_log}' to config.", 'type': 'warn', 'item_id': listed_item_id})
+                    emit_to_clients('new_log_message', {'message': f"Warning: Failed to save app settings for new item '{item_name_for_log}' to config.", 'type': 'warn', 'item_id': listed_item_id})
                     final_user_message += " (App settings save failed)" # Append to user message
 
 
-        # Refresh order list in UI by emitting snapshot
-        all_orders_snapshot_data, _ = wfm_logic.fetch_orders_from_profile_page(
+        # Refresh order list in UI by emitting snapshot (ledger patched from the POST response, or re-scraped if that failed)
+        all_orders_snapshot_data, _ = wfm_logic.get_own_orders(
             wfm_logic.main_session, session['wfm_ingame_name'], session['wfm_jwt']
         )
         if all_orders_snapshot_data is not None:
             current_sell_orders_for_ui = [o for o in all_orders_snapshot_data if o.get("type") == "sell"]
-            socketio.emit('sell_orders_snapshot', {'orders': current_sell_orders_for_ui})
-            socketio.emit('new_log_message', {'message': "Order list refreshed after placing new order.", 'type': 'info'})
+            emit_orders_snapshot(current_sell_orders_for_ui)
+            emit_to_clients('new_log_message', {'message': "Order list refreshed after placing new order.", 'type': 'info'})
         else:
             # Problem fetching new orders list
-            socketio.emit('new_log_message', {'message': "Warning: Failed to refresh order list after placing new order.", 'type': 'warn'})
+            emit_to_clients('new_log_message', {'message': "Warning: Failed to refresh order list after placing new order.", 'type': 'warn'})
             final_user_message += " (UI refresh failed)" # Append to user message
             if log_type == "success": log_type = "warn" # Downgrade overall status if refresh failed
 
     else: # API call failed
-        socketio.emit('new_log_message', {'message': f"Failed to place order for '{item_name_for_log}': {api_message}", 'type': 'error', 'item_id': item_id})
+        emit_to_clients('new_log_message', {'message': f"Failed to place order for '{item_name_for_log}': {api_message}", 'type': 'error', 'item_id': item_id})
         # final_user_message is already api_message
 
     return jsonify({"success": success, "message": final_user_message})
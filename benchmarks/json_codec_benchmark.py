@@ -0,0 +1,87 @@
+# benchmarks/json_codec_benchmark.py
+# Encode/decode timings of the JSON payloads on our hot paths, for every available backend
+# (stdlib json, orjson if installed) and for wfm_json, the codec the app actually uses.
+#
+# Usage (from the repo root):
+#   python benchmarks/json_codec_benchmark.py --orders 2000 --items 3000 --repeat 20
+#
+# Payloads: an order book response (decoded on every competitor fetch), the profile page application-state
+# blob, config.json (pretty-printed on every save), the autocomplete catalog (embedded in the page) and an
+# analysis snapshot like the ones emitted over Socket.IO.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import wfm_json  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _object_id(rng): return "%024x" % rng.getrandbits(96)
+
+
+def build_payloads(order_count, item_count, seed=1):
+    rng = random.Random(seed)
+    book = {"apiVersion": "0.0.0", "error": None, "data": [
+        {"id": _object_id(rng), "type": rng.choice(["sell", "buy"]), "platinum": rng.randint(1, 300), "quantity": rng.randint(1, 5),
+         "perTrade": 1, "rank": 0, "visible": True, "createdAt": "2024-01-01T00:00:00Z", "updatedAt": "2024-01-01T00:00:00Z", "itemId": _object_id(rng),
+         "user": {"id": _object_id(rng), "ingameName": f"Seller{i}", "slug": f"seller{i}", "reputation": rng.randint(0, 500),
+                  "platform": "pc", "status": rng.choice(["ingame", "online", "offline"])}} for i in range(order_count)]}
+    own_orders = [{"id": _object_id(rng), "platinum": rng.randint(1, 300), "quantity": 1, "order_type": rng.choice(["sell", "buy"]), "visible": True,
+                   "mod_rank": None, "item": {"id": _object_id(rng), "url_name": f"item_{i}", "icon": f"items/images/en/item_{i}.png",
+                                             "en": {"item_name": f"Item {i}"}}} for i in range(150)]
+    app_state = {"currentUser": {"id": _object_id(rng), "status": "ingame", "ingame_name": "Tenno"},
+                 "payload": {"sell_orders": [o for o in own_orders if o["order_type"] == "sell"], "buy_orders": [o for o in own_orders if o["order_type"] == "buy"]}}
+    config = {"user_id": _object_id(rng), "device_id": "d-" + _object_id(rng), "loop_delay_seconds": 10, "bump_threshold_cycles": 5,
+              "item_price_settings": {_object_id(rng): {"numeric_min": rng.randint(1, 100), "skipped": rng.random() < 0.1} for _ in range(300)}}
+    catalog = [{"id": _object_id(rng), "name": f"Item Name {i}", "max_rank": rng.choice([None, 3, 5, 10])} for i in range(item_count)]
+    snapshot = {"orders": [{"order_id": o["id"], "item_id": o["item"]["id"], "item_name": o["item"]["en"]["item_name"], "platinum": o["platinum"],
+                            "quantity": o["quantity"], "visible": True, "icon_url": "https://warframe.market/static/assets/" + o["item"]["icon"],
+                            "lowest_competitor": rng.randint(1, 300), "competitor_count": rng.randint(0, 9), "status": "ok"} for o in own_orders],
+                "cycle": 42, "elapsed_s": 12.5}
+    return {"order_book": book, "app_state": app_state, "config": config, "catalog": catalog, "snapshot": snapshot}
+
+
+def best_of(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter(); function(); best = min(best, time.perf_counter() - start)
+    return best
+
+
+def codecs_to_test():
+    codecs = {"stdlib": (lambda obj, pretty: json.dumps(obj, indent=4 if pretty else None), json.loads)}
+    if orjson is not None:
+        codecs["orjson"] = (lambda obj, pretty: orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0), orjson.loads)
+    codecs[f"wfm_json({wfm_json.BACKEND})"] = (lambda obj, pretty: wfm_json.dumps(obj, indent=4 if pretty else None), wfm_json.loads)
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON encode/decode of WFM Helper payloads.")
+    parser.add_argument("--orders", type=int, default=2000, help="Orders in the synthetic order book")
+    parser.add_argument("--items", type=int, default=3000, help="Items in the synthetic catalog")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per measurement (best is reported)")
+    args = parser.parse_args()
+    if orjson is None: print("orjson is not installed: only the stdlib backend is measured.")
+
+    payloads = build_payloads(args.orders, args.items)
+    print(f"{'payload':<11} {'KB':>7} | {'codec':<17} {'encode ms':>9} {'decode ms':>9}")
+    for name, payload in payloads.items():
+        pretty = name == "config" # config.json is the only payload written indented
+        encoded = json.dumps(payload).encode("utf-8")
+        for codec_name, (encode, decode) in codecs_to_test().items():
+            encode_time = best_of(lambda: encode(payload, pretty), args.repeat)
+            decode_time = best_of(lambda: decode(encoded), args.repeat)
+            print(f"{name:<11} {len(encoded) / 1024:>7.0f} | {codec_name:<17} {encode_time * 1000:>9.3f} {decode_time * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
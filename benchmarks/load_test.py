@@ -0,0 +1,338 @@
+# benchmarks/load_test.py
+# Load test for the gevent Flask + Socket.IO server in app.py: N dashboard clients on Socket.IO, a scripted mix
+# of HTTP route calls, and the analysis thread running, all against mock_wfm_server.py (never the real API).
+#
+# Usage (from the repo root):
+#   python benchmarks/load_test.py --clients 1 10 50 --duration 30 --http-workers 4 --seed 1
+#   python benchmarks/load_test.py --clients 100 --mix "processing_status=5,update_min_price=5" --json-out report.json
+#
+# The harness starts the mock upstream and the app (a fresh HOME, so your config.json is never touched) on free
+# ports, signs in with a fake JWT, sets a min price on every listing and starts processing. Then, for each
+# --clients step: connect the clients (they join the account room through the session cookie, like a browser
+# tab), run the HTTP workers for --duration seconds, disconnect. Per step it reports:
+#   route p50/p99     latency of each HTTP route in the mix (closed loop: a worker sends its next call when the
+#                     previous one has answered, plus --think-ms), and the error count
+#   emit lag p50/p99  time from the server stamping a console line (LogBook "ts") to a client receiving it
+#   dropped           console lines the server emitted while a client was connected that the client never got,
+#                     checked against the server's own /logs backlog (polled throughout, so nothing is evicted)
+#   server CPU / RSS  from the app's /metrics (CPU % of one core over the step, peak resident memory)
+# The mix, the mock server's market and the client schedule all come from --seed, so a step that falls over
+# (lag or drops climbing, p99 past a second) can be rerun as is. Without the 'websocket-client' package the
+# Socket.IO clients fall back to long-polling, which is also how the browser connects behind some proxies.
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import socketio
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "processing_status=4,update_min_price=3,logs=2,index=1,ready=1,autocomplete_items=1"
+METRIC_NAMES = ("wfm_process_cpu_seconds_total", "wfm_process_resident_memory_bytes")
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0)); return probe.getsockname()[1]
+
+
+def fake_jwt():
+    # The mock accepts any bearer token; the app only reads the csrf_token claim
+    b64 = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{b64({'alg': 'HS256'})}.{b64({'csrf_token': 'loadtest-csrf', 'iat': 1})}.sig"
+
+
+def percentile(values, fraction):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))] # Nearest rank
+
+
+def parse_mix(mix_text):
+    mix = {}
+    for part in mix_text.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip(): mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def wait_for(url, timeout_seconds, ok_statuses=(200,)):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code in ok_statuses: return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+class Servers:
+    """The mock upstream and the app, each in its own process."""
+
+    def __init__(self, args):
+        self.args = args; self.processes = []
+        self.home = tempfile.mkdtemp(prefix="wfm_loadtest_")
+        self.mock_port = free_port(); self.app_port = free_port()
+        self.mock_url = f"http://127.0.0.1:{self.mock_port}"; self.app_url = f"http://127.0.0.1:{self.app_port}"
+
+    def start(self):
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "mock_wfm_server.py", "--port", str(self.mock_port), "--items", str(self.args.items),
+             "--own-orders", str(self.args.own_orders), "--latency-ms", str(self.args.upstream_latency_ms), "--latency-jitter-ms", "0",
+             "--rate-limit", "0", "--undercut-interval", "2", "--undercut-probability", "0.3", "--seed", str(self.args.seed)],
+            cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        if not wait_for(f"{self.mock_url}/v2/items", 15): raise RuntimeError("Mock server did not start.")
+
+        config_directory = os.path.join(self.home, ".WFM_Helper"); os.makedirs(config_directory)
+        with open(os.path.join(config_directory, "config.json"), "w", encoding="utf-8") as config_file:
+            json.dump({"loop_delay_seconds": self.args.loop_delay}, config_file) # A busy analysis thread: short pauses between cycles
+        environment = dict(os.environ, HOME=self.home, USERPROFILE=self.home,
+                           WFM_API_V1_BASE_URL=f"{self.mock_url}/v1", WFM_API_V2_BASE_URL=f"{self.mock_url}/v2",
+                           WFM_PROFILE_BASE_URL=f"{self.mock_url}/profile", WFM_STATIC_ASSETS_BASE_URL=f"{self.mock_url}/static/assets/")
+        run_app = f"import app; app.socketio.run(app.app, host='127.0.0.1', port={self.app_port}, use_reloader=False, log_output=False)"
+        self.app_log = open(os.path.join(self.home, "app.log"), "w", encoding="utf-8")
+        self.app_process = subprocess.Popen([sys.executable, "-c", run_app], cwd=REPO_ROOT, env=environment, stdout=self.app_log, stderr=subprocess.STDOUT)
+        self.processes.append(self.app_process)
+        if not wait_for(f"{self.app_url}/ready", 60): raise RuntimeError(f"App did not become ready (see {self.app_log.name}).")
+
+    def stop(self, keep_home=False):
+        for process in reversed(self.processes):
+            process.terminate()
+            try: process.wait(timeout=10)
+            except subprocess.TimeoutExpired: process.kill()
+        if getattr(self, "app_log", None): self.app_log.close()
+        if keep_home: print(f"App home (config, app.log) kept at {self.home}")
+        else: shutil.rmtree(self.home, ignore_errors=True)
+
+
+class LogAuditor(threading.Thread):
+    """Polls /logs so every console line the server emits is seen (seq -> server timestamp) before the backlog evicts it."""
+
+    def __init__(self, http, app_url):
+        super().__init__(daemon=True)
+        self.http = http; self.app_url = app_url
+        self.emitted = {}; self.since = None; self.stopping = threading.Event(); self.gaps = 0; self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock: return dict(self.emitted)
+
+    def poll(self):
+        with self._lock: self._poll_locked()
+
+    def _poll_locked(self):
+        while True:
+            params = {"limit": 500} if self.since is None else {"since": self.since, "limit": 500}
+            page = self.http.get(f"{self.app_url}/logs", params=params, timeout=10).json()
+            if page.get("dropped"): self.gaps += 1
+            for entry in page["entries"]: self.emitted[entry["seq"]] = entry["ts"]
+            self.since = page["next_since"]
+            if not page.get("has_more"): return
+
+    def run(self):
+        while not self.stopping.wait(0.5):
+            try: self.poll()
+            except (requests.exceptions.RequestException, ValueError, KeyError): pass
+
+
+class DashboardClient:
+    """One browser tab: a Socket.IO connection that records the console lines and snapshots it receives."""
+
+    def __init__(self, app_url, cookie_header, transports):
+        self.app_url = app_url; self.cookie_header = cookie_header; self.transports = transports
+        self.received = {}; self.lags = []; self.snapshots = 0; self.connected_at = None; self.disconnects = 0; self.closing = False
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("new_log_message", self._on_log); self.sio.on("sell_orders_snapshot", self._on_snapshot)
+        self.sio.on("disconnect", self._on_disconnect)
+
+    def _on_log(self, update):
+        received_at = time.time()
+        if isinstance(update, dict) and "seq" in update:
+            self.received[update["seq"]] = received_at; self.lags.append(received_at - update.get("ts", received_at))
+
+    def _on_snapshot(self, _payload):
+        self.snapshots += 1
+
+    def _on_disconnect(self, *_reason):
+        if not self.closing: self.disconnects += 1 # Dropped by the server or the transport, not by close()
+
+    def connect(self):
+        self.sio.connect(self.app_url, headers={"Cookie": self.cookie_header}, transports=self.transports, wait_timeout=15)
+        self.connected_at = time.time()
+
+    def close(self):
+        self.closing = True
+        try: self.sio.disconnect()
+        except Exception: pass # Already gone
+
+
+class HttpWorker(threading.Thread):
+    """Closed-loop caller of the route mix."""
+
+    def __init__(self, worker_index, args, cookies, app_url, mix, item_ids, stop_event):
+        super().__init__(daemon=True)
+        self.rng = random.Random(args.seed * 1000 + worker_index)
+        self.http = requests.Session(); self.http.cookies.update(cookies)
+        self.app_url = app_url; self.mix = mix; self.item_ids = item_ids; self.stop_event = stop_event
+        self.think_seconds = args.think_ms / 1000.0
+        self.latencies = {route: [] for route in mix}; self.errors = {route: 0 for route in mix}
+
+    def call(self, route):
+        if route == "update_min_price":
+            payload = {"item_id": self.rng.choice(self.item_ids), "numeric_min": self.rng.randint(1, 20)}
+            return self.http.post(f"{self.app_url}/update_min_price", json=payload, timeout=30)
+        if route == "index": return self.http.get(f"{self.app_url}/", headers={"Accept-Encoding": "gzip"}, timeout=30)
+        if route == "logs": return self.http.get(f"{self.app_url}/logs", params={"limit": 200}, timeout=30)
+        return self.http.get(f"{self.app_url}/{route}", timeout=30)
+
+    def run(self):
+        routes = list(self.mix); weights = [self.mix[route] for route in routes]
+        while not self.stop_event.is_set():
+            route = self.rng.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = self.call(route); ok = response.status_code < 500 and response.status_code != 401
+            except requests.exceptions.RequestException:
+                ok = False
+            self.latencies[route].append(time.perf_counter() - started)
+            if not ok: self.errors[route] += 1
+            if self.think_seconds: self.stop_event.wait(self.think_seconds)
+
+
+def read_server_metrics(http, app_url):
+    values = {}
+    for line in http.get(f"{app_url}/metrics", timeout=10).text.splitlines():
+        name, _, value = line.partition(" ")
+        if name in METRIC_NAMES: values[name] = float(value)
+    return values
+
+
+def run_step(client_count, args, servers, http, auditor, mix, item_ids, transports):
+    cookie_header = "; ".join(f"{name}={value}" for name, value in http.cookies.items())
+    clients = [DashboardClient(servers.app_url, cookie_header, transports) for _ in range(client_count)]
+    connect_errors = 0
+    for client in clients:
+        try: client.connect()
+        except socketio.exceptions.ConnectionError: connect_errors += 1
+
+    metrics_before = read_server_metrics(http, servers.app_url); step_started = time.monotonic(); peak_rss = metrics_before.get(METRIC_NAMES[1], 0)
+    stop_event = threading.Event()
+    workers = [HttpWorker(index, args, http.cookies, servers.app_url, mix, item_ids, stop_event) for index in range(args.http_workers)]
+    for worker in workers: worker.start()
+    while time.monotonic() - step_started < args.duration:
+        time.sleep(1.0)
+        peak_rss = max(peak_rss, read_server_metrics(http, servers.app_url).get(METRIC_NAMES[1], 0))
+    stop_event.set()
+    for worker in workers: worker.join(timeout=35)
+    step_seconds = time.monotonic() - step_started; step_ended_at = time.time()
+    metrics_after = read_server_metrics(http, servers.app_url)
+
+    time.sleep(args.drain_seconds) # Let lines emitted just before the end arrive before counting them as dropped
+    auditor.poll()
+    for client in clients: client.close()
+
+    routes = {}
+    for route in mix:
+        latencies = [latency for worker in workers for latency in worker.latencies[route]]
+        routes[route] = {"calls": len(latencies), "errors": sum(worker.errors[route] for worker in workers),
+                         "p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+                         "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None}
+    connected = [client for client in clients if client.connected_at is not None]
+    lags = [lag for client in connected for lag in client.lags]
+    expected = dropped = 0; emitted = auditor.snapshot()
+    for client in connected:
+        for seq, emitted_at in emitted.items():
+            if client.connected_at < emitted_at <= step_ended_at:
+                expected += 1
+                if seq not in client.received: dropped += 1
+    cpu_seconds = metrics_after.get(METRIC_NAMES[0], 0) - metrics_before.get(METRIC_NAMES[0], 0)
+    return {"clients": client_count, "connected": len(connected), "connect_errors": connect_errors,
+            "disconnects": sum(client.disconnects for client in connected),
+            "routes": routes, "requests_per_second": round(sum(route["calls"] for route in routes.values()) / step_seconds, 1),
+            "events_received": sum(len(client.received) for client in connected), "snapshots_received": sum(client.snapshots for client in connected),
+            "emit_lag_p50_ms": round(percentile(lags, 0.5) * 1000, 1) if lags else None,
+            "emit_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 1) if lags else None,
+            "events_expected": expected, "events_dropped": dropped,
+            "server_cpu_percent": round(100 * cpu_seconds / step_seconds, 1), "server_peak_rss_mb": round(peak_rss / 1e6, 1)}
+
+
+def print_step(result):
+    print(f"\n=== {result['clients']} clients ({result['connected']} connected, {result['connect_errors']} failed, "
+          f"{result['disconnects']} unexpected disconnects) ===")
+    print(f"{'route':<20} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<20} {stats['calls']:>6} {stats['errors']:>6} {stats['p50_ms'] if stats['p50_ms'] is not None else '-':>8} {stats['p99_ms'] if stats['p99_ms'] is not None else '-':>8}")
+    print(f"HTTP: {result['requests_per_second']} req/s | Socket.IO: {result['events_received']} console lines, {result['snapshots_received']} snapshots, "
+          f"emit lag p50 {result['emit_lag_p50_ms']} ms / p99 {result['emit_lag_p99_ms']} ms, dropped {result['events_dropped']}/{result['events_expected']}")
+    print(f"Server: {result['server_cpu_percent']}% CPU, peak RSS {result['server_peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test app.py (HTTP routes + Socket.IO clients) against the mock upstream.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50], help="Socket.IO client counts, one step each.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step.")
+    parser.add_argument("--http-workers", type=int, default=4, help="Concurrent closed-loop HTTP callers.")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="Pause between one worker's calls.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route=weight list (default: {DEFAULT_MIX}).")
+    parser.add_argument("--transport", choices=["auto", "websocket", "polling"], default="auto")
+    parser.add_argument("--items", type=int, default=200, help="Mock catalog size.")
+    parser.add_argument("--own-orders", type=int, default=30, help="Mock listings (the analysis thread's work per cycle).")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--loop-delay", type=float, default=1.0, help="loop_delay_seconds for the analysis thread.")
+    parser.add_argument("--drain-seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-out", help="Also write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.transport == "auto":
+        try:
+            import websocket # noqa: F401  (websocket-client, needed by the Socket.IO client for the websocket transport)
+            transports = ["websocket"]
+        except ImportError:
+            transports = ["polling"]
+    else:
+        transports = [args.transport]
+
+    servers = Servers(args)
+    results = []; failed = True
+    try:
+        servers.start()
+        jwt = fake_jwt()
+        http = requests.Session()
+        if not http.post(f"{servers.app_url}/submit_jwt", data={"manual_jwt_token": jwt}, timeout=30).json().get("success"):
+            raise RuntimeError("Sign-in with the mock JWT failed.")
+        http.get(f"{servers.app_url}/", timeout=60) # The page reload after sign-in fills in the profile (in-game name) like the browser's
+        own_orders = requests.get(f"{servers.mock_url}/v2/orders/my", headers={"Authorization": f"Bearer {jwt}"}, timeout=10).json()["data"]
+        item_ids = sorted({order["itemId"] for order in own_orders})
+        for item_id in item_ids: # Processing only starts once every visible listing has a min price
+            http.post(f"{servers.app_url}/update_min_price", json={"item_id": item_id, "numeric_min": 1}, timeout=30)
+        started = http.post(f"{servers.app_url}/start_processing", timeout=60).json()
+        if not started.get("success"): raise RuntimeError(f"Could not start processing: {started.get('message')}")
+        print(f"App on {servers.app_url}, mock upstream on {servers.mock_url}, {len(item_ids)} listings, Socket.IO transport: {transports[0]}")
+
+        auditor = LogAuditor(http, servers.app_url); auditor.poll(); auditor.start()
+        for client_count in args.clients:
+            result = run_step(client_count, args, servers, http, auditor, mix, item_ids, transports)
+            print_step(result); results.append(result)
+        auditor.stopping.set()
+        if auditor.gaps: print(f"\nWarning: the /logs backlog evicted lines before the auditor saw them {auditor.gaps} time(s); dropped counts are a lower bound.")
+        http.post(f"{servers.app_url}/stop_processing", timeout=30); failed = False
+    finally:
+        servers.stop(keep_home=failed)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as json_file:
+            json.dump({"args": vars(args), "transport": transports[0], "steps": results}, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
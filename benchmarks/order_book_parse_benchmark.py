@@ -0,0 +1,108 @@
+# benchmarks/order_book_parse_benchmark.py
+# Peak memory, allocated blocks and time per order book: response.json() + competitor loop (old path)
+# vs the streaming filter in wfm_orderbook.py (new full-book path).
+#
+# Usage (from the repo root):
+#   python benchmarks/order_book_parse_benchmark.py --orders 500 2000 10000 --repeat 5
+#
+# "peak KB" is tracemalloc's peak traced memory while parsing one book (the raw body is allocated before
+# tracing starts, like a body that is already downloaded/streaming in). "peak blocks" is the largest growth
+# in sys.getallocatedblocks() (live Python allocations) seen during the parse: sampled right after
+# json.loads for the full path, and at every chunk read for the streaming path. Timings are measured
+# separately without tracemalloc or sampling, which slow Python down.
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import wfm_orderbook  # noqa: E402
+
+PLATFORM = "pc"
+OUR_USER_ID = "0" * 24
+
+
+def build_book_bytes(order_count, seed=1):
+    # Same shape as a /v2/orders/item/{slug} response (and mock_wfm_server.py's books)
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(order_count):
+        name = f"Seller{rng.randint(1, 99999)}"
+        orders.append({"id": "%024x" % rng.getrandbits(96), "type": "sell" if rng.random() < 0.6 else "buy",
+                       "platinum": rng.randint(1, 300), "quantity": rng.randint(1, 5), "perTrade": 1, "rank": 0, "visible": True,
+                       "createdAt": "2024-01-01T00:00:00Z", "updatedAt": "2024-01-01T00:00:00Z", "itemId": "%024x" % 1,
+                       "user": {"id": "%024x" % rng.getrandbits(96), "ingameName": name, "slug": name.lower(), "reputation": rng.randint(0, 500),
+                                "platform": "pc" if rng.random() < 0.7 else "ps4", "status": rng.choice(["ingame", "ingame", "online", "offline"]),
+                                "avatar": "user/avatar/%024x.png" % rng.getrandbits(96), "locale": "en", "lastSeen": "2024-01-01T00:00:00Z"}})
+    return json.dumps({"apiVersion": "0.0.0", "data": orders, "error": None}).encode("utf-8")
+
+
+def chunked(body, chunk_size=16 * 1024, probe=None):
+    for start in range(0, len(body), chunk_size):
+        if probe: probe()
+        yield body[start:start + chunk_size]
+
+
+def parse_full(body, probe=None):
+    # The pre-streaming path: response.json() then the summarize_competitors loop
+    orders = json.loads(body)["data"]
+    if probe: probe()
+    lowest = float('inf'); count = 0
+    for order in orders:
+        user = order.get("user", {})
+        if user.get("platform") == PLATFORM and order.get("type") == "sell" and user.get("id") != OUR_USER_ID and user.get("status") == "ingame":
+            price = order.get("platinum")
+            if isinstance(price, (int, float)) and price > 0: lowest = min(lowest, price); count += 1
+    return lowest, count
+
+
+def parse_streaming(body, probe=None):
+    book = wfm_orderbook.filter_order_book(chunked(body, probe=probe), PLATFORM, exclude_user_id=OUR_USER_ID)
+    return book.lowest_sell(), len(book.sell_prices)
+
+
+def measure_memory(parse, body):
+    gc.collect()
+    blocks_before = sys.getallocatedblocks(); peak_blocks = [0]
+
+    def probe():
+        peak_blocks[0] = max(peak_blocks[0], sys.getallocatedblocks() - blocks_before)
+
+    tracemalloc.start()
+    result = parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks() # Again without tracemalloc's own bookkeeping blocks
+    parse(body, probe=probe)
+    return result, peak, peak_blocks[0]
+
+
+def measure_time(parse, body, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter(); parse(body); best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs streaming order book parsing.")
+    parser.add_argument("--orders", type=int, nargs="+", default=[500, 2000, 10000], help="Book sizes (orders per book) to test")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per case (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'orders':>7} {'body KB':>8} | {'path':<9} {'peak KB':>9} {'peak blocks':>11} {'best ms':>8} | result")
+    for order_count in args.orders:
+        body = build_book_bytes(order_count)
+        for label, parse in (("full", parse_full), ("streaming", parse_streaming)):
+            result, peak, blocks = measure_memory(parse, body)
+            best = measure_time(parse, body, args.repeat)
+            print(f"{order_count:>7} {len(body) / 1024:>8.0f} | {label:<9} {peak / 1024:>9.0f} {blocks:>11} {best * 1000:>8.1f} | lowest={result[0]} sellers={result[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# mock_wfm_server.py
+# Self-contained local stand-in for the warframe.market endpoints that wfm_logic talks to.
+# Lets us load-test repricing offline: configurable latency, rate limits, 429/5xx injection
+# and simulated competing sellers who undercut each other (and us) over time.
+#
+# Usage:
+#   python mock_wfm_server.py --port 5055 --items 500 --own-orders 300 --latency-ms 80 --rate-limit 3
+# Then point the app at it (environment variables, or the matching config.json keys):
+#   WFM_API_V1_BASE_URL=http://127.0.0.1:5055/v1
+#   WFM_API_V2_BASE_URL=http://127.0.0.1:5055/v2
+#   WFM_PROFILE_BASE_URL=http://127.0.0.1:5055/profile
+#   WFM_STATIC_ASSETS_BASE_URL=http://127.0.0.1:5055/static/assets/
+# Any "Bearer <something>" is accepted as a valid JWT.
+import argparse
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MOCK_USER_NAME = "MockTenno"
+PLATFORMS = ["pc", "ps4", "xbox", "switch"]
+COMPETITOR_STATUSES = ["ingame", "ingame", "online", "offline"] # Weighted towards in-game sellers
+
+
+def _mock_png(width, height, rgb):
+    # Solid-colour PNG for the static assets route (stdlib only: zlib + the PNG chunk layout)
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+    raw_rows = b"".join(b"\x00" + bytes(rgb) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw_rows)) + chunk(b"IEND", b""))
+
+
+def _object_id(rng):
+    # warframe.market ids are 24 hex chars (Mongo ObjectIds)
+    return "%024x" % rng.getrandbits(96)
+
+
+class MockMarketState:
+    """All mutable market data for the stand-in, guarded by a single lock."""
+
+    def __init__(self, options):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.user = {"id": _object_id(self.rng), "ingameName": options.user_name, "slug": options.user_name.lower(),
+                     "status": options.user_status, "reputation": 42, "avatar": None, "platform": "pc"}
+        self.items = [] # List of catalog entries in /v2/items shape
+        self.items_by_id = {}
+        self.items_by_slug = {}
+        self.book_by_slug = {} # slug -> list of competitor orders (v2 shape, our orders are added on read)
+        self.own_orders = {} # order_id -> own order (internal shape)
+        self.stats = {"requests": 0, "by_route": {}, "rate_limited": 0, "injected_5xx": 0, "mutations": 0, "undercuts": 0}
+        self.last_advance = time.time()
+        self._build_catalog()
+        self._build_books()
+        self._build_own_orders()
+
+    # --- Data generation ---
+    def _build_catalog(self):
+        for idx in range(self.options.items):
+            is_mod = idx % 7 == 0
+            name = f"Mock {'Mod' if is_mod else 'Prime Part'} {idx:04d}"
+            slug = name.lower().replace(" ", "_")
+            item = {"id": _object_id(self.rng), "slug": slug, "gameRef": f"/Lotus/Mock/{slug}",
+                    "icon": f"items/images/en/{slug}.png", "tags": ["mod"] if is_mod else ["prime"],
+                    "i18n": {"en": {"item_name": name, "icon": f"items/images/en/{slug}.png"}}}
+            if is_mod: item["maxRank"] = self.rng.choice([3, 5, 10])
+            self.items.append(item)
+            self.items_by_id[item["id"]] = item
+            self.items_by_slug[slug] = item
+
+    def _build_books(self):
+        for item in self.items:
+            base_price = self.rng.randint(5, 120)
+            orders = []
+            for _ in range(self.options.book_size):
+                platform = "pc" if self.rng.random() < 0.7 else self.rng.choice(PLATFORMS[1:])
+                order_type = "sell" if self.rng.random() < 0.6 else "buy"
+                spread = self.rng.randint(0, base_price)
+                price = base_price + spread if order_type == "sell" else max(1, base_price - spread)
+                seller_name = f"Seller{self.rng.randint(1, 99999)}"
+                orders.append({"id": _object_id(self.rng), "type": order_type, "platinum": price,
+                               "quantity": self.rng.randint(1, 5), "perTrade": 1,
+                               "rank": 0 if "maxRank" in item else None, "visible": True,
+                               "createdAt": "2024-01-01T00:00:00Z", "updatedAt": "2024-01-01T00:00:00Z",
+                               "itemId": item["id"],
+                               "user": {"id": _object_id(self.rng), "ingameName": seller_name, "slug": seller_name.lower(),
+                                        "reputation": self.rng.randint(0, 500), "platform": platform,
+                                        "status": self.rng.choice(COMPETITOR_STATUSES)}})
+            self.book_by_slug[item["slug"]] = {"base_price": base_price, "orders": orders}
+
+    def _build_own_orders(self):
+        for item in self.items[:self.options.own_orders]:
+            base_price = self.book_by_slug[item["slug"]]["base_price"]
+            self._add_own_order(item, "sell", base_price + self.rng.randint(0, 10), self.rng.randint(1, 3),
+                                visible=self.rng.random() > 0.1, rank=0 if "maxRank" in item else None)
+        for item in self.items[self.options.own_orders:self.options.own_orders + self.options.own_buy_orders]:
+            base_price = self.book_by_slug[item["slug"]]["base_price"]
+            self._add_own_order(item, "buy", max(1, base_price - self.rng.randint(1, 10)), 1, visible=True,
+                                rank=0 if "maxRank" in item else None)
+
+    def _add_own_order(self, item, order_type, price, quantity, visible, rank):
+        order_id = _object_id(self.rng)
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.own_orders[order_id] = {"id": order_id, "item_id": item["id"], "type": order_type, "platinum": price,
+                                     "quantity": quantity, "visible": visible, "rank": rank,
+                                     "created_at": now, "updated_at": now}
+        return self.own_orders[order_id]
+
+    # --- Market simulation ---
+    def advance(self):
+        """Let competitors react to the market since the last call (caller holds the lock)."""
+        now = time.time()
+        ticks = int((now - self.last_advance) / self.options.undercut_interval) if self.options.undercut_interval > 0 else 0
+        if ticks <= 0: return
+        self.last_advance += ticks * self.options.undercut_interval
+        own_sell_by_item = {}
+        for own in self.own_orders.values():
+            if own["type"] == "sell" and own["visible"]: own_sell_by_item.setdefault(own["item_id"], []).append(own["platinum"])
+        for _ in range(min(ticks, 50)): # Cap catch-up work after long idle periods
+            for item in self.items:
+                if self.rng.random() >= self.options.undercut_probability: continue
+                book = self.book_by_slug[item["slug"]]
+                pc_sellers = [o for o in book["orders"] if o["type"] == "sell" and o["user"]["platform"] == "pc"]
+                if not pc_sellers: continue
+                competitor = self.rng.choice(pc_sellers)
+                if self.rng.random() < 0.25: # Occasionally a seller relists at a normal price, so prices don't race to 1p
+                    competitor["platinum"] = book["base_price"] + self.rng.randint(0, book["base_price"])
+                else:
+                    ingame_prices = [o["platinum"] for o in pc_sellers if o["user"]["status"] == "ingame"]
+                    ingame_prices += own_sell_by_item.get(item["id"], [])
+                    floor_price = max(1, book["base_price"] // 2)
+                    competitor["platinum"] = max(floor_price, min(ingame_prices or [competitor["platinum"]]) - self.rng.randint(1, 2))
+                    self.stats["undercuts"] += 1
+                competitor["user"]["status"] = self.rng.choice(COMPETITOR_STATUSES)
+                competitor["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    # --- Response shapes ---
+    def own_order_v1(self, own):
+        # Shape used by the profile page application-state and the v1 order endpoints
+        item = self.items_by_id.get(own["item_id"], {})
+        return {"id": own["id"], "platinum": own["platinum"], "quantity": own["quantity"], "visible": own["visible"],
+                "order_type": own["type"], "mod_rank": own["rank"], "platform": "pc",
+                "creation_date": own["created_at"], "last_update": own["updated_at"],
+                "item": {"id": own["item_id"], "url_name": item.get("slug"), "icon": item.get("icon"),
+                         "en": {"item_name": item.get("i18n", {}).get("en", {}).get("item_name")}}}
+
+    def own_order_v2(self, own):
+        return {"id": own["id"], "type": own["type"], "platinum": own["platinum"], "quantity": own["quantity"],
+                "perTrade": 1, "rank": own["rank"], "visible": own["visible"], "itemId": own["item_id"],
+                "createdAt": own["created_at"], "updatedAt": own["updated_at"],
+                "user": {"id": self.user["id"], "ingameName": self.user["ingameName"], "slug": self.user["slug"],
+                         "reputation": self.user["reputation"], "platform": "pc", "status": self.user["status"]}}
+
+    def item_book(self, slug):
+        book = self.book_by_slug.get(slug)
+        if book is None: return None
+        item_id = self.items_by_slug[slug]["id"]
+        orders = list(book["orders"])
+        orders.extend(self.own_order_v2(own) for own in self.own_orders.values() if own["item_id"] == item_id and own["visible"])
+        return orders
+
+
+class MockMarketHandler(BaseHTTPRequestHandler):
+    server_version = "MockWarframeMarket/1.0"
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real site, so requests.Session pooling behaves the same
+
+    ROUTES = [
+        ("GET", re.compile(r"^/v2/items$"), "get_items"),
+        ("GET", re.compile(r"^/v2/me$"), "get_me"),
+        ("GET", re.compile(r"^/v2/orders/my$"), "get_my_orders"),
+        ("GET", re.compile(r"^/v2/orders/item/(?P<slug>[^/]+)/top$"), "get_item_top_orders"),
+        ("GET", re.compile(r"^/v2/orders/item/(?P<slug>[^/]+)$"), "get_item_orders"),
+        ("GET", re.compile(r"^/profile/(?P<name>[^/]+)$"), "get_profile_page"),
+        ("PUT", re.compile(r"^/v1/profile/orders/(?P<order_id>[^/]+)$"), "put_order"),
+        ("POST", re.compile(r"^/v1/profile/orders$"), "post_order"),
+        ("DELETE", re.compile(r"^/v2/orders/(?P<order_id>[^/]+)$"), "delete_order"),
+        ("GET", re.compile(r"^/static/assets/(?P<asset_path>.+\.png)$"), "get_static_asset"),
+        ("GET", re.compile(r"^/__mock__/stats$"), "get_stats"),
+    ]
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose: super().log_message(format, *args)
+
+    def do_GET(self): self._dispatch("GET")
+    def do_PUT(self): self._dispatch("PUT")
+    def do_POST(self): self._dispatch("POST")
+    def do_DELETE(self): self._dispatch("DELETE")
+
+    # --- Plumbing ---
+    def _dispatch(self, method):
+        state = self.server.state
+        parsed = urlparse(self.path)
+        self.query = parse_qs(parsed.query)
+        route_name, match = None, None
+        for route_method, pattern, handler_name in self.ROUTES:
+            match = pattern.match(parsed.path)
+            if match and route_method == method:
+                route_name = handler_name; break
+        body = self._read_body()
+        if route_name is None:
+            return self._send_json(404, {"error": f"No mock route for {method} {parsed.path}"})
+        with state.lock:
+            state.stats["requests"] += 1
+            state.stats["by_route"][route_name] = state.stats["by_route"].get(route_name, 0) + 1
+        if route_name != "get_stats":
+            self._simulate_latency()
+            if not self.server.rate_limiter.try_acquire():
+                with state.lock: state.stats["rate_limited"] += 1
+                return self._send_json(429, {"error": "Too Many Requests"}, extra_headers={"Retry-After": "1"})
+            fault = self._injected_fault()
+            if fault is not None: return fault
+        try:
+            getattr(self, route_name)(body=body, **match.groupdict())
+        except Exception as e:
+            self._send_json(500, {"error": f"Mock server error: {e}"})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length: return None
+        raw = self.rfile.read(length)
+        try: return json.loads(raw)
+        except json.JSONDecodeError: return None
+
+    def _simulate_latency(self):
+        options = self.server.options
+        delay_ms = options.latency_ms + (random.uniform(-options.latency_jitter_ms, options.latency_jitter_ms) if options.latency_jitter_ms else 0)
+        if delay_ms > 0: time.sleep(delay_ms / 1000.0)
+
+    def _injected_fault(self):
+        options = self.server.options
+        roll = random.random()
+        if roll < options.error_429_rate:
+            with self.server.state.lock: self.server.state.stats["rate_limited"] += 1
+            self._send_json(429, {"error": "Too Many Requests (injected)"}, extra_headers={"Retry-After": "1"}); return True
+        if roll < options.error_429_rate + options.error_5xx_rate:
+            with self.server.state.lock: self.server.state.stats["injected_5xx"] += 1
+            self._send_json(random.choice([500, 502, 503]), {"error": "Injected upstream failure"}); return True
+        return None
+
+    def _is_authenticated(self):
+        auth_header = self.headers.get("Authorization", "")
+        return auth_header.startswith("Bearer ") and len(auth_header) > len("Bearer ")
+
+    def _send_bytes(self, status, content_type, payload, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for header_name, header_value in (extra_headers or {}).items(): self.send_header(header_name, header_value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status, data, extra_headers=None):
+        self._send_bytes(status, "application/json", json.dumps(data, separators=(",", ":")).encode("utf-8"), extra_headers)
+
+    # --- Routes ---
+    def get_static_asset(self, asset_path, body=None):
+        # Item icons: a 512x512 image with a colour derived from the path, so different icons differ
+        rgb = zlib.crc32(asset_path.encode("utf-8")).to_bytes(4, "big")[:3]
+        self._send_bytes(200, "image/png", _mock_png(512, 512, rgb), {"Cache-Control": "public, max-age=3600"})
+
+    def get_items(self, body=None):
+        self._send_json(200, {"apiVersion": "mock", "data": self.server.state.items})
+
+    def get_me(self, body=None):
+        if not self._is_authenticated(): return self._send_json(401, {"error": "Unauthorized"})
+        self._send_json(200, {"apiVersion": "mock", "data": self.server.state.user})
+
+    def get_my_orders(self, body=None):
+        if self.server.options.no_my_orders: return self._send_json(404, {"error": "Not found"}) # Exercise the client's HTML fallback
+        if not self._is_authenticated(): return self._send_json(401, {"error": "Unauthorized"})
+        state = self.server.state
+        with state.lock:
+            orders = [state.own_order_v2(own) for own in state.own_orders.values()]
+        for order in orders: order.pop("user", None) # Own orders come without the embedded user
+        self._send_json(200, {"apiVersion": "mock", "data": orders})
+
+    def get_item_orders(self, slug, body=None):
+        state = self.server.state
+        with state.lock:
+            state.advance()
+            orders = state.item_book(slug)
+        if orders is None: return self._send_json(404, {"error": f"Unknown item {slug}"})
+        self._send_json(200, {"apiVersion": "mock", "data": orders})
+
+    def get_item_top_orders(self, slug, body=None):
+        # Like the real endpoint: 5 cheapest sells / 5 highest buys, from online or in-game users only
+        state = self.server.state
+        with state.lock:
+            state.advance()
+            orders = state.item_book(slug)
+        if orders is None: return self._send_json(404, {"error": f"Unknown item {slug}"})
+        online_orders = [o for o in orders if o["user"]["status"] in ("ingame", "online")]
+        sell = sorted((o for o in online_orders if o["type"] == "sell"), key=lambda o: o["platinum"])[:5]
+        buy = sorted((o for o in online_orders if o["type"] == "buy"), key=lambda o: -o["platinum"])[:5]
+        self._send_json(200, {"apiVersion": "mock", "data": {"sell": sell, "buy": buy}})
+
+    def get_profile_page(self, name, body=None):
+        state = self.server.state
+        if name.lower() != state.user["slug"]: return self._send_bytes(404, "text/html", b"<html><body>Not found</body></html>")
+        with state.lock:
+            sell_orders = [state.own_order_v1(o) for o in state.own_orders.values() if o["type"] == "sell"]
+            buy_orders = [state.own_order_v1(o) for o in state.own_orders.values() if o["type"] == "buy"]
+            app_state = {"currentUser": {"id": state.user["id"], "ingame_name": state.user["ingameName"], "status": state.user["status"]},
+                         "payload": {"sell_orders": sell_orders, "buy_orders": buy_orders}}
+        # Pad with some markup so the page weight is in the same ballpark as the real profile page
+        filler = "".join(f"<div class='filler-{idx}'>lorem ipsum</div>" for idx in range(200))
+        html = ("<!DOCTYPE html><html><head><title>Mock profile</title></head><body>" + filler +
+                "<script id=\"application-state\" type=\"application/json\">" + json.dumps(app_state).replace("</", "<\\/") +
+                "</script></body></html>")
+        self._send_bytes(200, "text/html; charset=utf-8", html.encode("utf-8"))
+
+    def put_order(self, order_id, body=None):
+        if not self._is_authenticated(): return self._send_json(401, {"error": "Unauthorized"})
+        state = self.server.state; body = body or {}
+        with state.lock:
+            own = state.own_orders.get(order_id)
+            if own is None: return self._send_json(404, {"error": {"order_id": ["app.form.invalid"]}})
+            if "platinum" in body: own["platinum"] = int(body["platinum"])
+            if "quantity" in body: own["quantity"] = int(body["quantity"])
+            if "visible" in body: own["visible"] = bool(body["visible"])
+            if "rank" in body: own["rank"] = body["rank"]
+            own["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            state.stats["mutations"] += 1
+            response = {"payload": {"order": state.own_order_v1(own)}}
+        self._send_json(200, response)
+
+    def post_order(self, body=None):
+        if not self._is_authenticated(): return self._send_json(401, {"error": "Unauthorized"})
+        state = self.server.state; body = body or {}
+        with state.lock:
+            item = state.items_by_id.get(body.get("item_id"))
+            if item is None: return self._send_json(400, {"error": {"item_id": ["app.form.invalid"]}})
+            own = state._add_own_order(item, body.get("order_type", "sell"), int(body.get("platinum", 1)),
+                                       int(body.get("quantity", 1)), bool(body.get("visible", True)), body.get("rank"))
+            state.stats["mutations"] += 1
+            response = {"payload": {"order": state.own_order_v1(own)}}
+        self._send_json(200, response)
+
+    def delete_order(self, order_id, body=None):
+        if not self._is_authenticated(): return self._send_json(401, {"error": "Unauthorized"})
+        state = self.server.state
+        with state.lock:
+            if state.own_orders.pop(order_id, None) is None: return self._send_json(404, {"error": "Order not found"})
+            state.stats["mutations"] += 1
+        self._send_json(200, {"apiVersion": "mock", "data": {"id": order_id}})
+
+    def get_stats(self, body=None):
+        state = self.server.state
+        with state.lock: stats = json.loads(json.dumps(state.stats))
+        stats["own_orders"] = len(state.own_orders)
+        self._send_json(200, stats)
+
+
+class TokenBucket:
+    """Server-side rate limit: `rate` requests per second with bursts up to `burst`. rate <= 0 disables it."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate; self.capacity = max(1.0, burst); self.tokens = self.capacity
+        self.updated = time.monotonic(); self.lock = threading.Lock()
+
+    def try_acquire(self):
+        if self.rate <= 0: return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0; return True
+            return False
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Local mock of the warframe.market endpoints used by WFM Helper.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--items", type=int, default=500, help="Catalog size served by /v2/items.")
+    parser.add_argument("--own-orders", type=int, default=100, help="Number of our own sell orders.")
+    parser.add_argument("--own-buy-orders", type=int, default=10, help="Number of our own buy orders.")
+    parser.add_argument("--book-size", type=int, default=40, help="Competitor orders per item (both sides).")
+    parser.add_argument("--user-name", default=MOCK_USER_NAME)
+    parser.add_argument("--user-status", default="ingame", choices=["ingame", "online", "invisible"])
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Base latency added to every request.")
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0, help="Uniform +/- jitter on the base latency.")
+    parser.add_argument("--rate-limit", type=float, default=3.0, help="Allowed requests per second (0 disables).")
+    parser.add_argument("--rate-burst", type=float, default=3.0, help="Token bucket burst size.")
+    parser.add_argument("--error-429-rate", type=float, default=0.0, help="Probability of an injected 429.")
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0, help="Probability of an injected 500/502/503.")
+    parser.add_argument("--undercut-interval", type=float, default=15.0, help="Seconds between competitor reaction ticks.")
+    parser.add_argument("--undercut-probability", type=float, default=0.1, help="Chance per item per tick that a competitor moves.")
+    parser.add_argument("--no-my-orders", action="store_true", help="Answer /v2/orders/my with 404 (client must fall back to the profile page).")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    return parser
+
+
+def create_server(options):
+    server = ThreadingHTTPServer((options.host, options.port), MockMarketHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.state = MockMarketState(options)
+    server.rate_limiter = TokenBucket(options.rate_limit, options.rate_burst)
+    return server
+
+
+def main(argv=None):
+    options = build_arg_parser().parse_args(argv)
+    server = create_server(options)
+    base_url = f"http://{options.host}:{server.server_address[1]}"
+    print(f"Mock warframe.market listening on {base_url} (user '{options.user_name}', {options.items} items, {len(server.state.own_orders)} own orders)")
+    print(f"  WFM_API_V1_BASE_URL={base_url}/v1")
+    print(f"  WFM_API_V2_BASE_URL={base_url}/v2")
+    print(f"  WFM_PROFILE_BASE_URL={base_url}/profile")
+    print(f"  WFM_STATIC_ASSETS_BASE_URL={base_url}/static/assets/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Mock server stopped by user.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# fetch_competitor_summary against a fake warframe.market: which upstream requests a cycle's fetches cost
+import collections
+
+import requests
+
+import wfm_json
+import wfm_logic
+
+BOOK = {"data": [{"id": "o1", "type": "sell", "platinum": 12, "user": {"id": "u1", "platform": "pc", "status": "ingame"}},
+                 {"id": "o2", "type": "buy", "platinum": 8, "user": {"id": "u2", "platform": "pc", "status": "ingame"}}]}
+
+
+class FakeMarket:
+    """Stands in for the requests.Session: /top answers top_status, a full book exists for known_slugs only."""
+
+    def __init__(self, top_status, known_slugs):
+        self.top_status = top_status; self.known_slugs = known_slugs
+        self.headers = {}; self.requests = collections.Counter()
+
+    def request(self, method, url, **kwargs):
+        slug = url.split("/orders/item/", 1)[1]
+        response = requests.Response(); response.url = url; response._content_consumed = True
+        if slug.endswith("/top"):
+            self.requests["top"] += 1
+            response.status_code = self.top_status; response._content = b'{"error": "not found"}'
+        else:
+            self.requests["full"] += 1
+            response.status_code = 200 if slug in self.known_slugs else 404
+            response._content = wfm_json.dumps_bytes(BOOK if slug in self.known_slugs else {"error": "not found"})
+        return response
+
+
+def _run_cycles(monkeypatch, market, slugs, cycles=3):
+    monkeypatch.setattr(wfm_logic, "REQUEST_DELAY", 0)
+    monkeypatch.setattr(wfm_logic, "COMPETITOR_FETCH_MODE", "top")
+    monkeypatch.setattr(wfm_logic, "_top_of_book_disabled_until", 0.0)
+    per_cycle = []
+    for _ in range(cycles):
+        market.requests.clear()
+        summaries = [wfm_logic.fetch_competitor_summary(market, slug, "me", ("sell", "buy")) for slug in slugs]
+        per_cycle.append(dict(market.requests))
+    return summaries, per_cycle
+
+
+def test_top_404_for_existing_items_falls_back_to_full_books(monkeypatch):
+    market = FakeMarket(404, {"item_a", "item_b", "item_c"})
+    summaries, per_cycle = _run_cycles(monkeypatch, market, ["item_a", "item_b", "item_c"])
+    assert summaries[0] == (12, 1, 8, 1, "full", {"o1": ("sell", 12, "ingame"), "o2": ("buy", 8, "ingame")})
+    # One failed /top on the first item switches the endpoint off; after that every item costs one request
+    assert per_cycle == [{"top": 1, "full": 3}, {"full": 3}, {"full": 3}]
+
+
+def test_top_404_for_unknown_item_keeps_top_of_book(monkeypatch):
+    market = FakeMarket(404, set())
+    summaries, per_cycle = _run_cycles(monkeypatch, market, ["gone_item"], cycles=2)
+    assert summaries == [None]
+    assert per_cycle == [{"top": 1, "full": 1}, {"top": 1, "full": 1}] # A bad slug says nothing about the endpoint
+
+
+def test_top_405_disables_top_of_book_immediately(monkeypatch):
+    market = FakeMarket(405, {"item_a", "item_b"})
+    _, per_cycle = _run_cycles(monkeypatch, market, ["item_a", "item_b"], cycles=2)
+    assert per_cycle == [{"top": 1, "full": 2}, {"full": 2}]
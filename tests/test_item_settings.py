@@ -0,0 +1,42 @@
+# Min/max/skip settings are per platform, with the item-only (default platform) entry as the fallback
+import pytest
+
+import wfm_engine
+import wfm_logic
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    item_settings = {"item_a": {"numeric_min": 40, "skipped": False, "numeric_max": 20},
+                     "ps4:item_a": {"numeric_min": 25, "skipped": False},
+                     "item_b": {"numeric_min": 10, "skipped": False},
+                     "xbox:item_b": {"numeric_min": None, "skipped": True, "buy_skipped": True}}
+    monkeypatch.setattr(wfm_logic, "ITEM_USER_SETTINGS", item_settings)
+    yield item_settings
+    wfm_engine.unbind()
+
+
+def test_settings_keys(settings):
+    assert wfm_logic.item_settings_key("item_a") == "item_a"
+    assert wfm_logic.item_settings_key("item_a", wfm_logic.PLATFORM) == "item_a"
+    assert wfm_logic.item_settings_key("item_a", "ps4") == "ps4:item_a"
+
+
+def test_each_platform_reads_its_own_settings_then_the_shared_ones(settings):
+    assert wfm_logic.check_min_price_set_for_item("item_a") == 40 # Default platform (unbound, like Flask routes)
+    assert wfm_logic.check_min_price_set_for_item("item_a", "ps4") == 25
+    assert wfm_logic.check_max_price_set_for_item("item_a", "ps4") is None # The platform entry replaces the shared one as a whole
+    assert wfm_logic.check_min_price_set_for_item("item_a", "xbox") == 40 # No xbox entry: shared
+    assert wfm_logic.check_min_price_set_for_item("item_b", "xbox") == "skip"
+    assert wfm_logic.check_max_price_set_for_item("item_b", "xbox") == "skip"
+    assert wfm_logic.check_min_price_set_for_item("item_b") == 10
+    assert wfm_logic.check_min_price_set_for_item("item_c", "ps4") is None
+
+
+def test_analysis_thread_uses_its_bound_platform(settings):
+    wfm_engine.bind(wfm_logic.get_platform_engine("ps4"))
+    assert wfm_logic.check_min_price_set_for_item("item_a") == 25
+    order = wfm_logic._apply_current_user_settings({"item_id": "item_b"})
+    assert (order["numeric_min_price"], order["is_skipped"]) == (10, False)
+    wfm_engine.bind(wfm_logic.get_platform_engine("xbox"))
+    assert wfm_logic._apply_current_user_settings({"item_id": "item_b"})["is_skipped"] is True
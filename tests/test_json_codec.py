@@ -0,0 +1,41 @@
+# wfm_json writes the same JSON whichever backend is installed (orjson, or the stdlib fallback)
+import dataclasses
+import datetime
+import uuid
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+import wfm_json
+
+BACKENDS = ["json"] + (["orjson"] if wfm_json.orjson is not None else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if request.param == "json": monkeypatch.setattr(wfm_json, "orjson", None)
+    return request.param
+
+
+@dataclasses.dataclass
+class Listing:
+    price: float
+    seen_at: datetime.datetime
+
+
+def test_flask_default_formats_dates_and_dataclasses(backend):
+    # app.WFMJSONProvider hands Flask's default() to wfm_json, so this is what jsonify() sends
+    when = datetime.datetime(2015, 10, 21, 7, 28)
+    document = {"t": when, "d": datetime.date(2015, 10, 21), "id": uuid.UUID(int=1), "listing": Listing(12.5, when)}
+    assert wfm_json.loads(wfm_json.dumps(document, default=DefaultJSONProvider.default)) == {
+        "t": "Wed, 21 Oct 2015 07:28:00 GMT", "d": "Wed, 21 Oct 2015 00:00:00 GMT", "id": "00000000-0000-0000-0000-000000000001",
+        "listing": {"price": 12.5, "seen_at": "Wed, 21 Oct 2015 07:28:00 GMT"}}
+
+
+def test_non_finite_floats_become_null(backend):
+    document = {"competitor_price": float("inf"), "bids": [float("nan"), 3.5, (float("-inf"),)], 7: "int key"}
+    assert wfm_json.dumps(document) == '{"competitor_price":null,"bids":[null,3.5,[null]],"7":"int key"}'
+    assert wfm_json.dumps_bytes(document) == b'{"competitor_price":null,"bids":[null,3.5,[null]],"7":"int key"}'
+    # Also for values produced by the default hook
+    assert wfm_json.dumps(Listing(float("inf"), datetime.datetime(2015, 10, 21)), default=DefaultJSONProvider.default) == \
+        '{"price":null,"seen_at":"Wed, 21 Oct 2015 00:00:00 GMT"}'
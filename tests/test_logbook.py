@@ -0,0 +1,23 @@
+# LogBook backlog pages: each account only gets its own console lines back
+import wfm_logbook
+
+
+def _messages(page):
+    return [entry["message"] for entry in page["entries"]]
+
+
+def test_accounts_never_see_each_others_or_unowned_lines():
+    book = wfm_logbook.LogBook(capacity=50)
+    book.append({"message": "anonymous: JWT rejected"}) # Before anyone signed in
+    book.append({"message": "alice: cycle started"}, "alice")
+    book.append({"message": "bob: order placed"}, "bob")
+    book.append({"message": "route without an account"})
+    book.append({"message": "alice: price updated"}, "alice")
+
+    assert _messages(book.page("alice")) == ["alice: cycle started", "alice: price updated"]
+    assert _messages(book.page("bob")) == ["bob: order placed"]
+    assert _messages(book.page(None)) == ["anonymous: JWT rejected", "route without an account"]
+    # Paging forward filters the same way, and still advances past the other accounts' lines
+    bob_page = book.page("bob", since=2)
+    assert _messages(bob_page) == ["bob: order placed"] and bob_page["next_since"] == 5 and not bob_page["has_more"]
+    assert _messages(book.page("alice", since=3, limit=1)) == ["alice: price updated"]
@@ -0,0 +1,143 @@
+# wfm_assets.py
+# Static asset helpers for app.py: content fingerprints for cache-busting URLs, compressed response bodies,
+# and the banner list with optimized WebP copies.
+#
+# url_for('static', ...) gets a "?v=<fingerprint>" query (the first 12 hex chars of the file's SHA-256), so
+# a fingerprinted URL can be cached forever: a changed file gets a new URL. Fingerprints and compressed
+# copies of static files are computed once per file and kept in memory; static files don't change while
+# the app runs (a restart picks up edits). Banners are scanned once at startup instead of on every page
+# load, and the multi-MB PNG/JPG originals get a WebP copy scaled to the banner's display width (Pillow,
+# imported on first use; without it the originals are served, still with long-lived cache headers).
+import gzip
+import hashlib
+import os
+import random
+import threading
+
+COMPRESSIBLE_MIMETYPES = {"text/html", "text/css", "text/plain", "text/javascript", "application/javascript", "application/json", "image/svg+xml"}
+COMPRESSION_MIN_BYTES = 1024 # Smaller bodies aren't worth the CPU (and can come out larger)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5 # Fast enough for per-request HTML; static files are compressed once anyway
+
+brotli = None # Optional: imported on first use, gzip only without it
+_BROTLI_IMPORT_ATTEMPTED = False
+
+def _load_brotli():
+    global brotli, _BROTLI_IMPORT_ATTEMPTED
+    if not _BROTLI_IMPORT_ATTEMPTED:
+        _BROTLI_IMPORT_ATTEMPTED = True
+        try:
+            import brotli as brotli_module
+            brotli = brotli_module
+        except ImportError:
+            brotli = None
+    return brotli
+
+
+def available_encodings():
+    """Content encodings we can produce, preferred first."""
+    return ["br", "gzip"] if _load_brotli() else ["gzip"]
+
+
+def compress_bytes(data, encoding):
+    if encoding == "br": return _load_brotli().compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0) # mtime=0: same input, same bytes
+
+
+class StaticAssets:
+    """Per-file fingerprints and compressed copies for the Flask static folder (relative filenames, as in url_for)."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._fingerprints = {}; self._compressed = {}; self._lock = threading.Lock()
+
+    def _read(self, filename):
+        full_path = os.path.normpath(os.path.join(self.static_folder, filename))
+        if not full_path.startswith(os.path.normpath(self.static_folder) + os.sep): return None # No escaping the static folder
+        try:
+            with open(full_path, "rb") as asset_file: return asset_file.read()
+        except OSError:
+            return None
+
+    def fingerprint(self, filename):
+        """First 12 hex chars of the file's SHA-256, or None if the file doesn't exist."""
+        if filename in self._fingerprints: return self._fingerprints[filename]
+        content = self._read(filename)
+        fingerprint = hashlib.sha256(content).hexdigest()[:12] if content is not None else None
+        with self._lock: self._fingerprints[filename] = fingerprint
+        return fingerprint
+
+    def compressed(self, filename, encoding):
+        """The file's body in `encoding`, compressed on first use; None if the file can't be read."""
+        key = (filename, encoding)
+        if key in self._compressed: return self._compressed[key]
+        content = self._read(filename)
+        body = compress_bytes(content, encoding) if content is not None else None
+        with self._lock: self._compressed[key] = body
+        return body
+
+
+Image = None # PIL.Image, imported on first use
+_PIL_IMPORT_ATTEMPTED = False
+
+def _load_pillow():
+    global Image, _PIL_IMPORT_ATTEMPTED
+    if not _PIL_IMPORT_ATTEMPTED:
+        _PIL_IMPORT_ATTEMPTED = True
+        try:
+            from PIL import Image as pil_image_module
+            Image = pil_image_module
+        except ImportError:
+            print("LOG: 'Pillow' library is not installed; banners are served as they are (no WebP copies).")
+    return Image
+
+
+class BannerSet:
+    """Banner images under static/<banners_subfolder>, listed once. choose() picks one at random and prefers its
+    optimized copy once build_optimized() has made it. Entries are (static relative path, optimized file name or None)."""
+
+    def __init__(self, static_assets, banners_subfolder, default_banner_path, optimized_directory=None):
+        self.static_assets = static_assets; self.optimized_directory = optimized_directory
+        self._build_lock = threading.Lock() # One build at a time; they'd share the .tmp files
+        banners_full_path = os.path.join(static_assets.static_folder, banners_subfolder)
+        try:
+            banner_names = sorted(name for name in os.listdir(banners_full_path) if os.path.isfile(os.path.join(banners_full_path, name)))
+        except OSError:
+            banner_names = []
+        self.entries = [[os.path.join(banners_subfolder, name).replace('\\', '/'), None] for name in banner_names]
+        if not self.entries and os.path.exists(os.path.join(static_assets.static_folder, default_banner_path)):
+            self.entries = [[default_banner_path.replace('\\', '/'), None]]
+
+    def choose(self):
+        """(static relative path, optimized file name or None) of a random banner, or None if there are none."""
+        return tuple(random.choice(self.entries)) if self.entries else None
+
+    def build_optimized(self, max_width=1920, quality=80):
+        """Write a WebP copy (at most max_width wide) of every banner that would get smaller, named
+        <stem>.<fingerprint>.webp so an edited banner gets a new file. Returns the number of banners with a copy."""
+        pil_image = _load_pillow()
+        if pil_image is None or not self.optimized_directory: return 0
+        with self._build_lock:
+            os.makedirs(self.optimized_directory, exist_ok=True)
+            return sum(1 for entry in self.entries if self._build_optimized_entry(pil_image, entry, max_width, quality))
+
+    def _build_optimized_entry(self, pil_image, entry, max_width, quality):
+        """Make (or reuse) one banner's WebP copy and point the entry at it if it is smaller. Returns True if it is."""
+        static_path = entry[0]
+        fingerprint = self.static_assets.fingerprint(static_path)
+        if fingerprint is None: return False
+        optimized_name = f"{os.path.splitext(os.path.basename(static_path))[0]}.{fingerprint}.webp"
+        optimized_path = os.path.join(self.optimized_directory, optimized_name)
+        if not os.path.exists(optimized_path):
+            try:
+                with pil_image.open(os.path.join(self.static_assets.static_folder, static_path)) as source_image:
+                    banner_image = source_image.convert("RGB")
+                if banner_image.width > max_width:
+                    banner_image = banner_image.resize((max_width, round(banner_image.height * max_width / banner_image.width)), pil_image.LANCZOS)
+                banner_image.save(f"{optimized_path}.tmp", format="WEBP", quality=quality, method=4)
+                os.replace(f"{optimized_path}.tmp", optimized_path)
+            except (OSError, ValueError) as e:
+                print(f"LOG: Could not optimize banner {static_path}: {e}"); return False
+        if os.path.getsize(optimized_path) >= os.path.getsize(os.path.join(self.static_assets.static_folder, static_path)): return False
+        entry[1] = optimized_name
+        return True
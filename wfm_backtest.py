@@ -0,0 +1,201 @@
+# wfm_backtest.py
+# Offline backtester for the pricing strategy (wfm_strategy.py) over recorded order-book timelines.
+#
+# Record a timeline by setting "record_book_timeline": true in config.json and letting the engine run;
+# every priced item appends its inputs (lowest in-game competitor, seller count, our price, our minimum)
+# to book_timeline.jsonl in the config folder. This module replays those inputs for a whole grid of
+# strategy parameters at once: the state of every (configuration, item) pair lives in NumPy arrays of
+# shape (configs, items), and each recorded step is a handful of vectorized operations, so hundreds of
+# configurations over thousands of steps take seconds.
+#
+# Replay assumptions: competitors don't react to our price (the recorded lowest price excludes us), and
+# every simulated write succeeds.
+#
+# Usage:
+#   python wfm_backtest.py --timeline "%APPDATA%/WFM_Helper/book_timeline.jsonl" --undercut 1 2 3 --bump-threshold 3 5 10 --hysteresis 0 2 5
+#   python wfm_backtest.py --synthetic 300 2000 --verify 5     (random walk books, checked against the scalar strategy)
+import argparse
+import itertools
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import wfm_json
+import wfm_strategy
+
+
+class Timeline:
+    """Per-step strategy inputs, shape (steps, items). NaN lowest = item not priced at that step; inf = no competitors."""
+
+    def __init__(self, item_ids, lowest, min_price, start_price):
+        self.item_ids = item_ids; self.lowest = lowest; self.min_price = min_price; self.start_price = start_price
+
+    @property
+    def steps(self): return self.lowest.shape[0]
+
+    @property
+    def items(self): return self.lowest.shape[1]
+
+
+def load_timeline(path):
+    """Build a Timeline from a book_timeline.jsonl written by wfm_strategy.BookTimelineRecorder.
+    Each item's records become its own step sequence (items are priced once per cycle)."""
+    records_by_item = defaultdict(list)
+    with open(path, "rb") as timeline_file:
+        for line in timeline_file:
+            if not line.strip(): continue
+            record = wfm_json.loads(line)
+            if record.get("side", "sell") != "sell": continue # Buy-order records (OutbidStrategy) aren't replayed here
+            if record.get("item_id") and record.get("price") is not None and record.get("min") is not None:
+                records_by_item[record["item_id"]].append(record)
+    if not records_by_item: raise ValueError(f"No usable records in {path}.")
+    item_ids = sorted(records_by_item)
+    steps = max(len(records) for records in records_by_item.values())
+    lowest = np.full((steps, len(item_ids)), np.nan); min_price = np.full((steps, len(item_ids)), np.nan)
+    start_price = np.zeros(len(item_ids))
+    for item_index, item_id in enumerate(item_ids):
+        records = sorted(records_by_item[item_id], key=lambda record: record["t"])
+        start_price[item_index] = records[0]["price"]
+        for step, record in enumerate(records):
+            has_competitor = record.get("lowest") is not None and record.get("sellers")
+            lowest[step, item_index] = record["lowest"] if has_competitor else np.inf
+            min_price[step, item_index] = record["min"]
+    return Timeline(item_ids, lowest, min_price, start_price)
+
+
+def synthetic_timeline(items, steps, seed=1):
+    """Random-walk books: competitors undercut each other by 1-3p, the cheapest seller sometimes leaves
+    (price jumps up), and now and then nobody is in game. Useful for trying the backtester without a recording."""
+    rng = np.random.default_rng(seed)
+    base_price = rng.integers(10, 300, size=items).astype(np.float64)
+    lowest = np.empty((steps, items)); current = base_price.copy()
+    for step in range(steps):
+        undercut = rng.random(items) < 0.15
+        current = np.where(undercut, np.maximum(1, current - rng.integers(1, 4, size=items)), current)
+        seller_left = rng.random(items) < 0.05
+        current = np.where(seller_left, np.ceil(current * (1 + rng.uniform(0, 0.2, size=items))), current)
+        current = np.minimum(current, base_price * 1.5)
+        lowest[step] = np.where(rng.random(items) < 0.02, np.inf, current)
+    min_price = np.broadcast_to(np.floor(base_price * 0.6), (steps, items)).copy()
+    return Timeline([f"synthetic_{index}" for index in range(items)], lowest, min_price, base_price.copy())
+
+
+class ParameterGrid:
+    """Every combination of the given UndercutStrategy parameters, as parallel 1-D arrays."""
+
+    def __init__(self, undercut=(1,), bump_threshold_cycles=(5,), raise_hysteresis=(0,)):
+        combos = list(itertools.product(undercut, bump_threshold_cycles, raise_hysteresis))
+        self.undercut = np.array([combo[0] for combo in combos], dtype=np.float64)
+        self.bump_threshold_cycles = np.array([combo[1] for combo in combos], dtype=np.int64)
+        self.raise_hysteresis = np.array([combo[2] for combo in combos], dtype=np.float64)
+
+    def __len__(self): return len(self.undercut)
+
+    def strategy(self, index):
+        return wfm_strategy.UndercutStrategy(undercut=int(self.undercut[index]), bump_threshold_cycles=int(self.bump_threshold_cycles[index]),
+                                             raise_hysteresis=int(self.raise_hysteresis[index]))
+
+
+def run_backtest(timeline, grid):
+    """Replay `timeline` for every configuration in `grid`. Vectorized version of UndercutStrategy.decide();
+    returns per-(config, item) arrays: updates, bumps, steps at the top of the book and plat given up."""
+    configs, items = len(grid), timeline.items
+    undercut = grid.undercut[:, None]; bump_threshold = grid.bump_threshold_cycles[:, None]; hysteresis = grid.raise_hysteresis[:, None]
+    price = np.broadcast_to(timeline.start_price, (configs, items)).astype(np.float64).copy()
+    bump_cycle = np.zeros((configs, items), dtype=np.int64)
+    updates = np.zeros((configs, items), dtype=np.int64); bumps = np.zeros((configs, items), dtype=np.int64)
+    top_steps = np.zeros((configs, items), dtype=np.int64); given_up = np.zeros((configs, items))
+
+    for step in range(timeline.steps):
+        lowest = timeline.lowest[step]
+        observed = ~np.isnan(lowest)
+        if not observed.any(): continue
+        has_competitor = observed & np.isfinite(lowest)
+        safe_lowest = np.where(has_competitor, lowest, 0.0)
+        target = np.maximum(np.floor(safe_lowest - undercut), np.floor(np.nan_to_num(timeline.min_price[step])))
+        difference = target - price
+        within_hysteresis = (difference > 0) & (difference < hysteresis)
+        update = has_competitor & (difference != 0) & ~within_hysteresis
+        stays = has_competitor & ~update
+        counting = stays & ~(price > safe_lowest) # Staying above the competition (held at our minimum) resets the counter
+        next_cycle = np.where(counting, bump_cycle + 1, 0)
+        bump = counting & (next_cycle >= bump_threshold)
+        bump_cycle = np.where(observed, np.where(bump, 0, next_cycle), bump_cycle)
+        price = np.where(update, target, price)
+        updates += update; bumps += bump
+        top_steps += observed & (~has_competitor | (price <= safe_lowest))
+        given_up += np.where(has_competitor & (price < safe_lowest), safe_lowest - price, 0.0)
+    return {"updates": updates, "bumps": bumps, "top_steps": top_steps, "given_up": given_up, "final_price": price}
+
+
+def summarize(timeline, grid, result):
+    """One row per configuration: simulated writes, share of observed steps at the top, plat given up."""
+    observed_steps = max(1, int((~np.isnan(timeline.lowest)).sum()))
+    writes = result["updates"].sum(axis=1) + result["bumps"].sum(axis=1)
+    rows = []
+    for index in range(len(grid)):
+        rows.append({"params": grid.strategy(index).params(), "writes": int(writes[index]), "updates": int(result["updates"][index].sum()),
+                     "bumps": int(result["bumps"][index].sum()), "top_share": float(result["top_steps"][index].sum()) / observed_steps,
+                     "given_up_per_step": float(result["given_up"][index].sum()) / observed_steps})
+    return rows
+
+
+def replay_scalar(timeline, strategy):
+    """Same replay as run_backtest for one strategy, through the live decide() code path (slow; used to verify)."""
+    updates = np.zeros(timeline.items, dtype=np.int64); bumps = np.zeros(timeline.items, dtype=np.int64); final_price = timeline.start_price.copy()
+    for item_index in range(timeline.items):
+        price = timeline.start_price[item_index]; bump_cycle = 0
+        for step in range(timeline.steps):
+            lowest = timeline.lowest[step, item_index]
+            if np.isnan(lowest): continue
+            decision = strategy.decide(price, lowest, 0 if np.isinf(lowest) else 1, timeline.min_price[step, item_index], bump_cycle)
+            bump_cycle = decision.bump_cycle
+            if decision.action == wfm_strategy.UPDATE: price = decision.target_price; updates[item_index] += 1
+            elif decision.action == wfm_strategy.BUMP: bump_cycle = 0; bumps[item_index] += 1
+        final_price[item_index] = price
+    return updates, bumps, final_price
+
+
+def verify(timeline, grid, result, sample_configs):
+    for index in np.linspace(0, len(grid) - 1, num=min(sample_configs, len(grid)), dtype=int):
+        updates, bumps, final_price = replay_scalar(timeline, grid.strategy(index))
+        if not (np.array_equal(updates, result["updates"][index]) and np.array_equal(bumps, result["bumps"][index])
+                and np.array_equal(final_price, result["final_price"][index])):
+            raise AssertionError(f"Vectorized replay differs from UndercutStrategy.decide() for {grid.strategy(index).params()}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest pricing strategy parameters over a recorded order book timeline.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--timeline", help="book_timeline.jsonl recorded by the app")
+    source.add_argument("--synthetic", type=int, nargs=2, metavar=("ITEMS", "STEPS"), help="Generate a random-walk timeline instead")
+    parser.add_argument("--undercut", type=int, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--bump-threshold", type=int, nargs="+", default=[3, 5, 10, 20])
+    parser.add_argument("--hysteresis", type=int, nargs="+", default=[0, 1, 2, 3, 5, 10])
+    parser.add_argument("--sort", choices=["writes", "top_share", "given_up"], default="writes")
+    parser.add_argument("--top", type=int, default=15, help="Rows to print")
+    parser.add_argument("--verify", type=int, default=0, metavar="N", help="Check N configurations against the scalar strategy")
+    args = parser.parse_args()
+
+    timeline = load_timeline(args.timeline) if args.timeline else synthetic_timeline(*args.synthetic)
+    grid = ParameterGrid(args.undercut, args.bump_threshold, args.hysteresis)
+    started = time.perf_counter()
+    result = run_backtest(timeline, grid)
+    elapsed = time.perf_counter() - started
+    print(f"Backtested {len(grid)} configurations x {timeline.items} items x {timeline.steps} steps in {elapsed:.2f}s.")
+    if args.verify:
+        verify(timeline, grid, result, args.verify); print(f"Verified {min(args.verify, len(grid))} configurations against UndercutStrategy.decide().")
+
+    sort_keys = {"writes": lambda row: (row["writes"], -row["top_share"]), "top_share": lambda row: (-row["top_share"], row["writes"]),
+                 "given_up": lambda row: (row["given_up_per_step"], row["writes"])}
+    print(f"{'undercut':>8} {'bump':>5} {'hyst':>5} | {'writes':>8} {'updates':>8} {'bumps':>7} | {'top %':>6} {'given up/step':>13}")
+    for row in sorted(summarize(timeline, grid, result), key=sort_keys[args.sort])[:args.top]:
+        params = row["params"]
+        print(f"{params['undercut']:>8} {params['bump_threshold_cycles']:>5} {params['raise_hysteresis']:>5} | {row['writes']:>8} {row['updates']:>8} {row['bumps']:>7} | "
+              f"{row['top_share'] * 100:>6.1f} {row['given_up_per_step']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# wfm_cancel.py
+# Cancellation for the analysis thread: a token the stop route sets, which wakes sleeps and aborts HTTP calls.
+#
+# The analysis thread binds its token with bind(); code below it (rate-limit sleeps, _upstream_request)
+# picks it up with current_token(). Binding is thread-local, which gevent turns into greenlet-local, so
+# Flask request handlers making the same calls are never cancelled by a stop request. The other per-analysis-thread
+# bindings (wfm_engine's engine, wfm_dispatch's lane, wfm_tracing's trace) follow the same pattern.
+#
+# OperationCancelled derives from BaseException (like asyncio.CancelledError), so the many
+# `except Exception` blocks around API calls let it through instead of turning it into "request failed".
+import threading
+
+try:
+    import gevent
+    import gevent.event
+    from gevent import monkey as gevent_monkey
+except ImportError:
+    gevent = None
+
+_local = threading.local()
+
+
+class OperationCancelled(BaseException):
+    """Raised inside the cancelled thread at the next sleep or HTTP call (or immediately, if it is mid-call)."""
+
+
+def _cooperative():
+    # In-flight calls can only be interrupted when sockets are gevent's (app.py patches before importing us)
+    return gevent is not None and gevent_monkey.is_module_patched("socket")
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = gevent.event.Event() if _cooperative() else threading.Event()
+        self.reason = None
+
+    def cancel(self, reason="cancelled"):
+        if not self._event.is_set():
+            self.reason = reason; self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set(): raise OperationCancelled(self.reason)
+
+    def wait(self, timeout_seconds):
+        """Sleep up to timeout_seconds; returns True as soon as the token is cancelled (no polling)."""
+        return self._event.wait(timeout_seconds)
+
+    def sleep(self, seconds):
+        """Like time.sleep, but raises OperationCancelled the moment the token is cancelled."""
+        if self._event.wait(seconds): raise OperationCancelled(self.reason)
+
+    def run(self, function, *args, **kwargs):
+        """Call function(*args, **kwargs), abandoning it if the token is cancelled meanwhile.
+        Under gevent the call runs in a child greenlet that is killed on cancel (its socket is closed by
+        urllib3's cleanup). Without gevent there is nothing safe to interrupt, so only the start is checked
+        and the call is bounded by its own timeout."""
+        self.raise_if_cancelled()
+        if not _cooperative(): return function(*args, **kwargs)
+        worker = gevent.spawn(function, *args, **kwargs)
+        gevent.wait([worker, self._event], count=1)
+        if worker.ready(): return worker.get() # Re-raises the call's own exception, if any
+        worker.kill(block=False)
+        raise OperationCancelled(self.reason)
+
+
+def bind(token):
+    _local.token = token
+
+def unbind():
+    _local.token = None
+
+def current_token():
+    return getattr(_local, "token", None)
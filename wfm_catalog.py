@@ -0,0 +1,148 @@
+# wfm_catalog.py
+# Compact in-memory store for the warframe.market item catalog (several thousand items).
+#
+# Each item is a slotted CatalogItem instead of a per-item dict, strings are interned (slugs and names
+# also appear in every order we scrape), and the full icon URL is computed once at build time.
+# Reverse indexes by slug and by normalized name make every lookup O(1), and the whole catalog can be
+# written to / read back from a compact binary file (memory-mapped on load) so a restart does not
+# have to wait for /v2/items before the UI is usable.
+import mmap
+import os
+import struct
+import sys
+
+import wfm_json
+
+CATALOG_FILE_MAGIC = b"WFMCAT1\n"
+_HEADER = struct.Struct("<II") # record count, length of the source string that follows
+_RECORD = struct.Struct("<8Ih") # (offset, length) for id, name, slug, icon into the string blob + mod_max_rank (-1 = none)
+
+
+def normalize_item_name(name):
+    """Case/spacing-insensitive key used by the name index ("Primed  Flow" == "primed flow")."""
+    if not name: return ""
+    return " ".join(name.replace("_", " ").lower().split())
+
+
+def build_icon_url(icon_path, static_assets_base_url):
+    if not icon_path: return None
+    if icon_path.startswith("http"): return icon_path
+    return f"{static_assets_base_url}{icon_path.lstrip('/')}"
+
+
+class CatalogItem:
+    __slots__ = ("item_id", "name", "slug", "icon", "icon_url", "mod_max_rank")
+
+    def __init__(self, item_id, name, slug, icon, icon_url, mod_max_rank):
+        self.item_id = sys.intern(item_id); self.name = sys.intern(name)
+        self.slug = sys.intern(slug) if slug else None; self.icon = icon
+        self.icon_url = icon_url; self.mod_max_rank = mod_max_rank
+
+    # Dict-style access kept for the existing ITEM_ID_TO_DETAILS_MAP.get(item_id, {}).get("name") callers
+    _FIELD_ALIASES = {"name": "name", "slug": "slug", "icon": "icon", "icon_url": "icon_url", "mod_max_rank": "mod_max_rank", "id": "item_id"}
+
+    def get(self, key, default=None):
+        attribute = self._FIELD_ALIASES.get(key)
+        return getattr(self, attribute) if attribute else default
+
+    def __getitem__(self, key):
+        attribute = self._FIELD_ALIASES.get(key)
+        if attribute is None: raise KeyError(key)
+        return getattr(self, attribute)
+
+    def __repr__(self):
+        return f"CatalogItem({self.item_id!r}, {self.name!r}, slug={self.slug!r})"
+
+
+class ItemCatalog:
+    """Item id -> CatalogItem mapping with slug and name indexes. Read-mostly; rebuilt wholesale by replace_all()."""
+
+    def __init__(self):
+        self._by_id = {}; self._by_slug = {}; self._by_name = {}
+        self.version = 0 # Bumped on every rebuild so derived data (autocomplete JSON) knows when to refresh
+        self.source = None # "network" or "disk"
+        self._autocomplete_cache = (None, "[]")
+
+    def replace_all(self, items, source="network"):
+        # Indexes are built off to the side and swapped in, so concurrent readers never see a half-built catalog
+        by_id = {}; by_slug = {}; by_name = {}
+        for item in items:
+            by_id[item.item_id] = item
+            if item.slug: by_slug.setdefault(item.slug, item)
+            by_name.setdefault(normalize_item_name(item.name), item)
+        self._by_id, self._by_slug, self._by_name = by_id, by_slug, by_name
+        self.source = source; self.version += 1
+
+    # --- Mapping-style access by item id ---
+    def get(self, item_id, default=None): return self._by_id.get(item_id, default)
+    def __getitem__(self, item_id): return self._by_id[item_id]
+    def __contains__(self, item_id): return item_id in self._by_id
+    def __len__(self): return len(self._by_id)
+    def __iter__(self): return iter(self._by_id)
+    def __bool__(self): return bool(self._by_id)
+    def items(self): return self._by_id.items()
+    def values(self): return self._by_id.values()
+
+    # --- Reverse lookups ---
+    def by_slug(self, slug): return self._by_slug.get(slug) if slug else None
+    def by_name(self, name): return self._by_name.get(normalize_item_name(name))
+
+    def id_for_slug(self, slug):
+        item = self.by_slug(slug)
+        return item.item_id if item else None
+
+    def autocomplete_json(self):
+        """Sorted [{id, name, max_rank}] JSON for the Place Order autocomplete, built once per catalog version."""
+        cached_version, cached_json = self._autocomplete_cache
+        if cached_version != self.version:
+            entries = sorted(self._by_id.values(), key=lambda item: item.name.lower())
+            cached_json = wfm_json.dumps([{"id": item.item_id, "name": item.name, "max_rank": item.mod_max_rank} for item in entries if item.name])
+            self._autocomplete_cache = (self.version, cached_json)
+        return cached_json
+
+    # --- File serialization ---
+    def save(self, path, source_label=""):
+        """Write the catalog as header + fixed-size records + deduplicated UTF-8 string blob (atomic replace)."""
+        blob = bytearray(); string_offsets = {}
+
+        def add_string(value):
+            if not value: return (0, 0)
+            if value not in string_offsets:
+                encoded = value.encode("utf-8"); string_offsets[value] = (len(blob), len(encoded)); blob.extend(encoded)
+            return string_offsets[value]
+
+        records = bytearray()
+        for item in self._by_id.values():
+            fields = []
+            for value in (item.item_id, item.name, item.slug, item.icon): fields.extend(add_string(value))
+            max_rank = item.mod_max_rank if isinstance(item.mod_max_rank, int) and 0 <= item.mod_max_rank < 32767 else -1
+            records.extend(_RECORD.pack(*fields, max_rank))
+        source_bytes = source_label.encode("utf-8")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as catalog_file:
+            catalog_file.write(CATALOG_FILE_MAGIC); catalog_file.write(_HEADER.pack(len(self._by_id), len(source_bytes)))
+            catalog_file.write(source_bytes); catalog_file.write(records); catalog_file.write(blob)
+        os.replace(temp_path, path)
+
+    def load(self, path, static_assets_base_url, expected_source_label=None):
+        """Load a file written by save(). Returns the item count, or 0 if the file is missing, stale or corrupt."""
+        try:
+            with open(path, "rb") as catalog_file, mmap.mmap(catalog_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if mapped[:len(CATALOG_FILE_MAGIC)] != CATALOG_FILE_MAGIC: return 0
+                position = len(CATALOG_FILE_MAGIC)
+                record_count, source_length = _HEADER.unpack_from(mapped, position); position += _HEADER.size
+                source_label = mapped[position:position + source_length].decode("utf-8"); position += source_length
+                if expected_source_label is not None and source_label != expected_source_label: return 0
+                blob_start = position + record_count * _RECORD.size
+                items = []
+                for record_index in range(record_count):
+                    fields = _RECORD.unpack_from(mapped, position + record_index * _RECORD.size)
+                    item_id, name, slug, icon = (mapped[blob_start + fields[i]:blob_start + fields[i] + fields[i + 1]].decode("utf-8") if fields[i + 1] else None
+                                                 for i in range(0, 8, 2))
+                    if not item_id: continue
+                    items.append(CatalogItem(item_id, name or f"ItemID_{item_id}", slug, icon,
+                                             build_icon_url(icon, static_assets_base_url), fields[8] if fields[8] >= 0 else None))
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            return 0
+        self.replace_all(items, source="disk")
+        return len(items)
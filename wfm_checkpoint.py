@@ -0,0 +1,43 @@
+# wfm_checkpoint.py
+# Atomic on-disk checkpoint of the analysis engine's state, for warm restarts.
+#
+# wfm_logic builds the state (bump counters, last-seen books, own-orders snapshot, queued bumps) and hands
+# it to save(); load() returns it again if the file is recent enough. The file is written to a temp file,
+# fsynced and renamed over the old one, so a crash mid-write leaves the previous checkpoint intact.
+# Times inside the checkpoint are wall-clock (time.time()); monotonic clocks don't survive a restart.
+import os
+import time
+
+import wfm_json
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+def save(path, state):
+    """Write `state` (a JSON-serializable dict) atomically. Returns the number of bytes written."""
+    document = dict(state, format_version=CHECKPOINT_FORMAT_VERSION, saved_at=time.time())
+    encoded = wfm_json.dumps_bytes(document)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as checkpoint_file:
+        checkpoint_file.write(encoded); checkpoint_file.flush(); os.fsync(checkpoint_file.fileno())
+    os.replace(temp_path, path)
+    return len(encoded)
+
+
+def load(path, max_age_seconds):
+    """The saved state, or None if the file is missing, unreadable, from another format version or too old."""
+    try:
+        with open(path, "rb") as checkpoint_file: document = wfm_json.loads(checkpoint_file.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(document, dict) or document.get("format_version") != CHECKPOINT_FORMAT_VERSION: return None
+    saved_at = document.get("saved_at")
+    if not isinstance(saved_at, (int, float)) or not 0 <= time.time() - saved_at <= max_age_seconds: return None
+    return document
+
+
+def monotonic_from_wall(wall_time, now_wall=None, now_monotonic=None):
+    """Map a saved wall-clock time onto this process's time.monotonic() scale."""
+    now_wall = time.time() if now_wall is None else now_wall
+    now_monotonic = time.monotonic() if now_monotonic is None else now_monotonic
+    return now_monotonic - (now_wall - wall_time)
@@ -0,0 +1,144 @@
+# wfm_daemon.py
+# Headless runner for the repricer: no Flask, Socket.IO, gevent, templates or static assets.
+#
+#   python wfm_daemon.py --jwt-file ~/.wfm_jwt --log-file /var/log/wfm_helper.jsonl
+#   WFM_JWT=eyJ... python wfm_daemon.py                     (JSON lines on stdout)
+#
+# It loads the same config.json as the web app (min prices, platforms, pricing settings), signs in with the
+# JWT, and runs wfm_logic.analysis_thread_target once per configured platform in plain threads. Everything
+# the web UI would show arrives through the update callback and is written as one JSON object per line
+# ({"ts", "platform", "type", "item_id", "message", "data"}); wfm_logic's own "LOG:" prints go to stderr.
+# SIGINT/SIGTERM stop the threads through the processing cancel token (the engine checkpoint is written on
+# the way out, so the next start resumes where this one stopped).
+#
+# Startup only waits for the config file, the catalog cache file and one /v2/me call; the catalog is
+# refreshed from the API in a background thread (it is fetched up front only when there is no cache yet).
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+# wfm_logic prints its "LOG:" lines (some at import time) to stdout, which is reserved for the JSON lines;
+# send them to stderr before it is imported
+JSON_LINES_STDOUT = sys.stdout
+if __name__ == "__main__": sys.stdout = sys.stderr
+
+import wfm_engine
+import wfm_json
+import wfm_logic
+
+JWT_ENV_VAR = "WFM_JWT"
+STOP_JOIN_TIMEOUT_SECONDS = 30 # Without gevent an in-flight request can't be interrupted; it ends at its own timeout (<= 20s)
+
+
+class JsonLinesLog:
+    """Writes one JSON object per line; shared by every platform's thread."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, platform, update_type, item_id, message, data=None):
+        line = wfm_json.dumps({"ts": round(time.time(), 3), "platform": platform, "type": update_type, "item_id": item_id,
+                               "message": message, "data": data or {}})
+        with self._lock:
+            self.stream.write(line + "\n"); self.stream.flush()
+
+    def make_callback(self, platform):
+        # Same (item_id, message, data_dict) signature as the web app's emit callback
+        def write_update(item_id, message, data_dict=None):
+            data = {k: v for k, v in (data_dict or {}).items() if k != "type"}
+            update_type = (data_dict or {}).get("type", "info")
+            if update_type == "orders_data_snapshot": data = {"order_count": len(data.get("orders") or [])} # The UI table's rows; just the count here
+            self.write(platform, update_type, item_id, message, data)
+        return write_update
+
+
+def read_jwt(jwt_file=None):
+    """JWT from --jwt-file if given, else from the WFM_JWT environment variable (whitespace stripped)."""
+    if jwt_file:
+        with open(os.path.expanduser(jwt_file), "r", encoding="utf-8") as f: return f.read().strip() or None
+    return (os.getenv(JWT_ENV_VAR) or "").strip() or None
+
+
+def _refresh_catalog_in_background():
+    if not wfm_logic.fetch_all_items_and_build_map_v2(wfm_logic.main_session):
+        print("LOG: Daemon: background item catalog refresh failed; keeping the cached catalog.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the WFM Helper repricer without the web UI.")
+    parser.add_argument("--jwt-file", help=f"File containing the warframe.market JWT (default: ${JWT_ENV_VAR}).")
+    parser.add_argument("--log-file", help="Append JSON-lines updates to this file (default: stdout).")
+    parser.add_argument("--platforms", help="Comma-separated platforms to process (default: 'platforms' from config.json).")
+    args = parser.parse_args(argv)
+
+    if args.log_file:
+        event_log = JsonLinesLog(open(args.log_file, "a", encoding="utf-8"))
+    else:
+        event_log = JsonLinesLog(JSON_LINES_STDOUT)
+    started_at = time.perf_counter()
+
+    try: jwt = read_jwt(args.jwt_file)
+    except OSError as e:
+        event_log.write(None, "error", None, f"Could not read JWT file: {e}"); return 2
+    if not jwt:
+        event_log.write(None, "error", None, f"No JWT: pass --jwt-file or set {JWT_ENV_VAR}."); return 2
+
+    loaded_config_data = wfm_logic.load_config()
+    if args.platforms:
+        wfm_logic.PROCESSING_PLATFORMS = [p.strip() for p in args.platforms.split(",") if p.strip() in wfm_engine.SUPPORTED_PLATFORMS] or [wfm_logic.PLATFORM]
+    wfm_logic.main_session = requests.Session()
+    wfm_logic.main_session.headers.update({"User-Agent": "PythonScript/WFMHelperDaemon/0.4.3 (Python requests)",
+                                           "Platform": wfm_logic.PLATFORM, "Language": wfm_logic.LANGUAGE})
+    if not wfm_logic.DEVICE_ID:
+        wfm_logic.DEVICE_ID = str(uuid.uuid4())
+
+    profile_api_data, auth_failed, ingame_name = wfm_logic.fetch_v2_me_manual_jwt(wfm_logic.main_session, jwt, wfm_logic.DEVICE_ID)
+    if auth_failed or not profile_api_data:
+        event_log.write(None, "error", None, "The JWT is invalid or the Warframe.Market API could not be reached."); return 1
+    user_id = profile_api_data.get("id"); ingame_name = ingame_name or profile_api_data.get("ingameName")
+    csrf_token = (wfm_logic.parse_jwt_payload(jwt) or {}).get("csrf_token")
+    wfm_logic.CURRENT_JWT_STRING = jwt; wfm_logic.CSRF_TOKEN = csrf_token
+    if loaded_config_data.get("user_id") != user_id or loaded_config_data.get("device_id") != wfm_logic.DEVICE_ID:
+        wfm_logic.save_config(user_id)
+
+    # Own orders from /v2/orders/my are resolved against the catalog, so a cold start (no cache) waits for it
+    if wfm_logic.load_catalog_cache():
+        threading.Thread(target=_refresh_catalog_in_background, name="catalog-refresh", daemon=True).start()
+    elif not wfm_logic.fetch_all_items_and_build_map_v2(wfm_logic.main_session):
+        event_log.write(None, "error", None, "Could not fetch the item catalog."); return 1
+
+    cancel_token = wfm_logic.new_processing_cancel_token()
+    def _request_stop(signum, frame):
+        event_log.write(None, "warn", None, f"Received {signal.Signals(signum).name}; stopping.")
+        wfm_logic.request_stop_processing(f"signal {signum}")
+    signal.signal(signal.SIGINT, _request_stop); signal.signal(signal.SIGTERM, _request_stop)
+
+    threads = []
+    for platform in wfm_logic.PROCESSING_PLATFORMS:
+        thread = threading.Thread(
+            target=wfm_logic.analysis_thread_target,
+            args=(wfm_logic.main_session, user_id, ingame_name, jwt, csrf_token, wfm_logic.DEVICE_ID,
+                  wfm_logic.ITEM_USER_SETTINGS.copy(), event_log.make_callback(platform)),
+            kwargs={"cancel_token": cancel_token, "platform": platform}, name=f"analysis-{platform}", daemon=True)
+        thread.start(); threads.append(thread)
+    event_log.write(None, "info", None, f"Daemon started for {ingame_name} ({', '.join(wfm_logic.PROCESSING_PLATFORMS)}) in {time.perf_counter() - started_at:.2f}s.")
+
+    # Short joins so the main thread gets to run the signal handlers
+    while any(thread.is_alive() for thread in threads) and not cancel_token.cancelled:
+        for thread in threads: thread.join(timeout=0.5)
+    stop_deadline = time.monotonic() + STOP_JOIN_TIMEOUT_SECONDS
+    for thread in threads: thread.join(timeout=max(0.0, stop_deadline - time.monotonic()))
+    stopped = not any(thread.is_alive() for thread in threads)
+    event_log.write(None, "info" if stopped else "warn", None, "Daemon stopped." if stopped else "Daemon exiting with a request still in flight.")
+    return 0 if stopped else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# wfm_dispatch.py
+# Priority lanes for one platform's upstream request budget.
+#
+# warframe.market requests are paced: on one platform a request starts at most every REQUEST_DELAY seconds.
+# Before, every caller took the next free slot in arrival order, so a click in the UI (place/delete/update an
+# order) queued behind the analysis loop's competitor fetches like any other request. Now every request waits
+# in a lane, and each slot goes to the highest-priority lane with a waiter:
+#   interactive  user actions from Flask routes (anything not running in an analysis thread)
+#   reprice      price updates decided by the analysis cycle
+#   scan         the analysis cycle's reads: own orders, competitor books
+#   bump         queued listing bumps between cycles
+#   status       the between-cycle profile status check
+# Higher lanes preempt lower ones: a request that arrives while others are waiting is served first if its lane
+# is higher (a request already sent is never interrupted). So a lower lane isn't starved by a busy higher one,
+# each lane has a reserved share: once RESERVED_EVERY[lane] - 1 slots in a row have gone to other lanes while it
+# was waiting, it gets the next one (a scan still advances while the user is clicking around, a bump still
+# goes out during a long scan).
+#
+# The lane comes from the calling code: analysis threads (they have a cancel token bound) default to "scan",
+# everything else to "interactive", and `with wfm_dispatch.lane(...)` overrides it for a block (bound
+# per thread, like wfm_cancel's tokens; see there).
+import contextlib
+import threading
+import time
+
+import wfm_cancel
+
+INTERACTIVE, REPRICE, SCAN, BUMP, STATUS = "interactive", "reprice", "scan", "bump", "status"
+LANES = (INTERACTIVE, REPRICE, SCAN, BUMP, STATUS) # Highest priority first
+# A waiting lane gets at least one slot in this many (its reserved share); interactive is first anyway
+RESERVED_EVERY = {INTERACTIVE: 1, REPRICE: 2, SCAN: 4, BUMP: 10, STATUS: 20}
+_RETRY_SECONDS = 0.01 # Slot is due but another waiter holds it: look again shortly
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def lane(lane_name):
+    """Upstream requests made inside the block wait in `lane_name`."""
+    previous_lane = getattr(_local, "lane", None)
+    _local.lane = lane_name
+    try:
+        yield
+    finally:
+        _local.lane = previous_lane
+
+
+def current_lane():
+    bound_lane = getattr(_local, "lane", None)
+    if bound_lane is not None: return bound_lane
+    return SCAN if wfm_cancel.current_token() is not None else INTERACTIVE
+
+
+class UpstreamDispatcher:
+    """Hands out one platform's request slots (at least interval_seconds apart) to waiting callers by lane."""
+
+    def __init__(self):
+        self._next_free = 0.0
+        self._waiting = {lane_name: [] for lane_name in LANES} # FIFO of tickets per lane
+        self._skipped = dict.fromkeys(LANES, 0) # Slots given to other lanes since this lane's head started waiting
+        self._lock = threading.Lock()
+
+    def _next_ticket_locked(self):
+        # A lane that has been passed over long enough takes its reserved slot; otherwise the highest lane wins
+        for lane_name in LANES:
+            skipped = self._skipped[lane_name]
+            if self._waiting[lane_name] and skipped and skipped + 1 >= RESERVED_EVERY[lane_name]: return self._waiting[lane_name][0]
+        for lane_name in LANES:
+            if self._waiting[lane_name]: return self._waiting[lane_name][0]
+        return None
+
+    def _grant_locked(self, ticket, now, interval_seconds):
+        granted_lane = ticket[0]
+        self._waiting[granted_lane].pop(0)
+        for lane_name in LANES:
+            if lane_name == granted_lane or not self._waiting[lane_name]: self._skipped[lane_name] = 0
+            else: self._skipped[lane_name] += 1
+        self._next_free = now + interval_seconds
+
+    def acquire(self, lane_name, interval_seconds, cancel_token=None):
+        """Wait for a slot in lane_name; returns once the request may be sent. Raises OperationCancelled from
+        cancel_token's sleep (the ticket is withdrawn first). Every waiter sleeps until the next slot is due and
+        then checks whether it is the one to take it, so a higher-priority arrival needs no wake-up call."""
+        ticket = (lane_name, object())
+        with self._lock: self._waiting[lane_name].append(ticket)
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    if now >= self._next_free and self._next_ticket_locked() is ticket:
+                        self._grant_locked(ticket, now, interval_seconds); return
+                    sleep_seconds = self._next_free - now if now < self._next_free else _RETRY_SECONDS
+                if cancel_token is None: time.sleep(sleep_seconds)
+                else: cancel_token.sleep(sleep_seconds)
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiting[lane_name]:
+                    self._waiting[lane_name].remove(ticket)
+                    if not self._waiting[lane_name]: self._skipped[lane_name] = 0
+            raise
+
+    def waiting_counts(self):
+        with self._lock: return {lane_name: len(tickets) for lane_name, tickets in self._waiting.items()}
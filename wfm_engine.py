@@ -0,0 +1,45 @@
+# wfm_engine.py
+# Per-platform engine state, so one process can reprice listings on several platforms at once.
+#
+# warframe.market runs a separate market per platform (chosen by the Platform request header): order books,
+# our own listings and their bump state all belong to one platform; only the item catalog is shared.
+# A PlatformEngine holds that per-platform state plus its own request pacing. The analysis thread for a
+# platform binds its engine with bind(); wfm_logic's request helpers and the analysis cycle read the bound
+# engine (wfm_logic.current_engine()), and everything that runs unbound (Flask routes) uses the default one.
+# Binding works like wfm_cancel's tokens (see there).
+import threading
+
+import wfm_dispatch
+import wfm_ledger
+import wfm_orderbook
+import wfm_scheduler
+
+SUPPORTED_PLATFORMS = ("pc", "ps4", "xbox", "switch")
+
+_local = threading.local()
+
+
+class PlatformEngine:
+    def __init__(self, platform, bump_window_seconds=120.0, checkpoint_file=None):
+        self.platform = platform
+        self.ledger = wfm_ledger.OwnOrdersLedger() # Our orders on this platform
+        self.last_seen_books = {} # item_id -> {"lowest", "sellers", "source", "seen_at"}
+        self.book_tracker = wfm_orderbook.OrderBookTracker() # Each item's last book keyed by order id, for deltas between cycles
+        self.bump_counters = {} # item_id -> cycles spent at the optimal price
+        self.bump_scheduler = wfm_scheduler.BumpScheduler(bump_window_seconds)
+        self.dispatcher = wfm_dispatch.UpstreamDispatcher() # Request pacing, with priority lanes (interactive before background)
+        self.checkpoint_file = checkpoint_file
+
+    def reset(self):
+        """Forget bump progress (a cold start); books and the ledger stay, they are just caches."""
+        self.bump_counters.clear(); self.bump_scheduler.clear()
+
+
+def bind(engine):
+    _local.engine = engine
+
+def unbind():
+    _local.engine = None
+
+def bound_engine():
+    return getattr(_local, "engine", None)
@@ -0,0 +1,112 @@
+# wfm_icons.py
+# Local disk cache for item icons and the profile avatar, served by app.py's /icon/<item_id> and /avatar.
+#
+# The order table used to load every icon straight from warframe.market's static assets at full size, so a
+# page of 300 listings was 300 remote image fetches on every load. Now each image is downloaded once,
+# shrunk to the size the page shows it at (2x for HiDPI screens) and stored content-addressed:
+#   objects/<digest[:2]>/<digest>   the thumbnail bytes, named by their SHA-256 (identical icons share a file)
+#   refs/<sha1 of size + url>       "<digest> <content type>" for each (source URL, size) that was fetched
+# Icon paths on warframe.market change when the image changes, so a ref never goes stale; the digest doubles
+# as the HTTP ETag. Resizing needs Pillow, imported on first use; without it the original image is stored.
+import hashlib
+import io
+import os
+import threading
+
+import requests
+
+import wfm_metrics
+
+ICON_FETCH_TIMEOUT_SECONDS = 10
+
+Image = None # PIL.Image, imported on first use
+_PIL_IMPORT_ATTEMPTED = False
+
+def _load_pillow():
+    global Image, _PIL_IMPORT_ATTEMPTED
+    if not _PIL_IMPORT_ATTEMPTED:
+        _PIL_IMPORT_ATTEMPTED = True
+        try:
+            from PIL import Image as pil_image_module
+            Image = pil_image_module
+        except ImportError:
+            print("LOG: 'Pillow' library is not installed; icons are cached at their original size.")
+    return Image
+
+
+def make_thumbnail(image_bytes, size_px):
+    """(bytes, content type) of the image scaled down to fit size_px x size_px as PNG, or None if it can't be."""
+    pil_image = _load_pillow()
+    if pil_image is None: return None
+    try:
+        with pil_image.open(io.BytesIO(image_bytes)) as source_image:
+            thumbnail_image = source_image.convert("RGBA") if source_image.mode not in ("RGB", "RGBA") else source_image.copy()
+        thumbnail_image.thumbnail((size_px, size_px), pil_image.LANCZOS)
+        output = io.BytesIO(); thumbnail_image.save(output, format="PNG", optimize=True)
+        return output.getvalue(), "image/png"
+    except (OSError, ValueError) as e:
+        print(f"LOG: Could not resize icon ({e}); caching it at its original size."); return None
+
+
+class IconCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.session = requests.Session() # Static assets host, not the API: no rate budget, no auth cookies
+        self.session.headers["User-Agent"] = "PythonScript/WFMHelperWebApp/0.4.3 (icon cache)"
+        self._pending = set(); self._lock = threading.Lock()
+
+    def _ref_path(self, source_url, size_px):
+        return os.path.join(self.directory, "refs", hashlib.sha1(f"{size_px}:{source_url}".encode("utf-8")).hexdigest())
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def lookup(self, source_url, size_px):
+        """(file path, digest, content type) of the cached image, or None if it hasn't been fetched yet."""
+        if not self.directory: return None
+        try:
+            with open(self._ref_path(source_url, size_px), "r", encoding="utf-8") as ref_file: digest, content_type = ref_file.read().split(" ", 1)
+        except (OSError, ValueError):
+            wfm_metrics.record_cache_lookup("icon", False); return None
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            wfm_metrics.record_cache_lookup("icon", False); return None
+        wfm_metrics.record_cache_lookup("icon", True)
+        return object_path, digest, content_type
+
+    def is_pending(self, source_url, size_px):
+        with self._lock: return (source_url, size_px) in self._pending
+
+    def fetch(self, source_url, size_px):
+        """Download, shrink and store one image (no-op if it is cached or already being fetched). Returns True if it is cached afterwards."""
+        if not self.directory or not source_url: return False
+        key = (source_url, size_px)
+        with self._lock:
+            if key in self._pending: return False
+            self._pending.add(key)
+        try:
+            if os.path.exists(self._ref_path(source_url, size_px)): return True
+            response = self.session.get(source_url, timeout=ICON_FETCH_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            thumbnail = make_thumbnail(response.content, size_px)
+            image_bytes, content_type = thumbnail if thumbnail else (response.content, response.headers.get("Content-Type", "image/png").split(";")[0])
+            self._store(source_url, size_px, image_bytes, content_type)
+            return True
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"LOG: Could not cache icon {source_url}: {e}"); return False
+        finally:
+            with self._lock: self._pending.discard(key)
+
+    def _store(self, source_url, size_px, image_bytes, content_type):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.tmp"
+            with open(temp_path, "wb") as object_file: object_file.write(image_bytes)
+            os.replace(temp_path, object_path)
+        # The ref goes last, so a lookup never points at a missing or half-written object
+        ref_path = self._ref_path(source_url, size_px)
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        with open(f"{ref_path}.tmp", "w", encoding="utf-8") as ref_file: ref_file.write(f"{digest} {content_type}")
+        os.replace(f"{ref_path}.tmp", ref_path)
@@ -0,0 +1,90 @@
+# wfm_json.py
+# One JSON codec for the whole app: orjson when it is installed, the standard library json module otherwise.
+#
+# wfm_logic decodes every warframe.market response and writes config.json through here, and app.py plugs
+# the same dumps/loads into Flask (jsonify, |tojson) and Socket.IO packet encoding. Output is always str
+# and decode errors are always json.JSONDecodeError (orjson's error subclasses it), so callers don't care
+# which backend is active. orjson is optional: nothing breaks without it, it is just slower.
+#
+# Both backends write the same JSON: NaN/Infinity become null, and types orjson would handle itself
+# (datetime, date, time, dataclasses) go to the caller's `default` like they do with the stdlib.
+import json
+import math
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+JSONDecodeError = json.JSONDecodeError
+
+if orjson is not None:
+    # Non-str keys (ints) are accepted like the stdlib does. NaN/Infinity become null (browsers' JSON.parse
+    # rejects "Infinity" anyway; the stdlib path below does the same). Datetimes and dataclasses are passed
+    # through to `default`, so e.g. Flask's provider formats dates as HTTP dates with either backend.
+    _ORJSON_BASE_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def _finite_or_none(obj):
+    # Copy of obj with NaN/Infinity floats replaced by None, which is what orjson writes for them
+    if isinstance(obj, float): return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict): return {key: _finite_or_none(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)): return [_finite_or_none(value) for value in obj]
+    return obj
+
+
+def _stdlib_dumps(obj, default=None, **json_kwargs):
+    # Non-finite floats are rare (an empty book's lowest price is inf): try the plain encode first, rewrite only if it refuses
+    try:
+        return json.dumps(obj, default=default, allow_nan=False, **json_kwargs)
+    except ValueError:
+        finite_default = (lambda value: _finite_or_none(default(value))) if default is not None else None
+        return json.dumps(_finite_or_none(obj), default=finite_default, **json_kwargs)
+
+
+def dumps(obj, indent=None, sort_keys=False, default=None, **ignored_kwargs):
+    """Serialize to a str. `indent` pretty-prints (orjson only does 2 spaces); other json.dumps kwargs
+    (separators, ensure_ascii, ... as passed by Socket.IO/Jinja) are accepted and ignored, output is always compact UTF-8."""
+    if orjson is None:
+        separators = None if indent else (",", ":")
+        return _stdlib_dumps(obj, indent=indent, sort_keys=sort_keys, default=default, separators=separators, ensure_ascii=False)
+    options = _ORJSON_BASE_OPTIONS
+    if indent: options |= orjson.OPT_INDENT_2
+    if sort_keys: options |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=options).decode("utf-8")
+
+
+def dumps_bytes(obj, default=None):
+    """Compact UTF-8 bytes, for HTTP bodies and files (skips orjson's str round trip)."""
+    if orjson is None: return _stdlib_dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return orjson.dumps(obj, default=default, option=_ORJSON_BASE_OPTIONS)
+
+
+def loads(data, **ignored_kwargs):
+    """Parse str or bytes. Raises json.JSONDecodeError (a ValueError) on invalid input."""
+    if orjson is None: return json.loads(data)
+    return orjson.loads(data)
+
+
+def response_json(response):
+    """Drop-in for requests' response.json(): decodes the raw body bytes directly (no charset sniffing or
+    str copy) and raises requests' JSONDecodeError like response.json() does, so existing except clauses still match."""
+    try:
+        return loads(response.content)
+    except JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos, response=response)
+
+
+def pack_rows(records):
+    """Columnar form of a list of dicts for the wire: {"fields": [...], "rows": [[...], ...]}.
+    Keys are listed once (union of all records, in first-seen order) instead of repeated per record;
+    a record missing a key gets null in that column. The browser rebuilds the dicts with unpackRows()."""
+    fields = dict.fromkeys(records[0]) if records else {}
+    for record in records:
+        # Records nearly always share one key set; only walk the keys of one that doesn't
+        if len(record) != len(fields) or record.keys() != fields.keys(): fields.update(dict.fromkeys(record))
+    field_names = list(fields)
+    return {"fields": field_names, "rows": [list(map(record.get, field_names)) for record in records]}
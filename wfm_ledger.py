@@ -0,0 +1,87 @@
+# wfm_ledger.py
+# In-memory ledger of our own warframe.market orders, shared by the web routes and the analysis cycle.
+#
+# The profile page scrape is the heaviest request we make, and it used to run on every page load,
+# before every cycle, twice per status check and after every single update/delete/place action.
+# The ledger keeps the last scraped order list with a freshness timestamp; our own successful
+# PUT/DELETE/POST calls patch it in place (write-through), so readers can be served from memory until
+# the data is older than the configured max age. Patches keep the data correct but never make it
+# "fresher": only a real scrape can pick up changes made elsewhere (sales, edits on the website).
+import time
+
+
+class OwnOrdersLedger:
+    """Our own orders (UI-shaped dicts from wfm_logic) keyed by order id, plus when they were last scraped."""
+
+    def __init__(self):
+        self._orders = {} # order_id -> order dict, in scrape order
+        self.owner = None # In-game name the orders belong to
+        self.profile_status = None # currentUser.status seen by the last scrape (None when the source doesn't report it)
+        self.source = None # Which own-orders source filled the ledger last
+        self.refreshed_at = None # time.monotonic() of the last full refresh; None = never / invalidated
+        self.refreshed_at_wall = None
+        self.version = 0 # Bumped on every change, so callers can tell whether a snapshot moved
+
+    def replace(self, orders, owner, profile_status=None, source=None):
+        self._orders = {order["order_id"]: dict(order) for order in orders if order.get("order_id")}
+        self.owner = owner; self.profile_status = profile_status; self.source = source
+        self.refreshed_at = time.monotonic(); self.refreshed_at_wall = time.time()
+        self.version += 1
+
+    def restore(self, orders, owner, profile_status=None, source=None, refreshed_at_wall=None):
+        # From a checkpoint: the snapshot keeps aging from when it was really fetched, not from now
+        self.replace(orders, owner, profile_status, source)
+        if refreshed_at_wall is None: self.refreshed_at = None; return
+        self.refreshed_at = time.monotonic() - max(0.0, time.time() - refreshed_at_wall); self.refreshed_at_wall = refreshed_at_wall
+
+    def export(self):
+        """Checkpoint form of the ledger (see wfm_logic.save_engine_checkpoint); None if it was never filled."""
+        if self.owner is None: return None
+        fresh_at = self.refreshed_at_wall if self.refreshed_at is not None else None # Invalidated data is saved as stale
+        return {"owner": self.owner, "profile_status": self.profile_status, "source": self.source,
+                "refreshed_at": fresh_at, "orders": list(self._orders.values())}
+
+    def invalidate(self):
+        # Next reader does a full refresh (e.g. after an API error suggesting our view is wrong)
+        self.refreshed_at = None
+
+    def age_seconds(self):
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    def is_fresh(self, max_age_seconds, owner):
+        age = self.age_seconds()
+        return age is not None and owner == self.owner and age <= max_age_seconds
+
+    def snapshot(self):
+        """Copies of the cached orders; callers are free to decorate them for the UI."""
+        return [dict(order) for order in self._orders.values()]
+
+    def get(self, order_id):
+        order = self._orders.get(order_id)
+        return dict(order) if order else None
+
+    # --- Write-through patches from our own successful API calls ---
+    def apply_update(self, order_id, price=None, quantity=None, visible=None, rank=None):
+        order = self._orders.get(order_id)
+        if order is None: return False
+        if price is not None: order["platinum"] = price
+        if quantity is not None: order["quantity"] = quantity
+        if visible is not None: order["visible"] = visible
+        if rank is not None: order["rank"] = rank
+        order["ledger_updated_at"] = time.time(); self.version += 1
+        return True
+
+    def apply_delete(self, order_id):
+        if self._orders.pop(order_id, None) is None: return False
+        self.version += 1
+        return True
+
+    def apply_new_order(self, order):
+        if not order or not order.get("order_id"): return False
+        self._orders[order["order_id"]] = dict(order, ledger_updated_at=time.time()); self.version += 1
+        return True
+
+    def status(self):
+        age = self.age_seconds()
+        return {"owner": self.owner, "source": self.source, "orders": len(self._orders), "age_seconds": None if age is None else round(age, 1),
+                "refreshed_at": self.refreshed_at_wall, "version": self.version}
@@ -0,0 +1,61 @@
+# wfm_logbook.py
+# Server-side ring buffer of the log lines sent to the browser console, so a tab that reconnects (or is
+# reloaded) can fetch what it missed from /logs instead of losing it.
+#
+# Every new_log_message emit goes through LogBook.append(), which stamps it with a sequence number and a
+# wall-clock time. Sequence numbers are global and contiguous, so the entries after a given seq are the
+# newest (latest seq - since) of the buffer: they are read from the right end, so a client that is nearly
+# caught up costs a few steps, not a walk over the whole buffer. The oldest entries fall off once it is full.
+import collections
+import itertools
+import threading
+import time
+
+
+class LogBook:
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self._entries = collections.deque(maxlen=capacity) # (user_id, entry) pairs, oldest first
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self.epoch = int(time.time() * 1000) # Sequence numbers restart with the process; clients compare this to notice
+
+    def __len__(self): return len(self._entries)
+
+    def append(self, payload, user_id=None):
+        """Store a copy of `payload` with "seq" and "ts" added and return it. Entries with a user_id are only
+        served back to that account; entries without one (sent before login, or from a request with no account)
+        are only served to readers who aren't signed in either, so no account's backlog replays another browser's lines."""
+        with self._lock:
+            entry = dict(payload, seq=next(self._sequence), ts=round(time.time(), 3))
+            self._entries.append((user_id, entry))
+        return entry
+
+    def latest_seq(self):
+        with self._lock:
+            return self._entries[-1][1]["seq"] if self._entries else 0
+
+    def page(self, user_id=None, since=None, limit=200):
+        """Entries visible to user_id with seq > since, oldest first, at most `limit` of them. With since=None
+        the newest `limit` entries are returned instead (a fresh page load only needs the tail).
+        "next_since" is what to pass as since for the following page; "dropped" means entries after `since`
+        have already been evicted, so the caller's backlog has a gap."""
+        visible = lambda owner: owner == user_id # Signed-in readers get only their account's lines; anonymous ones only unowned lines
+        with self._lock:
+            oldest_seq = self._entries[0][1]["seq"] if self._entries else 0
+            latest_seq = self._entries[-1][1]["seq"] if self._entries else 0
+            if since is None:
+                entries = list(itertools.islice((entry for owner, entry in reversed(self._entries) if visible(owner)), limit))
+                entries.reverse()
+                return {"entries": entries, "next_since": latest_seq, "has_more": False, "dropped": False,
+                        "oldest_seq": oldest_seq, "latest_seq": latest_seq, "epoch": self.epoch}
+            after_since = max(0, latest_seq - max(since, oldest_seq - 1)) if self._entries else 0 # Entries newer than since
+            entries = []; next_since = max(since, min(latest_seq, oldest_seq - 1)) if self._entries else since
+            newer = list(itertools.islice(reversed(self._entries), after_since)); newer.reverse() # From the right end, oldest first
+            for owner, entry in newer:
+                if len(entries) >= limit: break
+                next_since = entry["seq"]
+                if visible(owner): entries.append(entry)
+            return {"entries": entries, "next_since": next_since, "has_more": next_since < latest_seq,
+                    "dropped": bool(self._entries) and since < oldest_seq - 1, "oldest_seq": oldest_seq, "latest_seq": latest_seq,
+                    "epoch": self.epoch}
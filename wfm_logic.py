@@ -4,15 +4,35 @@ import json
 import time
 import uuid
 import base64
-from bs4 import BeautifulSoup
 import sys
 import os
-
-try:
-    import browser_cookie3
-except ImportError:
-    print("LOG: 'browser_cookie3' library is not installed.")
-    browser_cookie3 = None
+from urllib.parse import urlparse
+import wfm_cancel
+import wfm_catalog
+import wfm_checkpoint
+import wfm_dispatch
+import wfm_engine
+import wfm_json
+import wfm_metrics
+import wfm_orderbook
+import wfm_strategy
+import wfm_tracing
+
+# browser_cookie3 (and bs4, see fetch_orders_from_profile_page) are imported on first use:
+# together they pull in sqlite/crypto/keyring/html parser modules and noticeably slow down app start.
+browser_cookie3 = None
+_BROWSER_COOKIE3_IMPORT_ATTEMPTED = False
+
+def _load_browser_cookie3():
+    global browser_cookie3, _BROWSER_COOKIE3_IMPORT_ATTEMPTED
+    if not _BROWSER_COOKIE3_IMPORT_ATTEMPTED:
+        _BROWSER_COOKIE3_IMPORT_ATTEMPTED = True
+        try:
+            import browser_cookie3 as browser_cookie3_module
+            browser_cookie3 = browser_cookie3_module
+        except ImportError:
+            print("LOG: 'browser_cookie3' library is not installed.")
+    return browser_cookie3
 
 # --- BEGIN MODIFICATION FOR APPDATA CONFIG PATH ---
 CONFIG_APP_NAME = "WFM_Helper"  # Your application's name, used for subfolder in AppData
@@ -70,26 +90,146 @@ def get_executable_path_info():
         return os.path.dirname(os.path.abspath(__file__))
 
 
-API_V1_BASE_URL = "https://api.warframe.market/v1"
-API_V2_BASE_URL = "https://api.warframe.market/v2"
-PROFILE_BASE_URL = "https://warframe.market/profile"
-STATIC_ASSETS_BASE_URL = "https://warframe.market/static/assets/"
-PLATFORM = "pc"
+DEFAULT_API_V1_BASE_URL = "https://api.warframe.market/v1"
+DEFAULT_API_V2_BASE_URL = "https://api.warframe.market/v2"
+DEFAULT_PROFILE_BASE_URL = "https://warframe.market/profile"
+DEFAULT_STATIC_ASSETS_BASE_URL = "https://warframe.market/static/assets/"
+# Base URLs can be pointed elsewhere (e.g. at mock_wfm_server.py) via environment variables
+# or the matching keys in config.json ("api_v1_base_url", "api_v2_base_url", "profile_base_url", "static_assets_base_url").
+API_V1_BASE_URL = os.getenv("WFM_API_V1_BASE_URL", DEFAULT_API_V1_BASE_URL)
+API_V2_BASE_URL = os.getenv("WFM_API_V2_BASE_URL", DEFAULT_API_V2_BASE_URL)
+PROFILE_BASE_URL = os.getenv("WFM_PROFILE_BASE_URL", DEFAULT_PROFILE_BASE_URL)
+STATIC_ASSETS_BASE_URL = os.getenv("WFM_STATIC_ASSETS_BASE_URL", DEFAULT_STATIC_ASSETS_BASE_URL)
+BASE_URL_CONFIG_KEYS = {
+    "api_v1_base_url": ("API_V1_BASE_URL", DEFAULT_API_V1_BASE_URL),
+    "api_v2_base_url": ("API_V2_BASE_URL", DEFAULT_API_V2_BASE_URL),
+    "profile_base_url": ("PROFILE_BASE_URL", DEFAULT_PROFILE_BASE_URL),
+    "static_assets_base_url": ("STATIC_ASSETS_BASE_URL", DEFAULT_STATIC_ASSETS_BASE_URL),
+}
+PLATFORM = "pc" # Default platform: Flask routes and the order table use it; the analysis engine can run others too
+PROCESSING_PLATFORMS = ["pc"] # Default, can be overridden by config ("platforms"). One analysis thread per platform, all sharing the item catalog
 LANGUAGE = "en"
 REQUEST_DELAY = 1.1 # Default, can be overridden by config
 LOOP_DELAY_SECONDS = 10 # Default, can be overridden by config
 BUMP_THRESHOLD_CYCLES = 5 # Default, can be overridden by config
-
-ITEM_ID_TO_DETAILS_MAP = {}
-ITEMS_MAP_FETCHED = False
-ITEM_USER_SETTINGS = {} # Will be loaded from config
+PRICING_UNDERCUT = 1 # Default, can be overridden by config ("pricing_undercut"). Plat below the lowest in-game seller
+PRICING_RAISE_HYSTERESIS = 0 # Default, can be overridden by config ("pricing_raise_hysteresis"). Skip price increases smaller than this (0 = never skip)
+BUMP_WINDOW_SECONDS = 120 # Default, can be overridden by config ("bump_window_seconds"). Due bumps are spread evenly over this long
+CHECKPOINT_MAX_AGE_SECONDS = 900 # Default, can be overridden by config ("checkpoint_max_age_seconds"). Older engine checkpoints are ignored on start
+RECORD_BOOK_TIMELINE = False # Default, can be overridden by config ("record_book_timeline"). Append strategy inputs to BOOK_TIMELINE_FILE for backtesting
+RECORD_BOOK_DELTAS = False # Default, can be overridden by config ("record_book_deltas"). Append order-book deltas to BOOK_DELTAS_FILE
+OWN_ORDERS_MAX_AGE_SECONDS = 60 # Default, can be overridden by config. How long the own-orders ledger is trusted before re-scraping
+OWN_ORDERS_SOURCE_ORDER = ["v2_orders_my", "profile_page"] # Default, can be overridden by config ("own_orders_sources"); tried in order
+OWN_ORDERS_SOURCE_RETRY_SECONDS = 1800 # A source that reported itself unavailable (e.g. 404) is skipped this long
+COMPETITOR_FETCH_MODE = "top" # Default, can be overridden by config ("competitor_fetch_mode"): "top" (top-of-book slice, full book only when needed) or "full"
+TOP_OF_BOOK_SLICE_SIZE = 5 # Orders per side returned by /v2/orders/item/{slug}/top
+TOP_OF_BOOK_RETRY_SECONDS = 1800 # If the top-of-book endpoint is unavailable (405/501, or a 404 for an item whose full book exists), full books are fetched this long before trying it again
+
+ITEM_CATALOG = wfm_catalog.ItemCatalog() # Compact catalog with id/slug/name indexes (see wfm_catalog.py)
+ITEM_ID_TO_DETAILS_MAP = ITEM_CATALOG # Older name; records still support .get("name"/"slug"/"icon"/"mod_max_rank")
+ITEMS_MAP_FETCHED = False # True once the catalog has been fetched from the API this run (a disk copy doesn't count)
+CATALOG_CACHE_FILE = os.path.join(CONFIG_DIRECTORY, "item_catalog.bin") if CONFIG_DIRECTORY else None
+ITEM_USER_SETTINGS = {} # Will be loaded from config. Keyed by item_settings_key(): item id for PLATFORM, "<platform>:<item id>" for the others
 DEVICE_ID = None # Will be loaded from config or generated
 CSRF_TOKEN = None
 CURRENT_JWT_STRING = None
 main_session = None # requests.Session object
 
-stop_processing_flag = False
-ITEM_BUMP_ELIGIBILITY_CYCLES = {}
+PROCESSING_CANCEL_TOKEN = wfm_cancel.CancellationToken() # Replaced on every start; cancelled by request_stop_processing() (stops every platform)
+ENGINE_CHECKPOINT_FILE = os.path.join(CONFIG_DIRECTORY, "engine_checkpoint.json") if CONFIG_DIRECTORY else None # Default platform's; others get engine_checkpoint_<platform>.json
+# Per-platform state (own-orders ledger, last-seen books, bump counters and queue, request pacing) lives in a
+# wfm_engine.PlatformEngine per platform; code running in an analysis thread uses its platform's via current_engine()
+PLATFORM_ENGINES = {PLATFORM: wfm_engine.PlatformEngine(PLATFORM, BUMP_WINDOW_SECONDS, ENGINE_CHECKPOINT_FILE)}
+# The default platform's state under the names used before engines were per platform (app.py reads these)
+ITEM_BUMP_ELIGIBILITY_CYCLES = PLATFORM_ENGINES[PLATFORM].bump_counters
+OWN_ORDERS_LEDGER = PLATFORM_ENGINES[PLATFORM].ledger # Write-through cache of the own-orders fetch (see get_own_orders)
+LAST_SEEN_BOOKS = PLATFORM_ENGINES[PLATFORM].last_seen_books # item_id -> {"lowest", "sellers", "source", "seen_at"} from the latest competitor fetch (checkpointed; shown on page load)
+BUMP_SCHEDULER = PLATFORM_ENGINES[PLATFORM].bump_scheduler # Low-priority bumps, run between cycles (see run_scheduled_bumps)
+BOOK_TIMELINE_FILE = os.path.join(CONFIG_DIRECTORY, "book_timeline.jsonl") if CONFIG_DIRECTORY else None
+BOOK_RECORDER = wfm_strategy.BookTimelineRecorder(BOOK_TIMELINE_FILE) # Replayed by wfm_backtest.py
+BOOK_DELTAS_FILE = os.path.join(CONFIG_DIRECTORY, "book_deltas.jsonl") if CONFIG_DIRECTORY else None
+BOOK_DELTA_RECORDER = wfm_orderbook.BookDeltaRecorder(BOOK_DELTAS_FILE) # Replayed by wfm_orderbook.replay_book_deltas
+
+def get_platform_engine(platform=None):
+    """The engine for `platform` (default PLATFORM), created on first use."""
+    platform = platform or PLATFORM
+    engine = PLATFORM_ENGINES.get(platform)
+    if engine is None:
+        checkpoint_file = os.path.join(CONFIG_DIRECTORY, f"engine_checkpoint_{platform}.json") if CONFIG_DIRECTORY else None
+        engine = PLATFORM_ENGINES[platform] = wfm_engine.PlatformEngine(platform, BUMP_WINDOW_SECONDS, checkpoint_file)
+    return engine
+
+def current_engine():
+    # The engine the analysis thread bound for its platform; the default platform's everywhere else (Flask routes)
+    return wfm_engine.bound_engine() or PLATFORM_ENGINES[PLATFORM]
+
+def current_platform():
+    # Sent as the Platform header on every API call and used to filter competitors
+    return current_engine().platform
+
+def get_pricing_strategy():
+    # Built from the current config on every cycle, so config changes apply without restarting processing
+    return wfm_strategy.UndercutStrategy(undercut=PRICING_UNDERCUT, bump_threshold_cycles=BUMP_THRESHOLD_CYCLES,
+                                         raise_hysteresis=PRICING_RAISE_HYSTERESIS)
+
+def get_buy_pricing_strategy():
+    # Buy orders use the same step and hysteresis as sell orders, mirrored (outbid instead of undercut)
+    return wfm_strategy.OutbidStrategy(outbid=PRICING_UNDERCUT, bump_threshold_cycles=BUMP_THRESHOLD_CYCLES,
+                                       lower_hysteresis=PRICING_RAISE_HYSTERESIS)
+
+def new_processing_cancel_token():
+    global PROCESSING_CANCEL_TOKEN
+    PROCESSING_CANCEL_TOKEN = wfm_cancel.CancellationToken()
+    return PROCESSING_CANCEL_TOKEN
+
+def request_stop_processing(reason="stop requested"):
+    # Wakes the analysis thread from any sleep and aborts its in-flight HTTP call (see wfm_cancel.py)
+    PROCESSING_CANCEL_TOKEN.cancel(reason)
+
+def _run_cancellable(function, *args, **kwargs):
+    # Abortable when called from the analysis thread; a plain call everywhere else (Flask routes)
+    cancel_token = wfm_cancel.current_token()
+    if cancel_token is None: return function(*args, **kwargs)
+    return cancel_token.run(function, *args, **kwargs)
+
+def _wait_for_request_slot(endpoint):
+    # Client-side pacing before every upstream call; timed so /metrics shows how much of a cycle is rate-limit wait.
+    # Each platform has its own budget: calls for one platform start REQUEST_DELAY apart, other platforms don't wait on them.
+    # Within a platform, slots go by priority lane (wfm_dispatch.py): UI actions first, then reprices, scans, bumps, status checks.
+    wait_start = time.perf_counter(); request_lane = wfm_dispatch.current_lane()
+    with wfm_tracing.span("rate_limit_wait"):
+        current_engine().dispatcher.acquire(request_lane, REQUEST_DELAY, wfm_cancel.current_token()) # Raises OperationCancelled as soon as a stop is requested
+    waited_seconds = time.perf_counter() - wait_start
+    wfm_metrics.RATE_LIMIT_WAIT.observe(waited_seconds, endpoint=endpoint)
+    wfm_metrics.LANE_WAIT.observe(waited_seconds, lane=request_lane)
+
+def _upstream_request(session_obj: requests.Session, method: str, url: str, endpoint: str, **kwargs):
+    # Single choke point for HTTP calls to warframe.market, so latency/status/bytes are measured in one place.
+    # Exceptions propagate unchanged; callers keep their existing requests.exceptions handling.
+    request_start = time.perf_counter(); status_label = "error"
+    try:
+        with wfm_tracing.span(f"http:{endpoint}"): response = _run_cancellable(session_obj.request, method, url, **kwargs)
+        status_label = str(response.status_code)
+        # Streamed responses (stream=True) are counted chunk by chunk in _iter_counted_chunks instead;
+        # touching .content here would read the whole body into memory and defeat the streaming.
+        if not kwargs.get("stream"): wfm_metrics.UPSTREAM_RESPONSE_BYTES.inc(len(response.content), endpoint=endpoint)
+        return response
+    except wfm_cancel.OperationCancelled:
+        status_label = "cancelled"
+        # An aborted write may or may not have reached the server, so the ledger can't be trusted anymore
+        if method != "GET": current_engine().ledger.invalidate()
+        raise
+    finally:
+        wfm_metrics.UPSTREAM_REQUESTS.inc(endpoint=endpoint, method=method, status=status_label)
+        wfm_metrics.UPSTREAM_LATENCY.observe(time.perf_counter() - request_start, endpoint=endpoint, status=status_label)
+
+STREAM_CHUNK_SIZE_BYTES = 16 * 1024
+
+def _iter_counted_chunks(response, endpoint, chunk_size=STREAM_CHUNK_SIZE_BYTES):
+    # Body of a stream=True response, with the bytes metric updated as the chunks arrive
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        wfm_metrics.UPSTREAM_RESPONSE_BYTES.inc(len(chunk), endpoint=endpoint)
+        yield chunk
 
 def parse_jwt_payload(jwt_string):
     if not jwt_string or len(jwt_string.split('.')) < 2: return None
@@ -97,10 +237,29 @@ def parse_jwt_payload(jwt_string):
         payload_b64 = jwt_string.split('.')[1]
         payload_b64 += '=' * (-len(payload_b64) % 4)
         payload_json = base64.urlsafe_b64decode(payload_b64).decode('utf-8')
-        return json.loads(payload_json)
+        return wfm_json.loads(payload_json)
     except Exception as e: print(f"LOG: Error parsing JWT payload: {e}"); return None
 
+def market_cookie_domain():
+    # The JWT cookie must be scoped to whatever host PROFILE_BASE_URL points at (warframe.market normally)
+    return urlparse(PROFILE_BASE_URL).hostname or "warframe.market"
+
+def market_origin():
+    parsed = urlparse(PROFILE_BASE_URL)
+    if parsed.scheme and parsed.netloc: return f"{parsed.scheme}://{parsed.netloc}"
+    return "https://warframe.market"
+
+def apply_base_url_overrides(config_data):
+    # Config keys win over the defaults, but an explicit environment variable wins over both
+    for config_key, (global_name, default_value) in BASE_URL_CONFIG_KEYS.items():
+        env_value = os.getenv(f"WFM_{global_name}")
+        config_value = config_data.get(config_key)
+        if env_value: globals()[global_name] = env_value
+        elif config_value: globals()[global_name] = config_value
+        else: globals()[global_name] = default_value
+
 def try_fetch_jwt_from_browsers():
+    _load_browser_cookie3()
     if not browser_cookie3: print("LOG: browser_cookie3 not available..."); return None
     print("LOG: Attempting to fetch JWT from Firefox browser cookies...")
     all_found_jwts_info = []
@@ -129,8 +288,58 @@ def try_fetch_jwt_from_browsers():
     else: print(f"LOG: Using JWT from {selected_jwt_info['source_browser']} (Issued At Timestamp: {selected_jwt_info['iat']}).")
     return latest_jwt_value
 
+# --- Browser JWT cache ---
+# Reading Firefox's cookies.sqlite (copy + decrypt + query) is slow and briefly locks the file, so the result
+# is cached against the (mtime, size) of the cookie DB and its WAL file: the browser is only read again
+# once the cookie store has actually changed. If the DB cannot be located the cache falls back to TTLs.
+BROWSER_JWT_NEGATIVE_TTL_SECONDS = 30 # "No JWT found" is re-checked at most this often when the DB cannot be stat'ed
+BROWSER_JWT_POSITIVE_TTL_SECONDS = 300 # Same for a found JWT
+_browser_jwt_cache = {"signature": None, "jwt": None, "checked_at": 0.0, "valid": False}
+_browser_cookie_db_path = None
+
+def browser_cookie_support_available():
+    return _load_browser_cookie3() is not None
+
+def _find_firefox_cookie_db():
+    global _browser_cookie_db_path
+    if _browser_cookie_db_path and os.path.exists(_browser_cookie_db_path): return _browser_cookie_db_path
+    _browser_cookie_db_path = None
+    firefox_class = getattr(_load_browser_cookie3(), "Firefox", None)
+    find_cookie_file = getattr(firefox_class, "find_cookie_file", None) # Static helper in browser_cookie3; absent in some versions
+    if not find_cookie_file: return None
+    try: _browser_cookie_db_path = find_cookie_file()
+    except Exception: return None # Firefox not installed / no profile
+    return _browser_cookie_db_path
+
+def _browser_cookie_db_signature():
+    cookie_db_path = _find_firefox_cookie_db()
+    if not cookie_db_path: return None
+    signature = [cookie_db_path]
+    for path in (cookie_db_path, cookie_db_path + "-wal"): # Firefox writes new cookies to the WAL first
+        try:
+            stat_result = os.stat(path); signature.append((stat_result.st_mtime_ns, stat_result.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def get_browser_jwt(force_refresh=False):
+    """Browser JWT (or None), re-reading the cookie store only when it changed or the TTL ran out."""
+    signature = _browser_cookie_db_signature()
+    cache = _browser_jwt_cache
+    if cache["valid"] and not force_refresh:
+        if signature is not None and signature == cache["signature"]:
+            wfm_metrics.record_cache_lookup("browser_jwt", True); return cache["jwt"]
+        ttl = BROWSER_JWT_POSITIVE_TTL_SECONDS if cache["jwt"] else BROWSER_JWT_NEGATIVE_TTL_SECONDS
+        if signature is None and cache["signature"] is None and time.time() - cache["checked_at"] < ttl:
+            wfm_metrics.record_cache_lookup("browser_jwt", True); return cache["jwt"]
+    wfm_metrics.record_cache_lookup("browser_jwt", False)
+    browser_jwt = try_fetch_jwt_from_browsers()
+    cache.update(signature=signature, jwt=browser_jwt, checked_at=time.time(), valid=True)
+    return browser_jwt
+
 def load_config():
-    global ITEM_USER_SETTINGS, DEVICE_ID, LOOP_DELAY_SECONDS, BUMP_THRESHOLD_CYCLES
+    global ITEM_USER_SETTINGS, DEVICE_ID, LOOP_DELAY_SECONDS, BUMP_THRESHOLD_CYCLES, OWN_ORDERS_MAX_AGE_SECONDS, OWN_ORDERS_SOURCE_ORDER, COMPETITOR_FETCH_MODE
+    global PRICING_UNDERCUT, PRICING_RAISE_HYSTERESIS, RECORD_BOOK_TIMELINE, RECORD_BOOK_DELTAS, BUMP_WINDOW_SECONDS, CHECKPOINT_MAX_AGE_SECONDS, PROCESSING_PLATFORMS
     # Defaults are set globally, load_config overrides them if file exists and has keys
     try:
         # CONFIG_FILE is now globally defined at the top, pointing to AppData
@@ -139,8 +348,8 @@ def load_config():
             ITEM_USER_SETTINGS = {}; DEVICE_ID = None; # Reset to defaults if no file
             return {} # Return empty dict as no config was loaded
 
-        with open(CONFIG_FILE, 'r') as f:
-            config_data = json.load(f)
+        with open(CONFIG_FILE, 'rb') as f:
+            config_data = wfm_json.loads(f.read())
             print(f"LOG: Configuration loaded from {CONFIG_FILE}")
 
             # Migration for old "min_prices" structure if it exists
@@ -162,6 +371,22 @@ def load_config():
             DEVICE_ID = config_data.get("device_id") # Load or keep as None if not found
             LOOP_DELAY_SECONDS = config_data.get("loop_delay_seconds", LOOP_DELAY_SECONDS) # Use default if not in config
             BUMP_THRESHOLD_CYCLES = config_data.get("bump_threshold_cycles", BUMP_THRESHOLD_CYCLES) # Use default if not in config
+            OWN_ORDERS_MAX_AGE_SECONDS = config_data.get("own_orders_max_age_seconds", OWN_ORDERS_MAX_AGE_SECONDS) # Use default if not in config
+            OWN_ORDERS_SOURCE_ORDER = config_data.get("own_orders_sources", OWN_ORDERS_SOURCE_ORDER) # Use default if not in config
+            COMPETITOR_FETCH_MODE = config_data.get("competitor_fetch_mode", COMPETITOR_FETCH_MODE) # Use default if not in config
+            PRICING_UNDERCUT = config_data.get("pricing_undercut", PRICING_UNDERCUT) # Use default if not in config
+            PRICING_RAISE_HYSTERESIS = config_data.get("pricing_raise_hysteresis", PRICING_RAISE_HYSTERESIS) # Use default if not in config
+            BUMP_WINDOW_SECONDS = config_data.get("bump_window_seconds", BUMP_WINDOW_SECONDS) # Use default if not in config
+            CHECKPOINT_MAX_AGE_SECONDS = config_data.get("checkpoint_max_age_seconds", CHECKPOINT_MAX_AGE_SECONDS) # Use default if not in config
+            RECORD_BOOK_TIMELINE = bool(config_data.get("record_book_timeline", RECORD_BOOK_TIMELINE)) # Use default if not in config
+            RECORD_BOOK_DELTAS = bool(config_data.get("record_book_deltas", RECORD_BOOK_DELTAS)) # Use default if not in config
+            configured_platforms = config_data.get("platforms", PROCESSING_PLATFORMS) # Use default if not in config
+            if not isinstance(configured_platforms, list): configured_platforms = []
+            PROCESSING_PLATFORMS = [p for p in wfm_engine.SUPPORTED_PLATFORMS if p in configured_platforms] or [PLATFORM]
+            if len(PROCESSING_PLATFORMS) != len(configured_platforms):
+                print(f"LOG: Warning - 'platforms' in config should list some of {', '.join(wfm_engine.SUPPORTED_PLATFORMS)}. Using {PROCESSING_PLATFORMS}.")
+            BOOK_RECORDER.enabled = RECORD_BOOK_TIMELINE; BOOK_DELTA_RECORDER.enabled = RECORD_BOOK_DELTAS
+            apply_base_url_overrides(config_data)
             return config_data # Return all loaded data
     except FileNotFoundError: # Should be caught by os.path.exists above, but as a safeguard
         print(f"LOG: {CONFIG_FILE_NAME} not found (secondary check). Using defaults.");
@@ -195,14 +420,29 @@ def save_config(user_id_to_save): # user_id is now a parameter
             "device_id": DEVICE_ID, # DEVICE_ID is global, managed by load_config or generated
             "loop_delay_seconds": LOOP_DELAY_SECONDS, # Global, might have been updated from default
             "bump_threshold_cycles": BUMP_THRESHOLD_CYCLES, # Global
+            "own_orders_max_age_seconds": OWN_ORDERS_MAX_AGE_SECONDS, # Global
+            "own_orders_sources": OWN_ORDERS_SOURCE_ORDER, # Global
+            "competitor_fetch_mode": COMPETITOR_FETCH_MODE, # Global
+            "pricing_undercut": PRICING_UNDERCUT, # Global
+            "pricing_raise_hysteresis": PRICING_RAISE_HYSTERESIS, # Global
+            "bump_window_seconds": BUMP_WINDOW_SECONDS, # Global
+            "checkpoint_max_age_seconds": CHECKPOINT_MAX_AGE_SECONDS, # Global
+            "record_book_timeline": RECORD_BOOK_TIMELINE, # Global
+            "record_book_deltas": RECORD_BOOK_DELTAS, # Global
+            "platforms": PROCESSING_PLATFORMS, # Global
             "item_price_settings": ITEM_USER_SETTINGS # Global
         }
+        # Only persist base URL overrides that came from config (not env vars), so the defaults stay implicit
+        for config_key, (global_name, default_value) in BASE_URL_CONFIG_KEYS.items():
+            current_value = globals()[global_name]
+            if current_value != default_value and not os.getenv(f"WFM_{global_name}"):
+                config_to_write[config_key] = current_value
         # Remove old "min_prices" key if it exists from a previous migration
         if "min_prices" in config_to_write:
             del config_to_write["min_prices"]
 
-        with open(CONFIG_FILE, 'w') as f_write: # CONFIG_FILE is global, points to AppData
-            json.dump(config_to_write, f_write, indent=4)
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f_write: # CONFIG_FILE is global, points to AppData
+            f_write.write(wfm_json.dumps(config_to_write, indent=4)) # Still pretty-printed for hand edits (2-space indent with orjson)
         print(f"LOG: Configuration saved to {CONFIG_FILE}"); return True
     except Exception as e: print(f"LOG: Unexpected error saving config to {CONFIG_FILE}: {e}"); return False
 
@@ -217,17 +457,18 @@ def prettify_slug(slug_str):
 def fetch_all_items_and_build_map_v2(session_obj: requests.Session):
     global ITEM_ID_TO_DETAILS_MAP, ITEMS_MAP_FETCHED
     
+    wfm_metrics.record_cache_lookup("item_catalog", ITEMS_MAP_FETCHED)
     if ITEMS_MAP_FETCHED: 
         # print("LOG: Item map already fetched."); # Can be noisy, optional
         return True
         
     all_items_url = f"{API_V2_BASE_URL}/items"
     print(f"LOG: Fetching all item details from {all_items_url} (v2) for item map...")
-    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": PLATFORM, "Language": LANGUAGE}
-    time.sleep(REQUEST_DELAY); response = None
+    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
+    _wait_for_request_slot("v2_items"); response = None
     try:
-        response = session_obj.get(all_items_url, headers=request_headers, timeout=60)
-        response.raise_for_status(); items_response_data = response.json()
+        response = _upstream_request(session_obj, "GET", all_items_url, "v2_items", headers=request_headers, timeout=60)
+        response.raise_for_status(); items_response_data = wfm_json.response_json(response)
         
         items_list = []
         if isinstance(items_response_data, dict) and "data" in items_response_data:
@@ -244,7 +485,7 @@ def fetch_all_items_and_build_map_v2(session_obj: requests.Session):
             print(f"LOG: Critical Warning - Could not extract items list from /v2/items response. Raw response: {str(items_response_data)[:500]}")
             return False 
 
-        ITEM_ID_TO_DETAILS_MAP.clear()
+        catalog_items = []
         for item_details in items_list: 
             if not isinstance(item_details, dict): 
                 print(f"LOG: Warning - Expected item_details dict, got {type(item_details)}. Value: {str(item_details)[:100]}"); 
@@ -265,12 +506,12 @@ def fetch_all_items_and_build_map_v2(session_obj: requests.Session):
             mod_max_rank = item_details.get("maxRank") 
             
             if item_id:
-                ITEM_ID_TO_DETAILS_MAP[item_id] = {
-                    "name": final_name_for_map, 
-                    "slug": item_slug, 
-                    "icon": icon_path, 
-                    "mod_max_rank": mod_max_rank 
-                }
+                catalog_items.append(wfm_catalog.CatalogItem(
+                    str(item_id), final_name_for_map, item_slug, icon_path,
+                    wfm_catalog.build_icon_url(icon_path, STATIC_ASSETS_BASE_URL), mod_max_rank
+                ))
+        ITEM_CATALOG.replace_all(catalog_items, source="network")
+        save_catalog_cache()
         
         ITEMS_MAP_FETCHED = True
         print(f"LOG: Item map built: {len(ITEM_ID_TO_DETAILS_MAP)} items."); 
@@ -292,15 +533,15 @@ def fetch_all_items_and_build_map_v2(session_obj: requests.Session):
 def fetch_v2_me_manual_jwt(session_obj: requests.Session, current_jwt: str, device_id_val: str = None, called_from_get_jwt=False):
     if not current_jwt: return None, True, None
     me_url = f"{API_V2_BASE_URL}/me"
-    request_headers = {"Authorization": f"Bearer {current_jwt}", "Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": PLATFORM, "Language": LANGUAGE}
+    request_headers = {"Authorization": f"Bearer {current_jwt}", "Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
     if device_id_val: request_headers["Device-Id"] = device_id_val
-    if not called_from_get_jwt: time.sleep(REQUEST_DELAY)
+    if not called_from_get_jwt: _wait_for_request_slot("v2_me")
     try:
-        response = session_obj.get(me_url, headers=request_headers, timeout=10)
+        response = _upstream_request(session_obj, "GET", me_url, "v2_me", headers=request_headers, timeout=10)
         if response.status_code == 401:
             if not called_from_get_jwt: print(f"LOG: {me_url} auth failed (401).");
             return None, True, None
-        response.raise_for_status(); user_profile_response_envelope = response.json()
+        response.raise_for_status(); user_profile_response_envelope = wfm_json.response_json(response)
         profile_actual_data = user_profile_response_envelope.get("data")
         if not isinstance(profile_actual_data, dict):
             print(f"LOG: Error - 'data' field in /v2/me response is not a dict. Response: {user_profile_response_envelope}"); return None, False, None
@@ -318,11 +559,12 @@ def fetch_v2_me_manual_jwt(session_obj: requests.Session, current_jwt: str, devi
 def fetch_orders_for_item_slug_v2(session_obj: requests.Session, item_slug: str):
     if not item_slug: print("LOG: item_slug is required for fetch_orders_for_item_slug_v2"); return []
     item_orders_url = f"{API_V2_BASE_URL}/orders/item/{item_slug}"
-    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": PLATFORM, "Language": LANGUAGE}
-    time.sleep(REQUEST_DELAY); response = None
+    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
+    _wait_for_request_slot("v2_orders_item"); response = None
     try:
-        response = session_obj.get(item_orders_url, headers=request_headers, timeout=15)
-        response.raise_for_status(); response_data = response.json()
+        response = _upstream_request(session_obj, "GET", item_orders_url, "v2_orders_item", headers=request_headers, timeout=15)
+        response.raise_for_status()
+        with wfm_tracing.span("json_decode"): response_data = wfm_json.response_json(response)
         orders = []
         if isinstance(response_data, dict) and "data" in response_data and isinstance(response_data["data"], list):
             orders = response_data["data"]
@@ -340,24 +582,186 @@ def fetch_orders_for_item_slug_v2(session_obj: requests.Session, item_slug: str)
     except Exception as e: print(f"LOG: Unexpected error in fetch_orders_for_item_slug_v2 ({item_slug}): {e}")
     return []
 
+def fetch_order_book_summary_v2(session_obj: requests.Session, item_slug: str, current_user_id: str):
+    """Full /v2/orders/item/{slug} book, stream-decoded and filtered while it downloads (see wfm_orderbook.py).
+    Returns a CompactBook with the prices of other in-game users on our platform (and every other user's order on it, keyed), or None on error."""
+    if not item_slug: print("LOG: item_slug is required for fetch_order_book_summary_v2"); return None
+    item_orders_url = f"{API_V2_BASE_URL}/orders/item/{item_slug}"
+    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
+    _wait_for_request_slot("v2_orders_item"); response = None
+    try:
+        response = _upstream_request(session_obj, "GET", item_orders_url, "v2_orders_item", headers=request_headers, timeout=15, stream=True)
+        response.raise_for_status()
+        # Download and parse are interleaved, so this span covers both
+        with wfm_tracing.span("json_stream_decode"):
+            return _run_cancellable(wfm_orderbook.filter_order_book, _iter_counted_chunks(response, "v2_orders_item"), current_platform(), exclude_user_id=current_user_id, keep_orders=True)
+    except requests.exceptions.HTTPError as http_err: print(f"LOG: HTTP error in fetch_order_book_summary_v2 ({item_slug}): {http_err}")
+    except requests.exceptions.RequestException as e: print(f"LOG: Request error in fetch_order_book_summary_v2 ({item_slug}): {e}")
+    except ValueError as e: print(f"LOG: JSON decode error in fetch_order_book_summary_v2 ({item_slug}): {e}")
+    finally:
+        if response is not None: response.close() # Return the connection to the pool even if we stopped reading early
+    return None
+
+class CompetitorModeUnavailable(Exception):
+    """The top-of-book endpoint can't be used; the caller switches to full-book fetches.
+    item_may_be_missing: set for a 404, which is also what an unknown slug gets; the endpoint only counts as
+    missing once the same item's full book has been fetched."""
+
+    def __init__(self, message, item_may_be_missing=False):
+        super().__init__(message)
+        self.item_may_be_missing = item_may_be_missing
+
+
+def fetch_top_orders_for_item_slug_v2(session_obj: requests.Session, item_slug: str):
+    """Top-of-book slice (/v2/orders/item/{slug}/top): the cheapest sell and highest buy orders from online/in-game users only.
+    Returns {"sell": [...], "buy": [...]} (lists possibly empty) or None on error; raises CompetitorModeUnavailable if the endpoint isn't supported."""
+    if not item_slug: print("LOG: item_slug is required for fetch_top_orders_for_item_slug_v2"); return None
+    top_orders_url = f"{API_V2_BASE_URL}/orders/item/{item_slug}/top"
+    request_headers = {"Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
+    _wait_for_request_slot("v2_orders_item_top")
+    try:
+        response = _upstream_request(session_obj, "GET", top_orders_url, "v2_orders_item_top", headers=request_headers, timeout=15)
+        if response.status_code in (404, 405, 501): raise CompetitorModeUnavailable(f"{top_orders_url} returned {response.status_code}", item_may_be_missing=response.status_code == 404)
+        response.raise_for_status()
+        with wfm_tracing.span("json_decode"): response_data = wfm_json.response_json(response)
+        top_data = response_data.get("data") if isinstance(response_data, dict) else None
+        if not isinstance(top_data, dict) or not isinstance(top_data.get("sell"), list):
+            print(f"LOG: Warning - Could not find 'data.sell' list in /v2/orders/item/{item_slug}/top. Raw: {str(response_data)[:300]}"); return None
+        top_orders = {"sell": top_data["sell"], "buy": top_data.get("buy") if isinstance(top_data.get("buy"), list) else []}
+        for order_type, side_orders in top_orders.items():
+            for order in side_orders:
+                if isinstance(order, dict): order.setdefault("type", order_type) # The top endpoint groups by side already
+        return top_orders
+    except requests.exceptions.RequestException as e: print(f"LOG: Request error in fetch_top_orders_for_item_slug_v2 ({item_slug}): {e}")
+    except ValueError as e: print(f"LOG: JSON decode error in fetch_top_orders_for_item_slug_v2 ({item_slug}): {e}")
+    return None
+
+def summarize_competitors(competitor_orders, current_user_id, order_type="sell"):
+    """(lowest price, seller count) over other in-game sellers on our platform; (inf, 0) if there are none.
+    With order_type="buy": (highest price, buyer count) over other in-game buyers; (None, 0) if there are none."""
+    comp_prices = []; platform = current_platform()
+    for comp_order in competitor_orders:
+        comp_user = comp_order.get("user", {})
+        if not isinstance(comp_user, dict): continue # Skip malformed user data
+        if comp_user.get("platform") == platform and comp_order.get("type") == order_type and comp_user.get("id") != current_user_id and comp_user.get("status") == "ingame":
+            price_val = comp_order.get("platinum")
+            if isinstance(price_val, (int, float)) and price_val > 0: comp_prices.append(price_val)
+    if order_type == "buy": return (max(comp_prices) if comp_prices else None), len(comp_prices)
+    return (min(comp_prices) if comp_prices else float('inf')), len(comp_prices)
+
+_top_of_book_disabled_until = 0.0 # time.monotonic(); set when the top endpoint turns out to be unavailable
+
+def _disable_top_of_book(reason):
+    global _top_of_book_disabled_until
+    print(f"LOG: Top-of-book endpoint unavailable ({reason}). Using full order books for the next {TOP_OF_BOOK_RETRY_SECONDS}s.")
+    _top_of_book_disabled_until = time.monotonic() + TOP_OF_BOOK_RETRY_SECONDS
+
+def fetch_competitor_summary(session_obj: requests.Session, item_slug: str, current_user_id: str, sides=("sell",)):
+    """Competitors on both sides of the book from one fetch: (lowest sell price, seller count, highest buy price,
+    buyer count, source, keyed orders), or None if the book couldn't be fetched. Keyed orders are the other users' orders
+    on our platform that were seen ({order_id: (side, price, status)}; the slice in "top" mode), for OrderBookTracker. `sides` are the ones the caller needs exactly.
+
+    In "top" mode the small top-of-book slice is tried first. Its sellers are the cheapest online/in-game ones,
+    so if any qualifying in-game seller is in it, the cheapest qualifying seller overall is too and the lowest
+    price is exact (the count then only covers the slice); the same holds for the highest buyer. The full book
+    is needed only when a needed side's slice is full but has no qualifying order (they may all be
+    online-not-in-game, other platforms or us)."""
+    top_not_found = None # A 404 from /top, judged once the full book shows whether the item itself exists
+    if COMPETITOR_FETCH_MODE == "top" and time.monotonic() >= _top_of_book_disabled_until:
+        try:
+            top_orders = fetch_top_orders_for_item_slug_v2(session_obj, item_slug)
+        except CompetitorModeUnavailable as e:
+            top_orders = None
+            if e.item_may_be_missing: top_not_found = e
+            else: _disable_top_of_book(e)
+        if top_orders is not None:
+            lowest_comp_price, ingame_sellers = summarize_competitors(top_orders["sell"], current_user_id, "sell")
+            highest_comp_bid, ingame_buyers = summarize_competitors(top_orders["buy"], current_user_id, "buy")
+            side_counts = {"sell": ingame_sellers, "buy": ingame_buyers}
+            # A side is answered if it has a qualifying order, or if its slice is short (then it holds every online order)
+            if all(side_counts[side] or len(top_orders[side]) < TOP_OF_BOOK_SLICE_SIZE for side in sides):
+                book_orders = wfm_orderbook.key_orders(top_orders["sell"] + top_orders["buy"], current_platform(), current_user_id)
+                return lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, "top", book_orders
+    book = fetch_order_book_summary_v2(session_obj, item_slug, current_user_id)
+    if top_not_found is not None and book is not None: _disable_top_of_book(top_not_found) # The item exists, so /top itself is missing
+    if book is None or not book.orders_seen: return None # Error, or an empty book (same as the old "no orders" case)
+    return book.lowest_sell(), len(book.sell_prices), book.highest_buy(), len(book.buy_prices), "full", book.orders
+
+def _catalog_cache_source_label():
+    # A cached catalog is only reused for the same API/language, so a mock server's catalog never leaks into real use
+    return f"{API_V2_BASE_URL}|{LANGUAGE}"
+
+def save_catalog_cache():
+    if not CATALOG_CACHE_FILE or not ITEM_CATALOG: return False
+    try:
+        ITEM_CATALOG.save(CATALOG_CACHE_FILE, _catalog_cache_source_label()); return True
+    except OSError as e:
+        print(f"LOG: Could not write item catalog cache {CATALOG_CACHE_FILE}: {e}"); return False
+
+def load_catalog_cache():
+    """Fill ITEM_CATALOG from the on-disk copy of the last fetched catalog. Returns the number of items loaded."""
+    if not CATALOG_CACHE_FILE or not os.path.exists(CATALOG_CACHE_FILE): return 0
+    loaded_count = ITEM_CATALOG.load(CATALOG_CACHE_FILE, STATIC_ASSETS_BASE_URL, _catalog_cache_source_label())
+    if loaded_count: print(f"LOG: Item catalog loaded from cache file: {loaded_count} items.")
+    return loaded_count
+
+def order_for_ui_from_v1(order_raw):
+    """Our UI/engine order dict from a v1-shaped order (profile page application-state or v1 POST response)."""
+    item_data = order_raw.get("item", {})
+    raw_item_id = item_data.get("id")
+    if not raw_item_id:
+        print(f"LOG: Warning - Order found without item ID in profile scrape: {order_raw}"); return None
+    item_id_str = str(raw_item_id)
+
+    item_name_from_order = item_data.get(LANGUAGE, {}).get("item_name")
+    if not item_name_from_order and "item_name" in item_data: item_name_from_order = item_data.get("item_name") # Fallback
+    item_slug = item_data.get("url_name"); item_icon_path = item_data.get("icon")
+    mod_rank_from_order = order_raw.get("mod_rank") # Can be None or 0
+    map_details = ITEM_ID_TO_DETAILS_MAP.get(item_id_str) # Get details from our global map
+
+    resolved_item_name = item_name_from_order
+    if not resolved_item_name and map_details:
+        resolved_item_name = map_details.get("name")
+    if not resolved_item_name: # Still no name
+         resolved_item_name = f"Item ID {item_id_str}" # Last resort
+
+    # Prefer map name if it's more complete and order name isn't specific enough
+    if map_details and map_details.get("name") and (not item_name_from_order or item_name_from_order == resolved_item_name):
+         if map_details.get("name") != f"ItemID_{item_id_str}": # Don't use placeholder map name
+            resolved_item_name = map_details.get("name")
+
+    resolved_item_slug = item_slug
+    if map_details and map_details.get("slug"): resolved_item_slug = map_details.get("slug")
+    mod_max_rank_from_map = map_details.mod_max_rank if map_details else None
+    if map_details and map_details.icon_url: full_icon_url = map_details.icon_url # Precomputed when the catalog was built
+    else: full_icon_url = wfm_catalog.build_icon_url(item_icon_path, STATIC_ASSETS_BASE_URL)
+
+    user_setting = get_item_settings(item_id_str) or {"numeric_min": None, "skipped": False} # Default if not in settings
+    numeric_min = user_setting.get("numeric_min"); is_skipped = user_setting.get("skipped", False)
+    order_for_ui = {"item_id": item_id_str, "item_name": resolved_item_name, "item_slug": resolved_item_slug, "order_id": order_raw.get("id"), "platinum": order_raw.get("platinum"), "quantity": order_raw.get("quantity"), "visible": order_raw.get("visible", False), "rank": mod_rank_from_order, "mod_max_rank": mod_max_rank_from_map, "type": order_raw.get("order_type"), "icon_url": full_icon_url, "numeric_min_price": numeric_min, "is_skipped": is_skipped}
+    return order_for_ui
+
 def fetch_orders_from_profile_page(session_obj: requests.Session, ingame_name: str, current_jwt_for_cookie: str):
     global ITEM_ID_TO_DETAILS_MAP, ITEM_USER_SETTINGS # Uses these globals
     if not ingame_name: print("LOG: Error - In-game name required for profile page fetch."); return None, None
     if not current_jwt_for_cookie: print("LOG: Error - JWT required for profile page cookie."); return None, None
     profile_url = f"{PROFILE_BASE_URL}/{ingame_name}"
     original_cookies = session_obj.cookies.copy()
-    session_obj.cookies.set("JWT", current_jwt_for_cookie, domain="warframe.market", path="/")
+    session_obj.cookies.set("JWT", current_jwt_for_cookie, domain=market_cookie_domain(), path="/")
     request_headers = {"User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8", "Accept-Language": "en-US,en;q=0.5", "Cache-Control": "no-cache", "Pragma": "no-cache"}
-    time.sleep(REQUEST_DELAY); processed_orders_for_snapshot = []; user_status_from_profile_scrape = None
+    _wait_for_request_slot("profile_page"); processed_orders_for_snapshot = []; user_status_from_profile_scrape = None
     try:
-        response = session_obj.get(profile_url, headers=request_headers, timeout=20)
+        response = _upstream_request(session_obj, "GET", profile_url, "profile_page", headers=request_headers, timeout=20)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        script_tag = soup.find('script', {'id': 'application-state', 'type': 'application/json'})
+        print(f"LOG: Own orders via profile page HTML: {len(response.content) / 1024:.1f} KB downloaded.")
+        with wfm_tracing.span("html_parse"):
+            from bs4 import BeautifulSoup # Deferred import (slow); cached by Python after the first scrape
+            soup = BeautifulSoup(response.text, 'html.parser')
+            script_tag = soup.find('script', {'id': 'application-state', 'type': 'application/json'})
+            app_state_json = wfm_json.loads(script_tag.string) if script_tag else None
         if not script_tag:
             print(f"LOG: Error - Could not find <script id='application-state'> in {profile_url}")
             return None, None
-        app_state_json = json.loads(script_tag.string)
         current_user_data = app_state_json.get("currentUser")
         if isinstance(current_user_data, dict): user_status_from_profile_scrape = current_user_data.get("status")
         payload_data_from_page = app_state_json.get("payload", {})
@@ -369,44 +773,8 @@ def fetch_orders_from_profile_page(session_obj: requests.Session, ingame_name: s
             buy_orders_raw = profile_data_for_orders.get("buy", [])
         all_orders_raw = sell_orders_raw + buy_orders_raw
         for order_raw in all_orders_raw:
-            item_data = order_raw.get("item", {})
-            raw_item_id = item_data.get("id")
-            if not raw_item_id:
-                print(f"LOG: Warning - Order found without item ID in profile scrape: {order_raw}"); continue
-            item_id_str = str(raw_item_id)
-
-            item_name_from_order = item_data.get(LANGUAGE, {}).get("item_name")
-            if not item_name_from_order and "item_name" in item_data: item_name_from_order = item_data.get("item_name") # Fallback
-            item_slug = item_data.get("url_name"); item_icon_path = item_data.get("icon")
-            mod_rank_from_order = order_raw.get("mod_rank") # Can be None or 0
-            map_details = ITEM_ID_TO_DETAILS_MAP.get(item_id_str) # Get details from our global map
-            
-            resolved_item_name = item_name_from_order
-            if not resolved_item_name and map_details:
-                resolved_item_name = map_details.get("name")
-            if not resolved_item_name: # Still no name
-                 resolved_item_name = f"Item ID {item_id_str}" # Last resort
-
-            # Prefer map name if it's more complete and order name isn't specific enough
-            if map_details and map_details.get("name") and (not item_name_from_order or item_name_from_order == resolved_item_name):
-                 if map_details.get("name") != f"ItemID_{item_id_str}": # Don't use placeholder map name
-                    resolved_item_name = map_details.get("name")
-
-            resolved_item_slug = item_slug
-            if map_details and map_details.get("slug"): resolved_item_slug = map_details.get("slug")
-            resolved_item_icon_path = item_icon_path
-            if map_details and map_details.get("icon"): resolved_item_icon_path = map_details.get("icon")
-            mod_max_rank_from_map = map_details.get("mod_max_rank") if map_details else None
-            full_icon_url = None
-            if resolved_item_icon_path:
-                if resolved_item_icon_path.startswith("http"): full_icon_url = resolved_item_icon_path
-                elif resolved_item_icon_path.startswith("/"): full_icon_url = f"{STATIC_ASSETS_BASE_URL}{resolved_item_icon_path.lstrip('/')}"
-                else: full_icon_url = f"{STATIC_ASSETS_BASE_URL}{resolved_item_icon_path}"
-            
-            user_setting = ITEM_USER_SETTINGS.get(item_id_str, {"numeric_min": None, "skipped": False}) # Default if not in settings
-            numeric_min = user_setting.get("numeric_min"); is_skipped = user_setting.get("skipped", False)
-            order_for_ui = {"item_id": item_id_str, "item_name": resolved_item_name, "item_slug": resolved_item_slug, "order_id": order_raw.get("id"), "platinum": order_raw.get("platinum"), "quantity": order_raw.get("quantity"), "visible": order_raw.get("visible", False), "rank": mod_rank_from_order, "mod_max_rank": mod_max_rank_from_map, "type": order_raw.get("order_type"), "icon_url": full_icon_url, "numeric_min_price": numeric_min, "is_skipped": is_skipped}
-            processed_orders_for_snapshot.append(order_for_ui)
+            order_for_ui = order_for_ui_from_v1(order_raw)
+            if order_for_ui: processed_orders_for_snapshot.append(order_for_ui)
         return processed_orders_for_snapshot, user_status_from_profile_scrape
     except requests.exceptions.RequestException as e: print(f"LOG: Request error fetching profile page {profile_url}: {e}")
     except json.JSONDecodeError as e: print(f"LOG: Error decoding JSON from application-state in {profile_url}.")
@@ -414,6 +782,100 @@ def fetch_orders_from_profile_page(session_obj: requests.Session, ingame_name: s
     finally: session_obj.cookies = original_cookies
     return None, None
 
+class OwnOrdersSourceUnavailable(Exception):
+    """Raised by an own-orders source that can't be used right now (endpoint missing, catalog not loaded...).
+    retry_after_seconds: how long to leave the source alone before trying it again; None retries on the next refresh."""
+
+    def __init__(self, message, retry_after_seconds=None):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+def order_for_ui_from_v2(order_raw):
+    """Our UI/engine order dict from a v2 order (/v2/orders/my). v2 orders only carry itemId, so name/slug/icon come from the catalog."""
+    item_id_str = str(order_raw.get("itemId") or "")
+    if not item_id_str:
+        print(f"LOG: Warning - v2 order without itemId: {order_raw}"); return None
+    catalog_item = ITEM_CATALOG.get(item_id_str)
+    return {"item_id": item_id_str, "item_name": catalog_item.name if catalog_item else f"Item ID {item_id_str}",
+            "item_slug": catalog_item.slug if catalog_item else None, "order_id": order_raw.get("id"),
+            "platinum": order_raw.get("platinum"), "quantity": order_raw.get("quantity"), "visible": order_raw.get("visible", False),
+            "rank": order_raw.get("rank"), "mod_max_rank": catalog_item.mod_max_rank if catalog_item else None,
+            "type": order_raw.get("type"), "icon_url": catalog_item.icon_url if catalog_item else None}
+
+def fetch_own_orders_v2(session_obj: requests.Session, ingame_name: str, current_jwt: str):
+    """Own orders from the JSON API (/v2/orders/my). Same (orders, profile_status) shape as the profile scrape;
+    the API doesn't report our online status, so profile_status is always None here."""
+    if not current_jwt: print("LOG: Error - JWT required for /v2/orders/my."); return None, None
+    if not ITEM_CATALOG: raise OwnOrdersSourceUnavailable("item catalog not loaded yet (needed to resolve item names/slugs)")
+    my_orders_url = f"{API_V2_BASE_URL}/orders/my"
+    request_headers = {"Authorization": f"Bearer {current_jwt}", "Accept": "application/json", "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE}
+    if DEVICE_ID: request_headers["Device-Id"] = DEVICE_ID
+    _wait_for_request_slot("v2_orders_my")
+    try:
+        response = _upstream_request(session_obj, "GET", my_orders_url, "v2_orders_my", headers=request_headers, timeout=20)
+        if response.status_code in (404, 405, 501): raise OwnOrdersSourceUnavailable(f"{my_orders_url} returned {response.status_code}", OWN_ORDERS_SOURCE_RETRY_SECONDS)
+        response.raise_for_status()
+        print(f"LOG: Own orders via /v2/orders/my JSON: {len(response.content) / 1024:.1f} KB downloaded.")
+        with wfm_tracing.span("json_decode"): orders_envelope = wfm_json.response_json(response)
+        orders_raw = orders_envelope.get("data") if isinstance(orders_envelope, dict) else None
+        if not isinstance(orders_raw, list):
+            print(f"LOG: Error - 'data' field in /v2/orders/my response is not a list. Response: {str(orders_envelope)[:200]}"); return None, None
+        own_orders = [order_for_ui for order_for_ui in (order_for_ui_from_v2(order_raw) for order_raw in orders_raw if isinstance(order_raw, dict)) if order_for_ui]
+        return own_orders, None
+    except requests.exceptions.RequestException as e: print(f"LOG: Request error fetching {my_orders_url}: {e}")
+    except ValueError as e: print(f"LOG: Error decoding JSON from {my_orders_url}: {e}")
+    return None, None
+
+# Pluggable own-orders sources: name -> fetch(session, ingame_name, jwt) returning (orders, profile_status) or (None, None)
+OWN_ORDERS_SOURCES = {
+    "v2_orders_my": fetch_own_orders_v2,
+    "profile_page": fetch_orders_from_profile_page, # Full HTML page; kept as the fallback
+}
+_own_orders_source_skip_until = {} # source name -> time.monotonic() until which it is skipped
+
+def fetch_own_orders_from_sources(session_obj: requests.Session, ingame_name: str, current_jwt: str):
+    """Try each configured own-orders source in order. Returns (orders, profile_status, source_name); (None, None, None) if all failed."""
+    for source_name in OWN_ORDERS_SOURCE_ORDER:
+        fetch_source = OWN_ORDERS_SOURCES.get(source_name)
+        if fetch_source is None:
+            print(f"LOG: Warning - Unknown own orders source '{source_name}' in config. Skipping."); continue
+        if time.monotonic() < _own_orders_source_skip_until.get(source_name, 0): continue
+        try:
+            orders, profile_status = fetch_source(session_obj, ingame_name, current_jwt)
+        except OwnOrdersSourceUnavailable as e:
+            print(f"LOG: Own orders source '{source_name}' unavailable ({e}). Falling back.")
+            # Missing endpoint: don't retry for a while. Missing catalog is transient (no retry_after): retry on the next refresh
+            if e.retry_after_seconds is not None: _own_orders_source_skip_until[source_name] = time.monotonic() + e.retry_after_seconds
+            continue
+        if orders is not None:
+            print(f"LOG: Own orders refreshed from '{source_name}': {len(orders)} orders.")
+            return orders, profile_status, source_name
+        print(f"LOG: Own orders source '{source_name}' failed. Falling back.")
+    return None, None, None
+
+def _apply_current_user_settings(order):
+    # Min/max price and skip are user settings, not market data: always take the live values, not those from scrape time
+    user_setting = get_item_settings(order.get("item_id")) or {"numeric_min": None, "skipped": False}
+    order["numeric_min_price"] = user_setting.get("numeric_min"); order["is_skipped"] = user_setting.get("skipped", False)
+    order["numeric_max_price"] = user_setting.get("numeric_max"); order["is_buy_skipped"] = user_setting.get("buy_skipped", False)
+    return order
+
+def get_own_orders(session_obj: requests.Session, ingame_name: str, current_jwt: str, max_age_seconds=None, force_refresh=False):
+    """Same (orders, profile_status) as fetch_orders_from_profile_page, served from the current platform's ledger while it is
+    younger than max_age_seconds (default OWN_ORDERS_MAX_AGE_SECONDS), otherwise refreshed from the configured
+    own-orders sources. If every source fails this returns (None, None) as before."""
+    max_age = OWN_ORDERS_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+    ledger = current_engine().ledger # Our orders on the current platform
+    if not force_refresh and ledger.is_fresh(max_age, ingame_name):
+        wfm_metrics.record_cache_lookup("own_orders", True)
+        return [_apply_current_user_settings(order) for order in ledger.snapshot()], ledger.profile_status
+    wfm_metrics.record_cache_lookup("own_orders", False)
+    orders, profile_status, source_name = fetch_own_orders_from_sources(session_obj, ingame_name, current_jwt)
+    if orders is None: return None, None
+    ledger.replace(orders, ingame_name, profile_status, source=source_name)
+    return [_apply_current_user_settings(order) for order in ledger.snapshot()], profile_status
+
 def update_order_via_v1_put(req_session: requests.Session, order_id_to_update: str, new_price: int, new_quantity: int, new_visibility: bool, current_rank,
                             jwt_token: str, csrf_token_val: str, device_id_val: str = None):
     if not all([order_id_to_update, jwt_token, csrf_token_val]):
@@ -425,22 +887,26 @@ def update_order_via_v1_put(req_session: requests.Session, order_id_to_update: s
     order_id_str = str(order_id_to_update).strip()
     update_url = f"{API_V1_BASE_URL}/profile/orders/{order_id_str}"
     original_cookies = req_session.cookies.copy()
-    req_session.cookies.set("JWT", jwt_token, domain="warframe.market", path="/")
-    request_headers = {"Authorization": f"Bearer {jwt_token}", "X-CSRFToken": csrf_token_val, "Content-Type": "application/json", "Accept": "application/json", "User-Agent": req_session.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": PLATFORM, "Language": LANGUAGE, "Origin": "https://warframe.market", "Referer": f"{PROFILE_BASE_URL}/"}
+    req_session.cookies.set("JWT", jwt_token, domain=market_cookie_domain(), path="/")
+    request_headers = {"Authorization": f"Bearer {jwt_token}", "X-CSRFToken": csrf_token_val, "Content-Type": "application/json", "Accept": "application/json", "User-Agent": req_session.headers.get("User-Agent", "WFM_Logic_Module/1.0"), "Platform": current_platform(), "Language": LANGUAGE, "Origin": market_origin(), "Referer": f"{PROFILE_BASE_URL}/"}
     if device_id_val: request_headers["Device-Id"] = device_id_val
 
     payload = {"order_id": order_id_str, "platinum": new_price, "quantity": new_quantity, "visible": new_visibility}
     if current_rank is not None: payload["rank"] = current_rank # Only include if not None
 
-    time.sleep(REQUEST_DELAY)
+    _wait_for_request_slot("v1_order_put")
     try:
-        response = req_session.put(update_url, headers=request_headers, json=payload, timeout=20)
+        response = _upstream_request(req_session, "PUT", update_url, "v1_order_put", headers=request_headers, json=payload, timeout=20)
         response.raise_for_status()
+        engine = current_engine()
+        engine.ledger.apply_update(order_id_str, price=new_price, quantity=new_quantity, visible=new_visibility, rank=current_rank)
+        if engine.bump_scheduler.cancel(order_id_str): wfm_metrics.BUMPS.inc(outcome="coalesced") # Any successful PUT re-lists the order
         return True, "Order updated successfully on Warframe.Market."
     except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code in (400, 404): current_engine().ledger.invalidate() # Order probably sold/removed elsewhere
         error_message = f"WFM API Error ({http_err.response.status_code}) for order {order_id_str}."
         try:
-            err_payload = http_err.response.json()
+            err_payload = wfm_json.response_json(http_err.response)
             error_detail = err_payload.get('error', http_err.response.text[:150])
             error_message += f" Detail: {error_detail}"
         except json.JSONDecodeError: error_message += f" Raw Response: {http_err.response.text[:150]}"
@@ -458,15 +924,42 @@ def update_order_via_v1_put(req_session: requests.Session, order_id_to_update: s
     finally:
         req_session.cookies = original_cookies
 
-def check_min_price_set_for_item(item_id_str: str):
-    global ITEM_USER_SETTINGS # Uses this global
-    settings = ITEM_USER_SETTINGS.get(str(item_id_str)) # Ensure string key
+def item_settings_key(item_id_str, platform=None):
+    # The default platform's settings keep the plain item id key (as in existing configs); other platforms get
+    # "<platform>:<item id>", like their BOOK_RECORDER keys
+    platform = platform or PLATFORM
+    return str(item_id_str) if platform == PLATFORM else f"{platform}:{item_id_str}"
+
+def get_item_settings(item_id_str, platform=None):
+    """The user's min/max/skip settings for an item on `platform` (default: the current engine's), or None if unset.
+    A platform without its own entry for the item falls back to the item-only (default platform's) entry."""
+    platform = platform or current_platform()
+    settings = ITEM_USER_SETTINGS.get(item_settings_key(item_id_str, platform))
+    if settings is None and platform != PLATFORM: settings = ITEM_USER_SETTINGS.get(str(item_id_str))
+    return settings
+
+def check_min_price_set_for_item(item_id_str: str, platform=None):
+    settings = get_item_settings(item_id_str, platform) # Current engine's platform unless given
     if settings:
         if settings.get("skipped", False): return "skip"
         numeric_min = settings.get("numeric_min")
         if isinstance(numeric_min, int) and numeric_min > 0: return numeric_min
     return None # No valid setting or not skipped
 
+def check_max_price_set_for_item(item_id_str: str, platform=None):
+    """Buy-order counterpart of check_min_price_set_for_item: the user's maximum bid, "skip", or None if unset.
+    Buy orders have their own "buy_skipped" flag; skipping the sell order leaves the bid alone."""
+    settings = get_item_settings(item_id_str, platform)
+    if settings:
+        if settings.get("buy_skipped", False): return "skip"
+        numeric_max = settings.get("numeric_max")
+        if isinstance(numeric_max, int) and numeric_max > 0: return numeric_max
+    return None
+
+def bump_counter_key(order):
+    # Bump counters are per item for sell orders (as before) and per "buy:<item_id>" for buy orders, so both sides of an item count separately
+    return f"buy:{order.get('item_id')}" if order.get("type") == "buy" else order.get("item_id")
+
 def fetch_current_user_status(session_obj: requests.Session, user_ingame_name: str, current_jwt: str, user_id: str):
     if not all([session_obj, user_ingame_name, current_jwt, user_id]):
         print("LOG (fetch_current_user_status): Missing parameters.")
@@ -480,17 +973,17 @@ def fetch_current_user_status(session_obj: requests.Session, user_ingame_name: s
         if status_from_me == "online": return "Online"
         # if 'invisible', continue to other methods
 
-    # Try profile page scrape (might be more up-to-date than /v2/me if user just changed status on website)
-    _, status_from_profile_scrape = fetch_orders_from_profile_page(session_obj, user_ingame_name, current_jwt)
+    # Try profile page status (might be more up-to-date than /v2/me if user just changed status on website).
+    # Served from the own-orders ledger while it is fresh, so this is at most one scrape per OWN_ORDERS_MAX_AGE_SECONDS.
+    own_orders, status_from_profile_scrape = get_own_orders(session_obj, user_ingame_name, current_jwt)
     if status_from_profile_scrape:
         if status_from_profile_scrape == "ingame": return "Online In Game"
         if status_from_profile_scrape == "online": return "Online"
         # if 'invisible', continue
 
-    # Fallback: check status from one of their own item listings
-    all_orders_snapshot_data, _ = fetch_orders_from_profile_page(session_obj, user_ingame_name, current_jwt)
-    if all_orders_snapshot_data:
-        visible_sell_orders = [o for o in all_orders_snapshot_data if o.get("type") == "sell" and o.get("visible") and o.get("item_slug")]
+    # Fallback: check status from one of their own item listings (reusing the orders read above)
+    if own_orders:
+        visible_sell_orders = [o for o in own_orders if o.get("type") == "sell" and o.get("visible") and o.get("item_slug")]
         
         status_from_item_lookup = None
         for order_to_check in visible_sell_orders[:2]: # Check first few visible sell orders
@@ -514,14 +1007,46 @@ def perform_analysis_and_update_cycle_core(
         req_session: requests.Session, current_user_id: str, user_ingame_name: str,
         jwt_token: str, csrf_token_val: str, device_id_val: str,
         update_callback=None):
-    global ITEM_USER_SETTINGS, ITEM_ID_TO_DETAILS_MAP, PLATFORM, BUMP_THRESHOLD_CYCLES, ITEM_BUMP_ELIGIBILITY_CYCLES, REQUEST_DELAY, stop_processing_flag, LOOP_DELAY_SECONDS # Added LOOP_DELAY_SECONDS
+    # Thin wrapper that records cycle-level metrics (and a phase trace) around the actual analysis pass.
+    # analysis_thread_target opens the trace itself so the status phase lands in the same summary.
+    owns_trace = wfm_tracing.current_trace() is None
+    if owns_trace: wfm_tracing.start_trace("analysis_cycle")
+    cycle_stats = {"items_processed": 0}
+    cycle_start = time.perf_counter(); cpu_start = time.process_time(); cycle_ok = False; cycle_cancelled = False
+    try:
+        cycle_ok = _run_analysis_cycle(req_session, current_user_id, user_ingame_name, jwt_token, csrf_token_val,
+                                       device_id_val, update_callback, cycle_stats)
+        return cycle_ok
+    except wfm_cancel.OperationCancelled:
+        cycle_cancelled = True; raise
+    finally:
+        cycle_duration = time.perf_counter() - cycle_start
+        wfm_metrics.CYCLES.inc(result="cancelled" if cycle_cancelled else ("ok" if cycle_ok else "failed"))
+        wfm_metrics.CYCLE_DURATION.observe(cycle_duration)
+        wfm_metrics.CYCLE_CPU.observe(time.process_time() - cpu_start)
+        wfm_metrics.LAST_CYCLE_DURATION.set(cycle_duration)
+        wfm_metrics.LAST_CYCLE_FINISHED.set(time.time())
+        wfm_metrics.LAST_CYCLE_ITEMS.set(cycle_stats["items_processed"])
+        BOOK_RECORDER.flush(); BOOK_DELTA_RECORDER.flush()
+        if owns_trace:
+            trace_summary = wfm_tracing.end_trace()
+            if update_callback and trace_summary:
+                try: update_callback(None, wfm_tracing.format_summary(trace_summary), {"type": "trace_summary", "trace": trace_summary})
+                except Exception as cb_ex: print(f"WFM_LOGIC_ERROR: Error in update_callback: {cb_ex}")
+
+def _run_analysis_cycle(req_session, current_user_id, user_ingame_name, jwt_token, csrf_token_val, device_id_val,
+                        update_callback, cycle_stats):
+    global ITEM_USER_SETTINGS, ITEM_ID_TO_DETAILS_MAP, BUMP_THRESHOLD_CYCLES, REQUEST_DELAY, LOOP_DELAY_SECONDS # Added LOOP_DELAY_SECONDS
+    cancel_token = wfm_cancel.current_token() # Set when running in the analysis thread; None for one-off calls
+    engine = current_engine() # This platform's ledger, books, bump counters and queue
 
     def _send_update(item_id_for_log, message_content, data_payload=None, msg_type="info"):
         current_data_for_callback = data_payload if data_payload is not None else {}
         # Ensure 'type' key is always present in data_payload for consistency in JS handler
         current_data_for_callback['type'] = msg_type # This now correctly sets the type in data_payload
         if update_callback:
-            try: update_callback(item_id_for_log, message_content, current_data_for_callback)
+            try:
+                with wfm_tracing.span("ui_callback"): update_callback(item_id_for_log, message_content, current_data_for_callback)
             except Exception as cb_ex: print(f"WFM_LOGIC_ERROR: Error in update_callback: {cb_ex}")
 
     _send_update(None, f"--- Starting Analysis Cycle ({time.strftime('%Y-%m-%d %H:%M:%S')}) ---", msg_type="info")
@@ -529,7 +1054,8 @@ def perform_analysis_and_update_cycle_core(
     if not all([jwt_token, user_ingame_name, csrf_token_val]):
         _send_update(None, "Cycle skipped: Missing Auth Details.", msg_type="error"); return False
 
-    all_orders_snapshot_data, _ = fetch_orders_from_profile_page(req_session, user_ingame_name, jwt_token)
+    with wfm_tracing.span("profile_scrape"):
+        all_orders_snapshot_data, _ = get_own_orders(req_session, user_ingame_name, jwt_token) # Ledger view unless stale
     if all_orders_snapshot_data is None:
         _send_update(None, "Error: Failed to fetch orders for current cycle snapshot.", msg_type="error"); return False
 
@@ -537,90 +1063,252 @@ def perform_analysis_and_update_cycle_core(
     _send_update(None, f"Refreshed orders snapshot ({len(current_sell_orders_for_ui)} sell items).",
                  data_payload={'orders': current_sell_orders_for_ui}, msg_type="orders_data_snapshot") # Type in data_payload
 
-    if not current_sell_orders_for_ui:
+    # Visible buy orders with a maximum set, by item. Each is priced from the book fetched for the item's sell
+    # order when there is one (dropped from here once that book is in), so buy repricing costs no extra request for those items.
+    buy_orders_to_process = {}; buy_orders_without_max = []
+    for order in all_orders_snapshot_data:
+        if order.get("type") != "buy" or not order.get("visible"): continue
+        user_max_or_skip_status = check_max_price_set_for_item(order.get("item_id"))
+        if user_max_or_skip_status is None: buy_orders_without_max.append(order.get("item_name", f"Item ID {order.get('item_id')}"))
+        elif user_max_or_skip_status != "skip": buy_orders_to_process[order.get("item_id")] = order
+    engine.book_tracker.retain({order.get("item_id") for order in all_orders_snapshot_data}) # Books of delisted items aren't diffed again
+    if buy_orders_without_max: # Buy orders have no row in the order table, so their messages go to the log only (item_id None)
+        _send_update(None, f"Not repricing {len(buy_orders_without_max)} buy order(s) without a maximum price: {', '.join(sorted(buy_orders_without_max))}.", msg_type="detail")
+
+    if not current_sell_orders_for_ui and not buy_orders_to_process:
         _send_update(None, "No sell orders to analyze in current cycle (after snapshot).", msg_type="info"); return True
 
     active_sell_orders_to_process = [order for order in current_sell_orders_for_ui if order.get("visible")]
     active_sell_orders_to_process.sort(key=lambda x: x.get("item_name", "").lower()) # Sort for consistent processing order
 
-    if not active_sell_orders_to_process:
+    if not active_sell_orders_to_process and not buy_orders_to_process:
         _send_update(None, "No VISIBLE 'sell' orders to process.", msg_type="info"); return True
 
     _send_update(None, f"--- Analyzing {len(active_sell_orders_to_process)} VISIBLE SELL Orders (Sorted Alphabetically) ---", msg_type="info")
+    if buy_orders_to_process:
+        _send_update(None, f"--- Repricing {len(buy_orders_to_process)} VISIBLE BUY Orders (from the same order books) ---", msg_type="info")
     
-    updated_listings_count = 0; bumped_listings_count = 0
+    updated_listings_count = 0; queued_bumps_count = 0
+    engine.bump_scheduler.window_seconds = BUMP_WINDOW_SECONDS
+    engine.bump_scheduler.expected_bumps = len(active_sell_orders_to_process) + len(buy_orders_to_process) # Spacing = window / listings
+    pricing_strategy = get_pricing_strategy() # Pure decision logic (wfm_strategy.py); everything below is I/O and UI messages
+    buy_pricing_strategy = get_buy_pricing_strategy()
+
+    def _remember_book(str_item_id, lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, book_source, book_orders, name, log_item_id):
+        engine.last_seen_books[str_item_id] = {"lowest": None if lowest_comp_price == float('inf') else lowest_comp_price, "sellers": ingame_sellers,
+                                               "highest_buy": highest_comp_bid, "buyers": ingame_buyers, "source": book_source, "seen_at": time.time()}
+        # What moved since the last cycle's book (the first sighting, or a switch between top and full, is a new baseline)
+        book_events, is_baseline = engine.book_tracker.update(str_item_id, book_source, book_orders)
+        BOOK_DELTA_RECORDER.record(engine.platform, str_item_id, book_source, book_orders, book_events, is_baseline)
+        if book_events:
+            for event in book_events: wfm_metrics.BOOK_DELTA_EVENTS.inc(kind=event[0])
+            _send_update(log_item_id, f"Market moved for '{name}' ({book_source} of book): {wfm_orderbook.summarize_book_events(book_events)}.",
+                         data_payload={"item_id": str_item_id, "book_source": book_source, "events": book_events}, msg_type="book_delta")
+
+    def _reprice_buy_order(order, highest_comp_bid, ingame_buyers, book_source):
+        # Same steps as a sell order below, mirrored; item_id is left out of the UI messages (the table rows are sell orders)
+        nonlocal updated_listings_count, queued_bumps_count
+        str_item_id = order.get("item_id"); name = order.get("item_name", f"Item ID {str_item_id}"); api_price = order.get("platinum"); order_id_val = order.get("order_id"); qty = order.get("quantity"); rank = order.get("rank")
+        if not all([order_id_val, api_price is not None, qty is not None]):
+            _send_update(None, f"Error: Incomplete buy order data for '{name}'. Skipping.", msg_type="error"); return
+        user_max = check_max_price_set_for_item(str_item_id); counter_key = bump_counter_key(order)
+        buyer_count_text = f"{ingame_buyers}+" if book_source == "top" and ingame_buyers >= TOP_OF_BOOK_SLICE_SIZE else str(ingame_buyers)
+        _send_update(None, f"Found {buyer_count_text} other 'in-game' {engine.platform.upper()} buyers for '{name}' ({book_source} of book). Highest bid: {highest_comp_bid if highest_comp_bid is not None else 'N/A'}.", data_payload={"buyer_count": ingame_buyers, "highest_bid": highest_comp_bid, "book_source": book_source}, msg_type="detail")
+        BOOK_RECORDER.record_buy(str_item_id if engine.platform == PLATFORM else f"{engine.platform}:{str_item_id}", highest_comp_bid, ingame_buyers, book_source, api_price, user_max)
+
+        decision = buy_pricing_strategy.decide(api_price, highest_comp_bid, ingame_buyers, user_max, engine.bump_counters.get(counter_key, 0))
+        engine.bump_counters[counter_key] = decision.bump_cycle
+        if decision.action not in (wfm_strategy.HOLD, wfm_strategy.BUMP): engine.bump_scheduler.cancel(order_id_val)
+
+        if decision.action == wfm_strategy.NO_COMPETITORS:
+            _send_update(None, f"No valid competitor bids found for '{name}'. Leaving buy order at {api_price}p.", msg_type="info"); return
+        target_p = decision.target_price
+        if decision.action == wfm_strategy.HELD_AT_MAX:
+            _send_update(None, f"Buy price is optimal for {name} at {api_price}p (your max); outbid by other buyers at {highest_comp_bid}p.", data_payload={"current_price": api_price, "highest_bid": highest_comp_bid}, msg_type="success")
+        elif decision.action in (wfm_strategy.HOLD, wfm_strategy.BUMP):
+            _send_update(None, f"Buy price is optimal for {name} at {api_price}p ({decision.reason}). Bump cycle {decision.bump_cycle}/{BUMP_THRESHOLD_CYCLES}.", data_payload={"current_price": api_price, "bump_cycle": decision.bump_cycle}, msg_type="success")
+            if decision.action == wfm_strategy.BUMP:
+                already_queued = order_id_val in engine.bump_scheduler
+                pending_bump = engine.bump_scheduler.schedule(order_id_val, str_item_id)
+                if not already_queued: queued_bumps_count += 1
+                _send_update(None, f"Bump {'already ' if already_queued else ''}queued for buy order '{name}' at {api_price}p (due in {max(0.0, pending_bump.deadline - time.monotonic()):.0f}s).", msg_type="info")
+        else: # wfm_strategy.UPDATE
+            _send_update(None, f"Updating buy price for '{name}' from {api_price}p to {target_p}p (highest bid: {highest_comp_bid}p, your max: {user_max}p).", data_payload={"old_price": api_price, "new_price": target_p}, msg_type="info")
+            with wfm_tracing.span("price_update"), wfm_dispatch.lane(wfm_dispatch.REPRICE):
+                update_success, _ = update_order_via_v1_put(req_session, order_id_val, target_p, qty, order.get("visible"), rank, jwt_token, csrf_token_val, device_id_val)
+            wfm_metrics.PRICE_UPDATES.inc(outcome="success" if update_success else "failure")
+            if update_success:
+                updated_listings_count += 1
+                _send_update(None, f"Buy Price Updated: {name} to {target_p}p!", data_payload={"outcome": "success"}, msg_type="success")
+            else: _send_update(None, f"Buy Price Update FAILED for {name}.", data_payload={"target_price": target_p, "outcome": "failure"}, msg_type="error")
     for order_idx, order in enumerate(active_sell_orders_to_process):
-        if stop_processing_flag: _send_update(None, "Processing stopped by flag.", msg_type="warn"); return True # Check flag before each item
+        if cancel_token is not None: cancel_token.raise_if_cancelled() # Sleeps/HTTP calls raise on their own; this covers the gaps between them
         
-        str_item_id = order.get("item_id"); name = order.get("item_name", f"Item ID {str_item_id}"); slug = order.get("item_slug"); api_price = order.get("platinum"); order_id_val = order.get("order_id"); qty = order.get("quantity"); visible_status = order.get("visible"); rank = order.get("rank")
-
-        _send_update(str_item_id, f"Analyzing: {name} (Price: {api_price}p, Qty: {qty})", data_payload={"current_price": api_price, "qty": qty, "rank": rank}, msg_type="detail")
-        if not all([str_item_id, name and not name.startswith("Item ID"), api_price is not None, order_id_val, qty is not None]): # Check for resolved name
-            _send_update(str_item_id, f"Error: Incomplete or unresolved order data for '{name}'. Skipping.", data_payload={}, msg_type="error"); continue
-        if not slug:
-            _send_update(str_item_id, f"Error: Missing slug for '{name}'. Cannot fetch competitors. Skipping analysis.", data_payload={}, msg_type="error"); ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0; continue
+        with wfm_tracing.span("item", item_id=order.get("item_id")):
+            cycle_stats["items_processed"] += 1; wfm_metrics.ITEMS_PROCESSED.inc()
+            str_item_id = order.get("item_id"); name = order.get("item_name", f"Item ID {str_item_id}"); slug = order.get("item_slug"); api_price = order.get("platinum"); order_id_val = order.get("order_id"); qty = order.get("quantity"); visible_status = order.get("visible"); rank = order.get("rank")
+
+            _send_update(str_item_id, f"Analyzing: {name} (Price: {api_price}p, Qty: {qty})", data_payload={"current_price": api_price, "qty": qty, "rank": rank}, msg_type="detail")
+            if not all([str_item_id, name and not name.startswith("Item ID"), api_price is not None, order_id_val, qty is not None]): # Check for resolved name
+                _send_update(str_item_id, f"Error: Incomplete or unresolved order data for '{name}'. Skipping.", data_payload={}, msg_type="error"); continue
+            if not slug:
+                _send_update(str_item_id, f"Error: Missing slug for '{name}'. Cannot fetch competitors. Skipping analysis.", data_payload={}, msg_type="error"); engine.bump_counters[str_item_id] = 0; continue
         
-        user_min_or_skip_status = check_min_price_set_for_item(str_item_id) # Uses global ITEM_USER_SETTINGS
-        if user_min_or_skip_status == "skip":
-            _send_update(str_item_id, f"Skipped (user config): {name}", data_payload={"min_price_setting": "skip"}, msg_type="info"); ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0; continue
-        if user_min_or_skip_status is None: # No valid numeric min set
-            _send_update(str_item_id, f"Action Required: Set Minimum Price for {name}", data_payload={"min_price_setting": None}, msg_type="warn"); ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0; continue
+            user_min_or_skip_status = check_min_price_set_for_item(str_item_id) # Uses global ITEM_USER_SETTINGS
+            if user_min_or_skip_status == "skip":
+                _send_update(str_item_id, f"Skipped (user config): {name}", data_payload={"min_price_setting": "skip"}, msg_type="info"); engine.bump_counters[str_item_id] = 0; continue
+            if user_min_or_skip_status is None: # No valid numeric min set
+                _send_update(str_item_id, f"Action Required: Set Minimum Price for {name}", data_payload={"min_price_setting": None}, msg_type="warn"); engine.bump_counters[str_item_id] = 0; continue
         
-        user_min = user_min_or_skip_status # This is now the numeric min price
-        _send_update(str_item_id, f"Fetching competitors for {name}...", data_payload={"min_price": user_min}, msg_type="detail")
+            user_min = user_min_or_skip_status # This is now the numeric min price
+            _send_update(str_item_id, f"Fetching competitors for {name}...", data_payload={"min_price": user_min}, msg_type="detail")
+            buy_order = buy_orders_to_process.get(str_item_id) # Our buy order for the same item is priced from this fetch too
         
-        competitors = fetch_orders_for_item_slug_v2(req_session, slug) # API call
-        if not competitors: # Includes error cases from fetch_orders_for_item_slug_v2
-            _send_update(str_item_id, f"No/Error fetching competitors for '{name}'.", data_payload={"competitor_count": 0, "competitor_price": "N/A"}, msg_type="warn"); ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0; continue
-        
-        lowest_comp_price = float('inf'); ingame_sellers = 0
-        for comp_order in competitors:
-            comp_user = comp_order.get("user", {})
-            if not isinstance(comp_user, dict): continue # Skip malformed user data
-            if comp_user.get("platform") == PLATFORM and comp_order.get("type") == "sell" and comp_user.get("id") != current_user_id and comp_user.get("status") == "ingame":
-                price_val = comp_order.get("platinum")
-                if isinstance(price_val, (int, float)) and price_val > 0: lowest_comp_price = min(lowest_comp_price, price_val); ingame_sellers +=1
+            with wfm_tracing.span("competitor_fetch"):
+                competitor_summary = fetch_competitor_summary(req_session, slug, current_user_id, ("sell", "buy") if buy_order else ("sell",)) # API call (top of book, full book if needed)
+            if competitor_summary is None: # Error fetching the book
+                _send_update(str_item_id, f"No/Error fetching competitors for '{name}'.", data_payload={"competitor_count": 0, "competitor_price": "N/A"}, msg_type="warn"); engine.bump_counters[str_item_id] = 0
+                if buy_order is not None: # Same book, same failure: not fetched again for the buy order this cycle
+                    del buy_orders_to_process[str_item_id]
+                    _send_update(None, f"No/Error fetching competitors for buy order '{name}'.", msg_type="warn"); engine.bump_counters[bump_counter_key(buy_order)] = 0
+                continue
+            if buy_order is not None: del buy_orders_to_process[str_item_id] # Priced below; not fetched again in the buy-only pass
+            lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, book_source, book_orders = competitor_summary
+            seller_count_text = f"{ingame_sellers}+" if book_source == "top" and ingame_sellers >= TOP_OF_BOOK_SLICE_SIZE else str(ingame_sellers)
         
-        _send_update(str_item_id, f"Found {ingame_sellers} other 'in-game' PC sellers for '{name}'. Lowest price: {lowest_comp_price if lowest_comp_price != float('inf') else 'N/A'}.", data_payload={"competitor_count": ingame_sellers, "competitor_price": lowest_comp_price if lowest_comp_price != float('inf') else "N/A"}, msg_type="detail")
+            _send_update(str_item_id, f"Found {seller_count_text} other 'in-game' {engine.platform.upper()} sellers for '{name}' ({book_source} of book). Lowest price: {lowest_comp_price if lowest_comp_price != float('inf') else 'N/A'}.", data_payload={"competitor_count": ingame_sellers, "competitor_price": lowest_comp_price if lowest_comp_price != float('inf') else "N/A", "book_source": book_source}, msg_type="detail")
+
+            BOOK_RECORDER.record(str_item_id if engine.platform == PLATFORM else f"{engine.platform}:{str_item_id}", lowest_comp_price, ingame_sellers, book_source, api_price, user_min)
+            _remember_book(str_item_id, lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, book_source, book_orders, name, str_item_id)
+            if buy_order is not None:
+                with wfm_tracing.span("buy_order"): _reprice_buy_order(buy_order, highest_comp_bid, ingame_buyers, book_source)
+            current_bump_cycle = engine.bump_counters.get(str_item_id, 0)
+            decision = pricing_strategy.decide(api_price, lowest_comp_price, ingame_sellers, user_min, current_bump_cycle)
+            engine.bump_counters[str_item_id] = decision.bump_cycle
 
-        if not ingame_sellers or lowest_comp_price == float('inf'): # No valid competitors
-            _send_update(str_item_id, f"No valid competitor prices found for '{name}'. Cannot determine optimal price.", data_payload={"competitor_price": "N/A"}, msg_type="info"); ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0; continue
+            if decision.action not in (wfm_strategy.HOLD, wfm_strategy.BUMP): engine.bump_scheduler.cancel(order_id_val) # No longer a bump candidate
+
+            if decision.action == wfm_strategy.NO_COMPETITORS:
+                _send_update(str_item_id, f"No valid competitor prices found for '{name}'. Cannot determine optimal price.", data_payload={"competitor_price": "N/A"}, msg_type="info"); continue
         
-        target_p = max(int(lowest_comp_price - 1), int(user_min)) # Undercut by 1p, but not below user_min
-        _send_update(str_item_id, f"{name}: Lowest comp: {lowest_comp_price}p. Your min: {user_min}p. Target: {target_p}p. Current: {api_price}p.", data_payload={"competitor_price": lowest_comp_price, "target_price": target_p, "current_price": api_price, "min_price": user_min}, msg_type="detail")
+            target_p = decision.target_price
+            _send_update(str_item_id, f"{name}: Lowest comp: {lowest_comp_price}p. Your min: {user_min}p. Target: {target_p}p. Current: {api_price}p.", data_payload={"competitor_price": lowest_comp_price, "target_price": target_p, "current_price": api_price, "min_price": user_min}, msg_type="detail")
         
-        if target_p == api_price: # Price is optimal
-            _send_update(str_item_id, f"Price is optimal for {name} at {api_price}p.", data_payload={"current_price": api_price, "target_price": target_p}, msg_type="success")
-            current_bump_cycle = ITEM_BUMP_ELIGIBILITY_CYCLES.get(str_item_id, 0)
-            is_undercut_by_others = api_price > lowest_comp_price # If our optimal price is higher than someone else's lowest
-            
-            if not is_undercut_by_others: # We are not being undercut (or we are the lowest)
-                current_bump_cycle += 1; ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = current_bump_cycle
-                _send_update(str_item_id, f"Bump Candidate ({name}): Cycle {current_bump_cycle}/{BUMP_THRESHOLD_CYCLES}", data_payload={"bump_cycle": current_bump_cycle}, msg_type="info")
-                if current_bump_cycle >= BUMP_THRESHOLD_CYCLES:
-                    _send_update(str_item_id, f"Attempting BUMP for '{name}' at {api_price}p.", data_payload={"price": api_price}, msg_type="info")
-                    update_success, _ = update_order_via_v1_put(req_session, order_id_val, api_price, qty, visible_status, rank, jwt_token, csrf_token_val, device_id_val)
-                    if update_success:
-                        bumped_listings_count += 1; ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0 # Reset cycle count on successful bump
-                        _send_update(str_item_id, f"Listing BUMPED: {name}!", data_payload={"price": api_price, "outcome": "success"}, msg_type="success")
-                    else: _send_update(str_item_id, f"Bump FAILED for {name}.", data_payload={"price": api_price, "outcome": "failure"}, msg_type="error") # Bump failure doesn't reset cycle count, will retry next time
-            else: # We are being undercut, so reset bump eligibility
-                ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0
+            if decision.action == wfm_strategy.HELD_AT_MIN: # Kept at our minimum while others sell cheaper
+                _send_update(str_item_id, f"Price is optimal for {name} at {api_price}p.", data_payload={"current_price": api_price, "target_price": target_p}, msg_type="success")
                 _send_update(str_item_id, f"Not bump candidate ({name}): currently undercut by other sellers at {lowest_comp_price}p.", data_payload={"current_price": api_price, "lowest_competitor": lowest_comp_price}, msg_type="detail")
-        else: # Price needs adjustment
-            ITEM_BUMP_ELIGIBILITY_CYCLES[str_item_id] = 0 # Reset bump cycle if price changes
-            _send_update(str_item_id, f"Updating price for '{name}' from {api_price}p to {target_p}p.", data_payload={"old_price": api_price, "new_price": target_p}, msg_type="info")
-            update_success, _ = update_order_via_v1_put(req_session, order_id_val, target_p, qty, visible_status, rank, jwt_token, csrf_token_val, device_id_val)
-            if update_success:
-                updated_listings_count += 1
-                _send_update(str_item_id, f"Price Updated: {name} to {target_p}p!", data_payload={"price": target_p, "outcome": "success"}, msg_type="success")
-            else: _send_update(str_item_id, f"Price Update FAILED for {name}.", data_payload={"target_price": target_p, "outcome": "failure"}, msg_type="error")
+            elif decision.action in (wfm_strategy.HOLD, wfm_strategy.BUMP): # Price stays; counting towards (or due for) a bump
+                _send_update(str_item_id, f"Price is optimal for {name} at {api_price}p ({decision.reason}).", data_payload={"current_price": api_price, "target_price": target_p}, msg_type="success")
+                _send_update(str_item_id, f"Bump Candidate ({name}): Cycle {decision.bump_cycle}/{BUMP_THRESHOLD_CYCLES}", data_payload={"bump_cycle": decision.bump_cycle}, msg_type="info")
+                if decision.action == wfm_strategy.BUMP: # Queued, not sent: bumps run between cycles, after repricing (see run_scheduled_bumps)
+                    already_queued = order_id_val in engine.bump_scheduler
+                    pending_bump = engine.bump_scheduler.schedule(order_id_val, str_item_id)
+                    if not already_queued: queued_bumps_count += 1
+                    due_in = max(0.0, pending_bump.deadline - time.monotonic())
+                    _send_update(str_item_id, f"Bump {'already ' if already_queued else ''}queued for '{name}' at {api_price}p (due in {due_in:.0f}s).", data_payload={"price": api_price, "due_in_seconds": round(due_in, 1)}, msg_type="info")
+            else: # wfm_strategy.UPDATE: price needs adjustment (the strategy already reset the bump cycle; a successful PUT also drops any queued bump)
+                _send_update(str_item_id, f"Updating price for '{name}' from {api_price}p to {target_p}p.", data_payload={"old_price": api_price, "new_price": target_p}, msg_type="info")
+                with wfm_tracing.span("price_update"), wfm_dispatch.lane(wfm_dispatch.REPRICE): # Ahead of the remaining scan
+                    update_success, _ = update_order_via_v1_put(req_session, order_id_val, target_p, qty, visible_status, rank, jwt_token, csrf_token_val, device_id_val)
+                wfm_metrics.PRICE_UPDATES.inc(outcome="success" if update_success else "failure")
+                if update_success:
+                    updated_listings_count += 1
+                    _send_update(str_item_id, f"Price Updated: {name} to {target_p}p!", data_payload={"price": target_p, "outcome": "success"}, msg_type="success")
+                else: _send_update(str_item_id, f"Price Update FAILED for {name}.", data_payload={"target_price": target_p, "outcome": "failure"}, msg_type="error")
+
+    # Buy orders for items we don't sell (or whose sell order was skipped before its book was fetched): one fetch each
+    for str_item_id, buy_order in sorted(buy_orders_to_process.items(), key=lambda entry: entry[1].get("item_name", "").lower()):
+        if cancel_token is not None: cancel_token.raise_if_cancelled()
+        with wfm_tracing.span("item", item_id=str_item_id):
+            cycle_stats["items_processed"] += 1; wfm_metrics.ITEMS_PROCESSED.inc()
+            name = buy_order.get("item_name", f"Item ID {str_item_id}"); slug = buy_order.get("item_slug")
+            if not slug:
+                _send_update(None, f"Error: Missing slug for buy order '{name}'. Skipping.", msg_type="error"); engine.bump_counters[bump_counter_key(buy_order)] = 0; continue
+            with wfm_tracing.span("competitor_fetch"):
+                competitor_summary = fetch_competitor_summary(req_session, slug, current_user_id, ("buy",))
+            if competitor_summary is None:
+                _send_update(None, f"No/Error fetching competitors for buy order '{name}'.", msg_type="warn"); engine.bump_counters[bump_counter_key(buy_order)] = 0; continue
+            lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, book_source, book_orders = competitor_summary
+            _remember_book(str_item_id, lowest_comp_price, ingame_sellers, highest_comp_bid, ingame_buyers, book_source, book_orders, name, None)
+            with wfm_tracing.span("buy_order"): _reprice_buy_order(buy_order, highest_comp_bid, ingame_buyers, book_source)
     
-    _send_update(None, f"--- Cycle Summary --- Adjusted: {updated_listings_count}, Bumped: {bumped_listings_count}", msg_type="info")
+    _send_update(None, f"--- Cycle Summary --- Adjusted: {updated_listings_count}, Bumps queued: {queued_bumps_count} ({len(engine.bump_scheduler)} pending)", msg_type="info")
+    return True
+
+def save_engine_checkpoint(user_id=None):
+    """Write the current platform's bump counters, last-seen books, own-orders snapshot and queued bumps to its checkpoint file."""
+    engine = current_engine()
+    if not engine.checkpoint_file: return False
+    now_wall = time.time()
+    state = {"source_label": _catalog_cache_source_label(), "user_id": user_id, "platform": engine.platform,
+             "bump_counters": dict(engine.bump_counters), "books": dict(engine.last_seen_books),
+             "own_orders": engine.ledger.export(),
+             "bumps": [[order_id, item_id, round(now_wall + due_in, 3)] for order_id, item_id, due_in in engine.bump_scheduler.export()]}
+    try:
+        wfm_checkpoint.save(engine.checkpoint_file, state); return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"LOG: Could not write engine checkpoint {engine.checkpoint_file}: {e}"); return False
+
+def restore_engine_checkpoint(user_id=None, include_engine_state=True):
+    """Reload the current platform's checkpoint if it is fresh (not older than CHECKPOINT_MAX_AGE_SECONDS, same API,
+    same user if given). Books and the own-orders snapshot are merged in where they are newer than what is in memory;
+    with include_engine_state the bump counters and queued bumps are restored too. Returns True if a checkpoint was used."""
+    engine = current_engine()
+    if not engine.checkpoint_file: return False
+    state = wfm_checkpoint.load(engine.checkpoint_file, CHECKPOINT_MAX_AGE_SECONDS)
+    if state is None or state.get("source_label") != _catalog_cache_source_label(): return False
+    if state.get("platform", PLATFORM) != engine.platform: return False
+    if user_id is not None and state.get("user_id") not in (None, user_id): return False
+    for item_id, book in (state.get("books") or {}).items():
+        if isinstance(book, dict) and book.get("seen_at", 0) > engine.last_seen_books.get(item_id, {}).get("seen_at", 0): engine.last_seen_books[item_id] = book
+    own_orders = state.get("own_orders")
+    if isinstance(own_orders, dict) and isinstance(own_orders.get("orders"), list) and own_orders.get("refreshed_at") and \
+       (engine.ledger.refreshed_at_wall or 0) < own_orders["refreshed_at"] and engine.ledger.age_seconds() is None:
+        engine.ledger.restore(own_orders["orders"], own_orders.get("owner"), own_orders.get("profile_status"),
+                                  own_orders.get("source"), own_orders["refreshed_at"])
+    if include_engine_state:
+        engine.bump_counters.clear()
+        engine.bump_counters.update({str(item_id): int(count) for item_id, count in (state.get("bump_counters") or {}).items()})
+        engine.bump_scheduler.clear()
+        for order_id, item_id, due_at_wall in state.get("bumps") or []:
+            engine.bump_scheduler.schedule(order_id, item_id, deadline=wfm_checkpoint.monotonic_from_wall(due_at_wall))
+    print(f"LOG: Engine checkpoint restored for {engine.platform} (saved {time.time() - state['saved_at']:.0f}s ago): {len(state.get('bump_counters') or {})} bump counters, "
+          f"{len(state.get('books') or {})} books, {len(state.get('bumps') or [])} queued bumps.")
     return True
 
-def analysis_thread_target(req_session_obj, user_id, ingame_name, jwt, csrf, device_id, initial_user_settings, update_callback=None):
-    global stop_processing_flag, ITEM_USER_SETTINGS, ITEM_BUMP_ELIGIBILITY_CYCLES, main_session, LOOP_DELAY_SECONDS # Ensure LOOP_DELAY_SECONDS is global
+def run_scheduled_bumps(req_session, jwt_token, csrf_token_val, device_id_val, idle_seconds, send_update):
+    """Spend the idle time between cycles running bumps as their deadlines come up; returns after idle_seconds.
+    Bumps left over (more due than the rate limit allows in one delay) wait for the next idle period."""
+    idle_until = time.monotonic() + idle_seconds; cancel_token = wfm_cancel.current_token(); engine = current_engine()
+    while True:
+        now = time.monotonic()
+        if now >= idle_until: return
+        pending_bump = engine.bump_scheduler.pop_due(now)
+        if pending_bump is None:
+            next_deadline = engine.bump_scheduler.next_deadline()
+            wake_at = idle_until if next_deadline is None else min(idle_until, next_deadline)
+            if cancel_token is None: time.sleep(wake_at - now)
+            else: cancel_token.sleep(wake_at - now)
+            continue
+        order = engine.ledger.get(pending_bump.order_id) # Current values; the order may have changed since it was queued
+        if order is None or not order.get("visible"):
+            send_update(pending_bump.item_id, f"Dropped queued bump for order {pending_bump.order_id}: order no longer listed.", msg_type="detail"); continue
+        name = order.get("item_name", f"Item ID {pending_bump.item_id}")
+        is_buy_order = order.get("type") == "buy"
+        if is_buy_order: name = f"{name} (buy order)"
+        log_item_id = None if is_buy_order else pending_bump.item_id # Table rows are sell orders; a buy bump must not touch them
+        send_update(log_item_id, f"Attempting BUMP for '{name}' at {order.get('platinum')}p.", data_payload={"price": order.get("platinum")}, msg_type="info")
+        with wfm_tracing.span("bump", item_id=pending_bump.item_id):
+            update_success, _ = update_order_via_v1_put(req_session, pending_bump.order_id, order.get("platinum"), order.get("quantity"), order.get("visible"), order.get("rank"),
+                                                        jwt_token, csrf_token_val, device_id_val)
+        wfm_metrics.BUMPS.inc(outcome="success" if update_success else "failure")
+        if update_success:
+            engine.bump_counters[bump_counter_key(order)] = 0 # Reset cycle count on successful bump
+            send_update(log_item_id, f"Listing BUMPED: {name}!", data_payload={"price": order.get("platinum"), "outcome": "success"}, msg_type="success")
+        else: send_update(log_item_id, f"Bump FAILED for {name}.", data_payload={"price": order.get("platinum"), "outcome": "failure"}, msg_type="error") # Counter not reset: re-queued next cycle
+
+def analysis_thread_target(req_session_obj, user_id, ingame_name, jwt, csrf, device_id, initial_user_settings, update_callback=None, cancel_token=None, platform=None):
+    global ITEM_USER_SETTINGS, main_session, LOOP_DELAY_SECONDS # Ensure LOOP_DELAY_SECONDS is global
 
     def _send_thread_update(item_id_for_log, message_content, data_payload=None, msg_type="info"):
         current_data_for_callback = data_payload if data_payload is not None else {}
@@ -631,52 +1319,62 @@ def analysis_thread_target(req_session_obj, user_id, ingame_name, jwt, csrf, dev
             except Exception as cb_ex:
                 print(f"WFM_LOGIC_ERROR: Error in update_callback from analysis_thread: {cb_ex}")
 
-    _send_thread_update(None, f"Analysis thread started for user {ingame_name}.", msg_type="info")
-    stop_processing_flag = False # Reset flag at start of thread
+    engine = get_platform_engine(platform) # One thread per platform; each works on its own engine
+    _send_thread_update(None, f"Analysis thread started for user {ingame_name} ({engine.platform}).", msg_type="info")
+    cancel_token = cancel_token or PROCESSING_CANCEL_TOKEN # The caller normally creates it with new_processing_cancel_token()
     ITEM_USER_SETTINGS = initial_user_settings.copy() # Use the copy passed at thread start
-    ITEM_BUMP_ELIGIBILITY_CYCLES = {} # Reset bump cycles at start of thread
 
     if not main_session and not req_session_obj : # Check if a session object is available
         _send_thread_update(None, "CRITICAL - No session object available for analysis thread.", msg_type="error")
         return
     current_session_for_calls = req_session_obj if req_session_obj else main_session
 
-
+    wfm_engine.bind(engine) # Headers, competitor filter, caches and request pacing below are this platform's
+    # Resume bump countdowns and queued bumps from the last checkpoint if it is fresh; otherwise start clean
+    if not restore_engine_checkpoint(user_id): engine.reset()
+    wfm_cancel.bind(cancel_token) # Sleeps and HTTP calls below this point are cut short by a stop request
     cycle_count = 0
-    while not stop_processing_flag:
-        cycle_count += 1
-        # Ensure LOOP_DELAY_SECONDS is current (could be changed by config reload if we implement that)
-        current_loop_delay = LOOP_DELAY_SECONDS # Use the global value
-
-        perform_analysis_and_update_cycle_core(
-            current_session_for_calls, user_id, ingame_name, jwt, csrf, device_id,
-            update_callback=update_callback
-        )
-
-        if stop_processing_flag: # Check flag immediately after core cycle
-            _send_thread_update(None, "Stop flag detected after core cycle. Terminating loop.", msg_type="warn")
-            break
-        
-        _send_thread_update(None, f"Cycle finished. Waiting {current_loop_delay} seconds (with status check)...", msg_type="info")
-        
-        # Fetch and emit user status during the delay period
-        current_status = fetch_current_user_status(current_session_for_calls, ingame_name, jwt, user_id)
-        _send_thread_update(None, f"Status update: {current_status}",
-                            data_payload={"new_status": current_status}, msg_type="user_status_update") # Set type for JS
-
-        # Wait for LOOP_DELAY_SECONDS, but check stop_processing_flag periodically
-        wait_start_time = time.time()
-        while time.time() - wait_start_time < current_loop_delay:
-            if stop_processing_flag:
-                break # Break inner wait loop if flag is set
-            time.sleep(0.2) # Sleep in small intervals to be responsive to the flag
-        
-        if stop_processing_flag: # Check flag again after wait loop
-             _send_thread_update(None, "Stop flag detected during cooldown. Terminating loop.", msg_type="warn")
-             break
+    try:
+        while not cancel_token.cancelled:
+            cycle_count += 1
+            # Ensure LOOP_DELAY_SECONDS is current (could be changed by config reload if we implement that)
+            current_loop_delay = LOOP_DELAY_SECONDS # Use the global value
+
+            # One trace covers the core cycle plus the status phase; the profiler (if armed) covers the same span
+            wfm_tracing.start_trace(f"cycle {cycle_count}")
+            wfm_tracing.PROFILER.on_cycle_start(engine.platform)
+            try:
+                perform_analysis_and_update_cycle_core(
+                    current_session_for_calls, user_id, ingame_name, jwt, csrf, device_id,
+                    update_callback=update_callback
+                )
+                cancel_token.raise_if_cancelled()
+
+                _send_thread_update(None, f"Cycle finished. Waiting {current_loop_delay} seconds (with status check)...", msg_type="info")
+
+                # Fetch and emit user status during the delay period
+                with wfm_tracing.span("status_check"), wfm_dispatch.lane(wfm_dispatch.STATUS):
+                    current_status = fetch_current_user_status(current_session_for_calls, ingame_name, jwt, user_id)
+                _send_thread_update(None, f"Status update: {current_status}",
+                                    data_payload={"new_status": current_status}, msg_type="user_status_update") # Set type for JS
+            finally:
+                wfm_tracing.PROFILER.on_cycle_end()
+                trace_summary = wfm_tracing.end_trace()
+                if trace_summary:
+                    _send_thread_update(None, wfm_tracing.format_summary(trace_summary), data_payload={"trace": trace_summary}, msg_type="trace_summary")
+
+            save_engine_checkpoint(user_id) # Once per cycle, so a restart resumes from here
+            # Idle until the next cycle, running queued bumps as they come due; a stop request wakes this immediately (no polling)
+            with wfm_dispatch.lane(wfm_dispatch.BUMP):
+                run_scheduled_bumps(current_session_for_calls, jwt, csrf, device_id, current_loop_delay, _send_thread_update)
+    except wfm_cancel.OperationCancelled:
+        pass # Raised from whichever sleep, HTTP call or item boundary the stop request interrupted
+    finally:
+        wfm_cancel.unbind()
+        save_engine_checkpoint(user_id) # Includes whatever the interrupted cycle got done
+        wfm_engine.unbind()
 
-    _send_thread_update(None, f"Analysis thread for {ingame_name} received stop signal and is terminating.", msg_type="warn")
-    stop_processing_flag = False # Reset for future starts, though thread instance will be new
+    _send_thread_update(None, f"Analysis thread for {ingame_name} ({engine.platform}) received stop signal and is terminating.", msg_type="warn")
 
 def delete_order_v2(session_obj: requests.Session, order_id: str, jwt_token: str, csrf_token_val: str, device_id_val: str = None):
     if not all([order_id, jwt_token, csrf_token_val]):
@@ -687,31 +1385,32 @@ def delete_order_v2(session_obj: requests.Session, order_id: str, jwt_token: str
     delete_url = f"{API_V2_BASE_URL}/orders/{str(order_id).strip()}"
     
     original_cookies = session_obj.cookies.copy()
-    session_obj.cookies.set("JWT", jwt_token, domain="warframe.market", path="/")
+    session_obj.cookies.set("JWT", jwt_token, domain=market_cookie_domain(), path="/")
 
     request_headers = {
         "Authorization": f"Bearer {jwt_token}",
         "Accept": "application/json",
         "X-CSRFToken": csrf_token_val,
         "User-Agent": session_obj.headers.get("User-Agent", "WFM_Logic_Module/1.0"),
-        "Platform": PLATFORM,
+        "Platform": current_platform(),
         "Language": LANGUAGE,
-        "Origin": "https://warframe.market",
+        "Origin": market_origin(),
         "Referer": f"{PROFILE_BASE_URL}/" # Typical referer
     }
     if device_id_val:
         request_headers["Device-Id"] = device_id_val
 
     print(f"LOG: Attempting to DELETE order {order_id} at {delete_url}")
-    time.sleep(REQUEST_DELAY) # Respect rate limits
+    _wait_for_request_slot("v2_order_delete") # Respect rate limits
 
     try:
-        response = session_obj.delete(delete_url, headers=request_headers, timeout=20)
+        response = _upstream_request(session_obj, "DELETE", delete_url, "v2_order_delete", headers=request_headers, timeout=20)
         response.raise_for_status() # Will raise HTTPError for 4xx/5xx responses
 
         # Successful deletion usually returns 200 or 204 (No Content)
         if 200 <= response.status_code < 300 : # Check for any 2xx success status
             print(f"LOG: Order {order_id} deleted successfully. Status: {response.status_code}")
+            current_engine().ledger.apply_delete(str(order_id).strip()); current_engine().bump_scheduler.cancel(str(order_id).strip())
             return True, f"Order {order_id} deleted successfully from Warframe.Market."
         else:
             # This case might be rare if raise_for_status() is used, but as a fallback
@@ -722,9 +1421,10 @@ def delete_order_v2(session_obj: requests.Session, order_id: str, jwt_token: str
             return False, error_message
 
     except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code == 404: current_engine().ledger.invalidate() # Already gone; our view is out of date
         error_message = f"WFM API Error ({http_err.response.status_code}) deleting order {order_id}."
         try:
-            err_payload = http_err.response.json() # Try to parse JSON error response
+            err_payload = wfm_json.response_json(http_err.response) # Try to parse JSON error response
             error_detail = err_payload.get('error', http_err.response.text[:150]) # Get specific error message
             error_message += f" Detail: {error_detail}"
         except json.JSONDecodeError: error_message += f" Raw Response: {http_err.response.text[:150]}" # If not JSON
@@ -765,7 +1465,7 @@ def place_new_sell_order_v1(req_session: requests.Session, item_id_to_list: str,
     place_order_url = f"{API_V1_BASE_URL}/profile/orders"
     
     original_cookies = req_session.cookies.copy()
-    req_session.cookies.set("JWT", jwt_token, domain="warframe.market", path="/")
+    req_session.cookies.set("JWT", jwt_token, domain=market_cookie_domain(), path="/")
 
     request_headers = {
         "Authorization": f"Bearer {jwt_token}",
@@ -773,9 +1473,9 @@ def place_new_sell_order_v1(req_session: requests.Session, item_id_to_list: str,
         "Content-Type": "application/json",
         "Accept": "application/json",
         "User-Agent": req_session.headers.get("User-Agent", "WFM_Logic_Module/1.0"),
-        "Platform": PLATFORM,
+        "Platform": current_platform(),
         "Language": LANGUAGE,
-        "Origin": "https://warframe.market",
+        "Origin": market_origin(),
         "Referer": f"{PROFILE_BASE_URL}/" # Typical referer
     }
     if device_id_val:
@@ -792,15 +1492,22 @@ def place_new_sell_order_v1(req_session: requests.Session, item_id_to_list: str,
         payload["rank"] = rank
     
     print(f"LOG: Attempting to POST new sell order to {place_order_url} with payload: {payload}")
-    time.sleep(REQUEST_DELAY) # Respect rate limits
+    _wait_for_request_slot("v1_order_post") # Respect rate limits
 
     try:
-        response = req_session.post(place_order_url, headers=request_headers, json=payload, timeout=20)
+        response = _upstream_request(req_session, "POST", place_order_url, "v1_order_post", headers=request_headers, json=payload, timeout=20)
         response.raise_for_status() # Will raise HTTPError for 4xx/5xx responses
         
         # Successful order placement usually returns 200 with the order details,
         # or sometimes 201 Created.
         print(f"LOG: New order for item ID {item_id_to_list} placed successfully. Status: {response.status_code}")
+        # Write the new order into the ledger from the response ({"payload": {"order": {...}}}, v1 shape);
+        # if the response can't be read, the ledger is invalidated so the next reader re-scrapes instead
+        try: new_order_raw = wfm_json.response_json(response).get("payload", {}).get("order")
+        except (ValueError, AttributeError): new_order_raw = None
+        new_order_for_ui = order_for_ui_from_v1(new_order_raw) if isinstance(new_order_raw, dict) else None
+        ledger = current_engine().ledger
+        if not ledger.apply_new_order(new_order_for_ui): ledger.invalidate()
         # The V1 API for placing orders doesn't typically return the full new order ID in a simple way,
         # it usually just confirms success. The item_id_to_list is what we used.
         return True, "New order placed successfully on Warframe.Market.", item_id_to_list # Return the item_id used
@@ -808,7 +1515,7 @@ def place_new_sell_order_v1(req_session: requests.Session, item_id_to_list: str,
     except requests.exceptions.HTTPError as http_err:
         error_message = f"WFM API Error ({http_err.response.status_code}) placing new order for item ID {item_id_to_list}."
         try:
-            err_payload = http_err.response.json()
+            err_payload = wfm_json.response_json(http_err.response)
             error_detail = err_payload.get('error', str(err_payload)) # str(err_payload) if 'error' key is missing
             error_message += f" Detail: {error_detail}"
         except json.JSONDecodeError: # If error response is not JSON
@@ -0,0 +1,167 @@
+# wfm_metrics.py
+# Minimal Prometheus-style metrics registry (text exposition format 0.0.4).
+# Kept dependency-free on purpose: the packaged exe should not need prometheus_client.
+import os
+import threading
+import time
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CYCLE_DURATION_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0)
+
+_REGISTRY = []
+_REGISTRY_LOCK = threading.Lock()
+_PROCESS_START_TIME = time.time()
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra: pairs.extend(f'{name}="{_escape_label_value(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"): return "+Inf"
+    if isinstance(value, float) and value.is_integer(): return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name; self.help_text = help_text; self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock: snapshot = dict(self._values)
+        for label_values, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for idx, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound: state["counts"][idx] += 1
+            state["sum"] += value; state["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock: snapshot = {k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]} for k, v in self._values.items()}
+        for label_values, state in sorted(snapshot.items()):
+            for upper_bound, bucket_count in zip(self.buckets, state["counts"]):
+                bucket_labels = _format_labels(self.label_names, label_values, extra=[("le", _format_value(float(upper_bound)))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+            plain_labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{plain_labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{plain_labels} {state['count']}")
+        return lines
+
+
+def _register(metric):
+    with _REGISTRY_LOCK: _REGISTRY.append(metric)
+    return metric
+
+def counter(name, help_text, label_names=()): return _register(Counter(name, help_text, label_names))
+def gauge(name, help_text, label_names=()): return _register(Gauge(name, help_text, label_names))
+def histogram(name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS): return _register(Histogram(name, help_text, label_names, buckets))
+
+
+# --- Upstream (warframe.market) traffic ---
+UPSTREAM_REQUESTS = counter("wfm_upstream_requests_total", "Requests made to warframe.market, by endpoint and status code.", ("endpoint", "method", "status"))
+UPSTREAM_LATENCY = histogram("wfm_upstream_request_duration_seconds", "Latency of requests to warframe.market.", ("endpoint", "status"))
+UPSTREAM_RESPONSE_BYTES = counter("wfm_upstream_response_bytes_total", "Response body bytes received from warframe.market.", ("endpoint",))
+RATE_LIMIT_WAIT = histogram("wfm_rate_limit_wait_seconds", "Time spent waiting for the client-side request delay before an upstream call.", ("endpoint",))
+LANE_WAIT = histogram("wfm_upstream_lane_wait_seconds", "Time an upstream call waited for its slot, by priority lane (see wfm_dispatch.py).", ("lane",))
+
+# --- Analysis engine ---
+CYCLES = counter("wfm_cycles_total", "Analysis cycles run, by result.", ("result",))
+CYCLE_DURATION = histogram("wfm_cycle_duration_seconds", "Wall-clock duration of one analysis cycle.", (), CYCLE_DURATION_BUCKETS)
+CYCLE_CPU = histogram("wfm_cycle_cpu_seconds", "Process CPU time consumed during one analysis cycle.", (), CYCLE_DURATION_BUCKETS)
+LAST_CYCLE_DURATION = gauge("wfm_last_cycle_duration_seconds", "Duration of the most recently finished analysis cycle.")
+LAST_CYCLE_FINISHED = gauge("wfm_last_cycle_finished_timestamp_seconds", "Unix time the most recent analysis cycle finished.")
+LAST_CYCLE_ITEMS = gauge("wfm_last_cycle_items_processed", "Listings analysed in the most recently finished cycle.")
+ITEMS_PROCESSED = counter("wfm_cycle_items_processed_total", "Listings analysed across all cycles.")
+PRICE_UPDATES = counter("wfm_price_updates_total", "Automatic price updates, by outcome.", ("outcome",))
+BUMPS = counter("wfm_bumps_total", "Listing bumps, by outcome.", ("outcome",))
+BOOK_DELTA_EVENTS = counter("wfm_book_delta_events_total", "Order-book changes seen between cycles, by kind (new/removed/repriced/status).", ("kind",))
+CACHE_REQUESTS = counter("wfm_cache_requests_total", "Cache lookups, by cache and result (hit/miss).", ("cache", "result"))
+
+# --- Web layer ---
+HTTP_LATENCY = histogram("wfm_http_request_duration_seconds", "Latency of the Flask routes.", ("route", "method", "status"))
+SOCKETIO_EMITS = counter("wfm_socketio_emits_total", "Socket.IO events emitted to clients, by event name.", ("event",))
+
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_REQUESTS.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+def _process_lines():
+    lines = ["# HELP wfm_process_cpu_seconds_total Total user and system CPU time of this process.",
+             "# TYPE wfm_process_cpu_seconds_total counter",
+             f"wfm_process_cpu_seconds_total {_format_value(time.process_time())}",
+             "# HELP wfm_process_start_time_seconds Unix time the process started.",
+             "# TYPE wfm_process_start_time_seconds gauge",
+             f"wfm_process_start_time_seconds {_format_value(_PROCESS_START_TIME)}"]
+    try: # Linux only; silently skipped on Windows where the packaged exe usually runs
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        lines += ["# HELP wfm_process_resident_memory_bytes Resident memory size in bytes.",
+                  "# TYPE wfm_process_resident_memory_bytes gauge",
+                  f"wfm_process_resident_memory_bytes {resident_pages * os.sysconf('SC_PAGE_SIZE')}"]
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    return lines
+
+
+def render_latest():
+    """Text exposition of every registered metric plus basic process stats."""
+    lines = []
+    with _REGISTRY_LOCK: metrics = list(_REGISTRY)
+    for metric in metrics: lines.extend(metric.render())
+    lines.extend(_process_lines())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,230 @@
+# wfm_orderbook.py
+# Streaming decode of warframe.market order-book responses with filtering during the parse.
+#
+# response.json() on a popular item's book materializes thousands of nested order + user dicts, and the
+# competitor loop then throws almost all of them away. Here the response body is read in chunks and the
+# "data" array is decoded one order at a time (json.JSONDecoder.raw_decode on a sliding buffer), so only
+# one order is alive at any moment. Each order is filtered as soon as it is decoded (side, platform,
+# status, rank, our own user id) and reduced to the single number the pricing decision needs.
+# Stdlib only: no ijson/C parser needed in the packaged exe.
+#
+# OrderBookTracker keeps each item's previous book keyed by order id and diffs the next one against it, so
+# the engine sees what moved (new, removed, repriced and status-change events) instead of only the minimum;
+# BookDeltaRecorder appends those events (plus a keyed baseline when tracking (re)starts) as JSON lines,
+# and replay_book_deltas() rebuilds the books from them.
+import codecs
+import json
+import os
+import re
+import threading
+import time
+
+import wfm_json
+
+_DATA_ARRAY_START = re.compile(r'"(?:data|orders)"\s*:\s*\[') # v2 envelope ("data"), or v1 "payload.orders"
+_WHITESPACE_AND_COMMAS = " \t\r\n,"
+
+
+class CompactBook:
+    """Qualifying prices per side from one order book; everything else from the response is dropped."""
+    __slots__ = ("sell_prices", "buy_prices", "orders_seen", "orders")
+
+    def __init__(self, keep_orders=False):
+        self.sell_prices = []; self.buy_prices = []; self.orders_seen = 0
+        self.orders = {} if keep_orders else None # order id -> (side, price, status) of every other user's order on the platform
+
+    def lowest_sell(self):
+        return min(self.sell_prices) if self.sell_prices else float('inf')
+
+    def highest_buy(self):
+        return max(self.buy_prices) if self.buy_prices else None
+
+
+def iter_json_array_items(chunks, max_buffer_chars=4 * 1024 * 1024):
+    """Yield the elements of the response's "data" (or "orders") array one by one from an iterable of byte chunks."""
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunk_iter = iter(chunks)
+    buffer = ""; position = 0; in_array = False; exhausted = False
+
+    def read_more():
+        nonlocal buffer, position, exhausted
+        for chunk in chunk_iter:
+            if not chunk: continue
+            buffer = buffer[position:] + utf8_decoder.decode(chunk); position = 0 # Drop what was already consumed
+            return True
+        buffer = buffer[position:] + utf8_decoder.decode(b"", final=True); position = 0
+        exhausted = True
+        return False
+
+    while not in_array:
+        match = _DATA_ARRAY_START.search(buffer, position)
+        if match:
+            position = match.end(); in_array = True; break
+        if exhausted: raise ValueError("No 'data' array found in order book response.")
+        position = max(0, len(buffer) - 32) # Keep a tail in case the key is split across chunks
+        read_more()
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE_AND_COMMAS: position += 1
+        if position >= len(buffer):
+            if exhausted: raise ValueError("Order book response ended inside the 'data' array.")
+            read_more(); continue
+        if buffer[position] == "]": return
+        try:
+            item, end_position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Element not complete yet (or malformed, which shows once the stream is exhausted)
+            if exhausted: raise
+            if len(buffer) - position > max_buffer_chars: raise ValueError("Order book element exceeds the streaming buffer limit.")
+            read_more(); continue
+        position = end_position
+        yield item
+
+
+def filter_order_book(chunks, platform, exclude_user_id=None, status="ingame", rank=None, keep_orders=False):
+    """Stream-decode an order book and keep only the prices of orders from `status` users on `platform`
+    (excluding `exclude_user_id`, optionally only mod rank `rank`), split into sell and buy sides.
+    With keep_orders, book.orders also gets every other user's order on the platform, whatever their status (for OrderBookTracker)."""
+    book = CompactBook(keep_orders)
+    for order in iter_json_array_items(chunks):
+        book.orders_seen += 1
+        if not isinstance(order, dict): continue
+        user = order.get("user")
+        if not isinstance(user, dict) or user.get("platform") != platform: continue
+        if exclude_user_id is not None and user.get("id") == exclude_user_id: continue
+        if rank is not None and order.get("rank", order.get("mod_rank")) != rank: continue
+        price = order.get("platinum")
+        if not isinstance(price, (int, float)) or price <= 0: continue
+        order_type = order.get("type", order.get("order_type"))
+        if keep_orders and order.get("id") and order_type in ("sell", "buy"): book.orders[order["id"]] = (order_type, price, user.get("status"))
+        if user.get("status") != status: continue
+        if order_type == "sell": book.sell_prices.append(price)
+        elif order_type == "buy": book.buy_prices.append(price)
+    return book
+
+
+def key_orders(orders, platform, exclude_user_id=None):
+    """order id -> (side, price, status) for other users' orders on `platform` from a list of decoded orders (the top-of-book slice)."""
+    keyed = {}
+    for order in orders:
+        if not isinstance(order, dict) or not order.get("id"): continue
+        user = order.get("user")
+        if not isinstance(user, dict) or user.get("platform") != platform or user.get("id") == exclude_user_id: continue
+        price = order.get("platinum"); order_type = order.get("type", order.get("order_type"))
+        if isinstance(price, (int, float)) and price > 0 and order_type in ("sell", "buy"): keyed[order["id"]] = (order_type, price, user.get("status"))
+    return keyed
+
+
+# Delta events are short lists, cheap to emit and to store:
+#   ["new", order_id, side, price, status]       ["removed", order_id, side, price]
+#   ["repriced", order_id, side, old, new]       ["status", order_id, side, old_status, new_status]
+NEW, REMOVED, REPRICED, STATUS = "new", "removed", "repriced", "status"
+
+
+def diff_books(previous, current):
+    """Events that turn the keyed book `previous` into `current`."""
+    events = []
+    for order_id, (side, price, status) in current.items():
+        old = previous.get(order_id)
+        if old is None: events.append([NEW, order_id, side, price, status]); continue
+        if old[1] != price: events.append([REPRICED, order_id, side, old[1], price])
+        if old[2] != status: events.append([STATUS, order_id, side, old[2], status])
+    for order_id, (side, price, _status) in previous.items():
+        if order_id not in current: events.append([REMOVED, order_id, side, price])
+    return events
+
+
+def apply_book_events(book, events):
+    """Apply diff_books() events to a keyed book in place (what a consumer of the deltas does); returns the book."""
+    for event in events:
+        kind, order_id, side = event[0], event[1], event[2]
+        if kind == NEW: book[order_id] = (side, event[3], event[4])
+        elif kind == REMOVED: book.pop(order_id, None)
+        elif order_id in book:
+            _side, price, status = book[order_id]
+            book[order_id] = (side, event[4], status) if kind == REPRICED else (side, price, event[4])
+    return book
+
+
+class OrderBookTracker:
+    """Last keyed book per item, diffed against each new fetch. Books from different scopes ("top" slice vs "full"
+    book) don't compare, so a scope change (or the first sighting) starts a new baseline and produces no events.
+    In the "top" scope "new"/"removed" mean entering/leaving the slice, not necessarily being listed/delisted."""
+
+    def __init__(self):
+        self._books = {} # item_id -> (scope, {order_id: (side, price, status)})
+
+    def update(self, item_id, scope, orders):
+        """Store `orders` as the item's book; returns (events, is_baseline)."""
+        previous = self._books.get(item_id)
+        self._books[item_id] = (scope, orders)
+        if previous is None or previous[0] != scope: return [], True
+        return diff_books(previous[1], orders), False
+
+    def retain(self, item_ids):
+        """Forget the books of items no longer listed."""
+        for item_id in [item_id for item_id in self._books if item_id not in item_ids]: del self._books[item_id]
+
+    def clear(self):
+        self._books.clear()
+
+    def __len__(self):
+        return len(self._books)
+
+
+def summarize_book_events(events):
+    """Short text for the UI console, e.g. "2 new sell (14p, 15p), 1 repriced sell 16p->15p, 1 went offline"."""
+    parts = []
+    for kind in (NEW, REPRICED, REMOVED, STATUS):
+        for side in ("sell", "buy"):
+            side_events = [event for event in events if event[0] == kind and event[2] == side]
+            if not side_events: continue
+            if kind == NEW: detail = ", ".join(f"{event[3]}p" for event in side_events[:3])
+            elif kind == REPRICED: detail = ", ".join(f"{event[3]}p->{event[4]}p" for event in side_events[:3])
+            elif kind == REMOVED: detail = ", ".join(f"{event[3]}p" for event in side_events[:3])
+            else: detail = ", ".join(f"{event[3]}->{event[4]}" for event in side_events[:3])
+            if len(side_events) > 3: detail += ", ..."
+            parts.append(f"{len(side_events)} {kind} {side} ({detail})")
+    return "; ".join(parts)
+
+
+class BookDeltaRecorder:
+    """Appends book deltas as JSON lines: {"t", "p", "item", "scope", "base": {order_id: [side, price, status]}} when an
+    item's tracking (re)starts, then {"t", "p", "item", "d": [events]} for each change. Buffered; flush() once per cycle."""
+
+    def __init__(self, path=None):
+        self.path = path; self.enabled = False
+        self._pending = []; self._lock = threading.Lock()
+
+    def record(self, platform, item_id, scope, orders, events, is_baseline):
+        if not self.enabled or not self.path: return
+        if is_baseline: record = {"t": round(time.time(), 3), "p": platform, "item": item_id, "scope": scope, "base": {order_id: list(order) for order_id, order in orders.items()}}
+        elif events: record = {"t": round(time.time(), 3), "p": platform, "item": item_id, "d": events}
+        else: return
+        with self._lock: self._pending.append(record)
+
+    def flush(self):
+        with self._lock: pending, self._pending = self._pending, []
+        if not pending: return 0
+        try:
+            with open(self.path, "ab") as delta_file:
+                delta_file.write(b"".join(wfm_json.dumps_bytes(record) + b"\n" for record in pending))
+        except OSError as e:
+            print(f"LOG: Could not append to book delta log {self.path}: {e}"); return 0
+        return len(pending)
+
+
+def replay_book_deltas(path):
+    """Yield (timestamp, platform, item_id, keyed book) after every record of a BookDeltaRecorder file."""
+    books = {}
+    if not os.path.exists(path): return
+    with open(path, "rb") as delta_file:
+        for line in delta_file:
+            try: record = wfm_json.loads(line)
+            except ValueError: continue # A torn last line
+            key = (record.get("p"), record.get("item"))
+            if "base" in record: books[key] = {order_id: tuple(order) for order_id, order in record["base"].items()}
+            elif key in books: apply_book_events(books[key], record.get("d") or [])
+            else: continue # Deltas without a baseline (file truncated at the front)
+            yield record.get("t"), key[0], key[1], books[key]
@@ -0,0 +1,88 @@
+# wfm_scheduler.py
+# Low-priority queue for listing bumps, drained in the idle time between analysis cycles.
+#
+# Listings that sit at the optimal price all reach the bump threshold in the same cycle, and bumping them
+# inline fired a burst of PUTs that competed with real reprices. Now the cycle only enqueues the bump;
+# deadlines are handed out evenly spaced across the bump window (a min-heap keyed by deadline), and the
+# analysis thread runs due bumps only during its loop delay, after the cycle's repricing work is done.
+# Any successful PUT to the order (an automatic reprice or a manual edit) re-lists it anyway, so it
+# coalesces with, and cancels, the pending bump.
+import heapq
+import itertools
+import time
+
+
+class PendingBump:
+    __slots__ = ("order_id", "item_id", "deadline", "enqueued_at", "sequence", "cancelled")
+
+    def __init__(self, order_id, item_id, deadline, sequence):
+        self.order_id = order_id; self.item_id = item_id; self.deadline = deadline
+        self.enqueued_at = time.monotonic(); self.sequence = sequence; self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+
+class BumpScheduler:
+    """Bumps keyed by order id. Deadlines are time.monotonic() values; cancellation is lazy (heap entries are skipped)."""
+
+    def __init__(self, window_seconds=120.0):
+        self.window_seconds = window_seconds
+        self.expected_bumps = 1 # Listings that could be bumped per window (set by the cycle); spacing = window / expected
+        self._heap = []; self._by_order = {}
+        self._last_deadline = 0.0; self._sequence = itertools.count()
+
+    def __len__(self): return len(self._by_order)
+    def __contains__(self, order_id): return order_id in self._by_order
+
+    @property
+    def spacing_seconds(self):
+        return self.window_seconds / max(1, self.expected_bumps)
+
+    def schedule(self, order_id, item_id, now=None, deadline=None):
+        """Queue a bump; the deadline is one spacing after the last queued one (or now, if the queue has drained),
+        unless an explicit deadline is given (restored checkpoints). Returns the pending entry; scheduling an
+        order that is already queued keeps its original deadline."""
+        existing = self._by_order.get(order_id)
+        if existing is not None: return existing
+        now = time.monotonic() if now is None else now
+        if deadline is None: deadline = max(now, self._last_deadline + self.spacing_seconds) if self._by_order else now
+        self._last_deadline = max(self._last_deadline, deadline)
+        pending = PendingBump(order_id, item_id, deadline, next(self._sequence))
+        self._by_order[order_id] = pending; heapq.heappush(self._heap, pending)
+        return pending
+
+    def cancel(self, order_id):
+        pending = self._by_order.pop(order_id, None)
+        if pending is None: return False
+        pending.cancelled = True
+        return True
+
+    def clear(self):
+        self._heap = []; self._by_order = {}; self._last_deadline = 0.0
+
+    def _drop_cancelled_head(self):
+        while self._heap and self._heap[0].cancelled: heapq.heappop(self._heap)
+
+    def next_deadline(self):
+        self._drop_cancelled_head()
+        return self._heap[0].deadline if self._heap else None
+
+    def pop_due(self, now=None):
+        """The earliest bump whose deadline has passed (removed from the queue), or None."""
+        now = time.monotonic() if now is None else now
+        self._drop_cancelled_head()
+        if not self._heap or self._heap[0].deadline > now: return None
+        pending = heapq.heappop(self._heap)
+        del self._by_order[pending.order_id]
+        return pending
+
+    def export(self):
+        """Pending bumps as [order_id, item_id, seconds until due] in deadline order (for checkpoints)."""
+        now = time.monotonic()
+        return [[pending.order_id, pending.item_id, round(pending.deadline - now, 3)] for pending in sorted(self._by_order.values())]
+
+    def status(self):
+        next_deadline = self.next_deadline()
+        return {"pending": len(self._by_order), "window_seconds": self.window_seconds, "spacing_seconds": round(self.spacing_seconds, 2),
+                "next_due_in_seconds": None if next_deadline is None else round(max(0.0, next_deadline - time.monotonic()), 1)}
@@ -0,0 +1,131 @@
+# wfm_strategy.py
+# Pricing decisions for the analysis cycle, separated from the I/O around them.
+#
+# A strategy gets the numbers the cycle already has for one of our sell orders (our price, the lowest
+# in-game competitor, how many there are, the user's minimum and the item's bump counter) and returns a
+# PricingDecision. Buy orders are the mirror image (OutbidStrategy: highest in-game buyer, user's maximum). It never calls the API or touches globals, so the same code can be replayed offline
+# (wfm_backtest.py) against a timeline recorded by BookTimelineRecorder.
+import os
+import time
+
+import wfm_json
+
+# PricingDecision.action values
+NO_COMPETITORS = "no_competitors" # Nothing to price against; leave the order alone
+UPDATE = "update" # Change the price to target_price
+HOLD = "hold" # Price stays; counting towards a bump
+BUMP = "bump" # Price stays but re-submit it so the listing moves to the top of "recently updated"
+HELD_AT_MIN = "held_at_min" # Price stays at the user's minimum while others sell cheaper (no bump)
+HELD_AT_MAX = "held_at_max" # Buy orders: price stays at the user's maximum while others bid more (no bump)
+
+
+class PricingDecision:
+    __slots__ = ("action", "target_price", "bump_cycle", "reason")
+
+    def __init__(self, action, target_price=None, bump_cycle=0, reason=""):
+        self.action = action; self.target_price = target_price; self.bump_cycle = bump_cycle; self.reason = reason
+
+    def __repr__(self):
+        return f"PricingDecision({self.action!r}, target={self.target_price}, bump_cycle={self.bump_cycle})"
+
+
+class PricingStrategy:
+    """Interface: decide() must be a pure function of its arguments."""
+    name = "base"
+
+    def decide(self, current_price, lowest_competitor_price, competitor_count, min_price, bump_cycle):
+        """bump_cycle is the item's counter from the previous cycle; the returned decision carries the new one.
+        For BUMP the caller resets the counter to 0 only if the bump request succeeds (a failed bump retries next cycle)."""
+        raise NotImplementedError
+
+    def params(self):
+        return {}
+
+
+class UndercutStrategy(PricingStrategy):
+    """Undercut the lowest in-game seller by `undercut` plat, never below the user's minimum, and bump the
+    listing after `bump_threshold_cycles` cycles at the right price. raise_hysteresis > 0 skips price
+    *increases* smaller than that many plat (saves a write when a competitor above us wiggles by 1-2p).
+    The defaults (1p, 0 hysteresis) are the original hard-coded rule."""
+    name = "undercut"
+
+    def __init__(self, undercut=1, bump_threshold_cycles=5, raise_hysteresis=0):
+        self.undercut = undercut; self.bump_threshold_cycles = bump_threshold_cycles; self.raise_hysteresis = raise_hysteresis
+
+    def params(self):
+        return {"undercut": self.undercut, "bump_threshold_cycles": self.bump_threshold_cycles, "raise_hysteresis": self.raise_hysteresis}
+
+    def decide(self, current_price, lowest_competitor_price, competitor_count, min_price, bump_cycle):
+        if not competitor_count or lowest_competitor_price == float('inf'):
+            return PricingDecision(NO_COMPETITORS, None, 0, "no valid competitor prices")
+        target_price = max(int(lowest_competitor_price - self.undercut), int(min_price))
+        within_hysteresis = 0 < target_price - current_price < self.raise_hysteresis
+        if target_price != current_price and not within_hysteresis:
+            return PricingDecision(UPDATE, target_price, 0, f"{current_price}p -> {target_price}p")
+        if current_price > lowest_competitor_price: # Only possible when the minimum is above the competition
+            return PricingDecision(HELD_AT_MIN, target_price, 0, f"undercut by other sellers at {lowest_competitor_price}p")
+        bump_cycle += 1
+        if bump_cycle >= self.bump_threshold_cycles:
+            return PricingDecision(BUMP, current_price, bump_cycle, f"{bump_cycle} cycles at the top")
+        reason = f"raise to {target_price}p is within the {self.raise_hysteresis}p hysteresis" if within_hysteresis else "price is optimal"
+        return PricingDecision(HOLD, current_price, bump_cycle, reason)
+
+
+class OutbidStrategy(PricingStrategy):
+    """Buy-order counterpart of UndercutStrategy: bid `outbid` plat above the highest in-game buyer, never above
+    the user's maximum, and bump after `bump_threshold_cycles` cycles at the right price. decide() takes the
+    highest competing bid and the maximum where UndercutStrategy takes the lowest ask and the minimum;
+    lower_hysteresis > 0 skips price *decreases* smaller than that many plat."""
+    name = "outbid"
+
+    def __init__(self, outbid=1, bump_threshold_cycles=5, lower_hysteresis=0):
+        self.outbid = outbid; self.bump_threshold_cycles = bump_threshold_cycles; self.lower_hysteresis = lower_hysteresis
+
+    def params(self):
+        return {"outbid": self.outbid, "bump_threshold_cycles": self.bump_threshold_cycles, "lower_hysteresis": self.lower_hysteresis}
+
+    def decide(self, current_price, highest_competitor_price, competitor_count, max_price, bump_cycle):
+        if not competitor_count or highest_competitor_price is None:
+            return PricingDecision(NO_COMPETITORS, None, 0, "no valid competitor bids")
+        target_price = min(int(highest_competitor_price + self.outbid), int(max_price))
+        within_hysteresis = 0 < current_price - target_price < self.lower_hysteresis
+        if target_price != current_price and not within_hysteresis:
+            return PricingDecision(UPDATE, target_price, 0, f"{current_price}p -> {target_price}p")
+        if current_price < highest_competitor_price: # Only possible when the maximum is below the competition
+            return PricingDecision(HELD_AT_MAX, target_price, 0, f"outbid by other buyers at {highest_competitor_price}p")
+        bump_cycle += 1
+        if bump_cycle >= self.bump_threshold_cycles:
+            return PricingDecision(BUMP, current_price, bump_cycle, f"{bump_cycle} cycles at the top")
+        reason = f"drop to {target_price}p is within the {self.lower_hysteresis}p hysteresis" if within_hysteresis else "price is optimal"
+        return PricingDecision(HOLD, current_price, bump_cycle, reason)
+
+
+class BookTimelineRecorder:
+    """Appends the strategy inputs of every priced item to a JSON-lines file, for replay in wfm_backtest.py.
+    Records are buffered per cycle and written by flush(); disabled recorders cost one attribute check."""
+
+    def __init__(self, path=None):
+        self.path = path; self.enabled = False; self._pending = []
+
+    def record(self, item_id, lowest_competitor_price, competitor_count, book_source, current_price, min_price):
+        if not self.enabled or not self.path: return
+        self._pending.append({"t": round(time.time(), 3), "item_id": item_id,
+                              "lowest": None if lowest_competitor_price == float('inf') else lowest_competitor_price,
+                              "sellers": competitor_count, "source": book_source, "price": current_price, "min": min_price})
+
+    def record_buy(self, item_id, highest_competitor_price, competitor_count, book_source, current_price, max_price):
+        # Tagged with "side" so the (sell-side) backtester can skip these
+        if not self.enabled or not self.path: return
+        self._pending.append({"t": round(time.time(), 3), "item_id": item_id, "side": "buy", "highest": highest_competitor_price,
+                              "buyers": competitor_count, "source": book_source, "price": current_price, "max": max_price})
+
+    def flush(self):
+        if not self._pending: return 0
+        pending, self._pending = self._pending, []
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as timeline_file:
+                timeline_file.write(b"".join(wfm_json.dumps_bytes(record) + b"\n" for record in pending))
+        except OSError as e:
+            print(f"LOG: Could not append to book timeline {self.path}: {e}"); return 0
+        return len(pending)
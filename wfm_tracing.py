@@ -0,0 +1,271 @@
+# wfm_tracing.py
+# Per-cycle phase tracing and an on-demand profiler for the analysis engine.
+#
+# Tracing: the analysis thread opens a CycleTrace, and code anywhere below it wraps work in
+# span("phase", item_id=...). Spans nest; each records inclusive and self (exclusive) time, so a
+# slow competitor fetch can be split into rate-limit sleep, network and parse time.
+# The active trace is bound per thread like wfm_cancel's tokens (see there), so Flask request handlers
+# running alongside the analysis thread never write into it.
+#
+# Profiling: ProfilerController arms cProfile or a stack sampler for each platform's next N cycles and keeps
+# the output for download (pstats for cProfile, collapsed stacks for flamegraph.pl/speedscope).
+import collections
+import contextlib
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+
+_local = threading.local()
+RECENT_SUMMARIES = collections.deque(maxlen=20) # Last few cycle summaries, served by the web layer
+
+
+class _OpenSpan:
+    __slots__ = ("phase", "item_id", "start", "child_time")
+
+    def __init__(self, phase, item_id, start):
+        self.phase = phase; self.item_id = item_id; self.start = start; self.child_time = 0.0
+
+
+class CycleTrace:
+    """Timed spans for one analysis cycle, aggregated per phase and per item."""
+
+    def __init__(self, label):
+        self.label = label
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.phase_totals = {} # phase -> [count, inclusive seconds, self seconds]
+        self.item_totals = {} # item_id -> inclusive seconds spent inside that item's spans
+        self.item_phase_totals = {} # item_id -> {phase: self seconds}
+        self._stack = []
+
+    def open_span(self, phase, item_id=None):
+        if item_id is None and self._stack: item_id = self._stack[-1].item_id # Inherit the enclosing item
+        span = _OpenSpan(phase, item_id, time.perf_counter())
+        self._stack.append(span)
+        return span
+
+    def close_span(self, span):
+        duration = time.perf_counter() - span.start
+        if self._stack and self._stack[-1] is span: self._stack.pop()
+        elif span in self._stack: self._stack.remove(span)
+        self_time = max(0.0, duration - span.child_time)
+        if self._stack: self._stack[-1].child_time += duration
+        totals = self.phase_totals.setdefault(span.phase, [0, 0.0, 0.0])
+        totals[0] += 1; totals[1] += duration; totals[2] += self_time
+        if span.item_id is not None:
+            per_item = self.item_phase_totals.setdefault(span.item_id, {})
+            per_item[span.phase] = per_item.get(span.phase, 0.0) + self_time
+            if span.phase == "item": self.item_totals[span.item_id] = self.item_totals.get(span.item_id, 0.0) + duration
+
+    def summary(self, slowest_items=5):
+        elapsed = time.perf_counter() - self.start
+        accounted = sum(totals[2] for totals in self.phase_totals.values())
+        phases = {phase: {"count": totals[0], "total_s": round(totals[1], 4), "self_s": round(totals[2], 4)}
+                  for phase, totals in sorted(self.phase_totals.items(), key=lambda kv: -kv[1][2])}
+        slowest = sorted(self.item_totals.items(), key=lambda kv: -kv[1])[:slowest_items]
+        return {"label": self.label, "started_at": self.started_at, "elapsed_s": round(elapsed, 4),
+                "untraced_s": round(max(0.0, elapsed - accounted), 4), "phases": phases,
+                "slowest_items": [{"item_id": item_id, "total_s": round(total, 4),
+                                   "phases": {p: round(t, 4) for p, t in sorted(self.item_phase_totals.get(item_id, {}).items(), key=lambda kv: -kv[1])}}
+                                  for item_id, total in slowest]}
+
+
+def format_summary(summary):
+    """One-line human readable version of CycleTrace.summary() for the script log."""
+    parts = [f"{phase} {stats['self_s']:.2f}s/{stats['count']}" for phase, stats in list(summary["phases"].items())[:8]]
+    return f"Cycle trace: {summary['elapsed_s']:.2f}s total | " + ", ".join(parts) + f" | untraced {summary['untraced_s']:.2f}s"
+
+
+def start_trace(label):
+    trace = CycleTrace(label)
+    _local.trace = trace
+    return trace
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+def end_trace():
+    """Detach the active trace and return its summary (None if there was no trace)."""
+    trace = getattr(_local, "trace", None)
+    if trace is None: return None
+    _local.trace = None
+    summary = trace.summary()
+    RECENT_SUMMARIES.append(summary)
+    return summary
+
+@contextlib.contextmanager
+def span(phase, item_id=None):
+    # No-op outside a trace, so instrumented helpers cost nothing when called from Flask routes
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield; return
+    opened = trace.open_span(phase, item_id)
+    try: yield
+    finally: trace.close_span(opened)
+
+
+# --- On-demand profiler ---
+def _native_thread_tools():
+    # Under gevent the `threading` module is patched to greenlets; the sampler needs a real OS thread
+    # (and a real sleep) so it keeps sampling while the analysis greenlet is busy on the CPU.
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            return (monkey.get_original("_thread", "start_new_thread"), monkey.get_original("_thread", "get_ident"),
+                    monkey.get_original("time", "sleep"))
+    except ImportError:
+        pass
+    import _thread
+    return _thread.start_new_thread, _thread.get_ident, time.sleep
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename.replace("\\", "/").rsplit("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one OS thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, target_thread_ident, interval_seconds, counts):
+        self.target_thread_ident = target_thread_ident; self.interval_seconds = interval_seconds
+        self.counts = counts; self._running = False
+
+    def start(self):
+        start_new_thread, _, _ = _native_thread_tools()
+        self._running = True
+        start_new_thread(self._run, ())
+
+    def stop(self):
+        self._running = False
+
+    def _run(self):
+        _, _, native_sleep = _native_thread_tools()
+        while self._running:
+            frame = sys._current_frames().get(self.target_thread_ident)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame)); frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            native_sleep(self.interval_seconds)
+
+
+class ProfilerController:
+    """Arms cProfile or the stack sampler for the next N analysis cycles of each platform and keeps the result.
+
+    Every platform's analysis thread calls on_cycle_start/on_cycle_end. Each platform counts its own cycles, and
+    profiling finishes once every platform that started a profiled cycle has done N and none is still running.
+    Recorders are per OS thread: under gevent the platform greenlets share one thread (and one cProfile.Profile
+    or StackSampler, kept running while any of them is in a profiled cycle); as real threads each gets its own."""
+
+    MODES = ("cprofile", "sampling")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.mode = None; self.cycles_per_platform = 0; self.cycles_profiled = 0
+        self.sample_interval_seconds = 0.005
+        self._profiles = {} # native thread ident -> cProfile.Profile, kept for the output
+        self._sample_counts = {}
+        self._recorders = {} # native thread ident -> [callers in a profiled cycle, StackSampler or None]
+        self._platform_cycles = {} # platform -> profiled cycles finished
+        self._running = {} # calling thread/greenlet ident -> (platform, native thread ident)
+        self.finished_at = None
+
+    def arm(self, mode, cycles, sample_interval_ms=5):
+        if mode not in self.MODES: raise ValueError(f"Unknown profiler mode '{mode}'. Use one of {self.MODES}.")
+        if cycles <= 0: raise ValueError("cycles must be a positive integer.")
+        with self._lock:
+            self._stop_recorders_locked() # Re-arming mid-run: don't leave the old run's recorders going
+            self.mode = mode; self.cycles_per_platform = cycles; self.cycles_profiled = 0
+            self.sample_interval_seconds = max(0.001, sample_interval_ms / 1000.0)
+            self._profiles = {}; self._sample_counts = {}
+            self._platform_cycles = {}; self._running = {}; self.finished_at = None
+
+    def _active_locked(self):
+        return self.mode is not None and self.finished_at is None
+
+    def _cycles_remaining_locked(self):
+        if not self._active_locked(): return 0
+        return self.cycles_per_platform - min(self._platform_cycles.values(), default=0)
+
+    def status(self):
+        with self._lock:
+            return {"mode": self.mode, "cycles_remaining": self._cycles_remaining_locked(), "cycles_profiled": self.cycles_profiled,
+                    "active": self._active_locked(), "finished_at": self.finished_at,
+                    "has_output": bool(self._sample_counts) or (bool(self._profiles) and self.cycles_profiled > 0)}
+
+    def on_cycle_start(self, platform=None):
+        with self._lock:
+            if not self._active_locked(): return
+            if self._platform_cycles.setdefault(platform, 0) >= self.cycles_per_platform: return # This platform is done
+            caller = threading.get_ident()
+            if caller in self._running: return
+            _, get_native_ident, _ = _native_thread_tools()
+            native_ident = get_native_ident()
+            self._running[caller] = (platform, native_ident)
+            recorder = self._recorders.setdefault(native_ident, [0, None])
+            recorder[0] += 1
+            if recorder[0] > 1: return # Another greenlet on this thread already has it recording
+            if self.mode == "cprofile":
+                self._profiles.setdefault(native_ident, cProfile.Profile()).enable()
+            else:
+                recorder[1] = StackSampler(native_ident, self.sample_interval_seconds, self._sample_counts)
+                recorder[1].start()
+
+    def on_cycle_end(self):
+        with self._lock:
+            running = self._running.pop(threading.get_ident(), None)
+            if running is None: return # This caller's cycle wasn't profiled (or the profiler was re-armed since)
+            platform, native_ident = running
+            recorder = self._recorders.get(native_ident)
+            if recorder is not None:
+                recorder[0] -= 1
+                if recorder[0] <= 0: self._stop_recorder_locked(native_ident)
+            self._platform_cycles[platform] = self._platform_cycles.get(platform, 0) + 1
+            self.cycles_profiled += 1
+            if not self._running and all(done >= self.cycles_per_platform for done in self._platform_cycles.values()):
+                self._stop_recorders_locked()
+                self.finished_at = time.time()
+
+    def _stop_recorder_locked(self, native_ident):
+        recorder = self._recorders.pop(native_ident, None)
+        if recorder is None: return
+        if recorder[1] is not None: recorder[1].stop()
+        elif native_ident in self._profiles: self._profiles[native_ident].disable()
+
+    def _stop_recorders_locked(self):
+        for native_ident in list(self._recorders): self._stop_recorder_locked(native_ident)
+        self._running = {}
+
+    def _merged_stats_locked(self, stream=None):
+        if not self._profiles: return None
+        return pstats.Stats(*self._profiles.values(), stream=stream) # One report across every thread's profile
+
+    def collapsed_stacks(self):
+        with self._lock: counts = dict(self._sample_counts)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def pstats_bytes(self):
+        # Same format as cProfile's .prof files (snakeviz, pstats.Stats(path), gprof2dot)
+        with self._lock:
+            merged = self._merged_stats_locked()
+            if merged is None: return None
+            return marshal.dumps(merged.stats)
+
+    def pstats_text(self, limit=60):
+        with self._lock:
+            buffer = io.StringIO()
+            merged = self._merged_stats_locked(stream=buffer)
+            if merged is None: return None
+            merged.sort_stats("cumulative").print_stats(limit)
+            return buffer.getvalue()
+
+
+PROFILER = ProfilerController()